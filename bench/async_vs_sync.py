@@ -0,0 +1,90 @@
+# Throughput of acrud (asyncio) vs crud (threads) for concurrent point lookups.
+# Runs against the database you log into; only reads rows, never writes.
+#
+#   python3.13 bench/async_vs_sync.py --clients 200 --seconds 10
+
+# Imports
+# argparse: benchmark options
+# asyncio/threading: the two concurrency models being compared
+# random: pick which seeded ISBN each request reads
+# sys/os: make src/ importable when run from the repo root
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import acrud
+import crud
+
+def sample_isbns(limit=1000):
+    return [row['isbn'] for row, _ in zip(crud.iter_books(page_size=limit), range(limit))]
+
+def run_sync(isbns, clients, seconds):
+    """`clients` threads share the crud pool; returns completed lookups."""
+    crud.clear_caches()
+    deadline = time.monotonic() + seconds
+    counts = [0] * clients
+
+    def client(i):
+        rng = random.Random(i)
+        while time.monotonic() < deadline:
+            crud.get_book(rng.choice(isbns))
+            crud.clear_caches()     # measure the database path, not the cache
+            counts[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts)
+
+async def run_async(isbns, clients, seconds):
+    """`clients` tasks share the acrud pool; returns completed lookups."""
+    deadline = time.monotonic() + seconds
+    counts = [0] * clients
+
+    async def client(i):
+        rng = random.Random(i)
+        while time.monotonic() < deadline:
+            await acrud.get_book(rng.choice(isbns))
+            counts[i] += 1
+
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return sum(counts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare crud (threads) and acrud (asyncio) throughput.")
+    parser.add_argument('--clients', type=int, default=100, help="Concurrent clients")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Duration of each run")
+    parser.add_argument('--pool-size', type=int, default=crud.POOL_SIZE, help="Connections per pool")
+    args = parser.parse_args()
+
+    host, user, password, database = crud.prompt_credentials()
+    crud.init_pool(host, user, password, database, size=args.pool_size)
+    isbns = sample_isbns()
+    if not isbns:
+        print("No books to read; load some data first.")
+        return
+
+    done = run_sync(isbns, args.clients, args.seconds)
+    print(f"sync  (threads): {done / args.seconds:10.0f} lookups/s   pool {crud.pool_stats()}")
+    crud.close_pool()
+
+    async def async_run():
+        acrud.init_pool(host, user, password, database, size=args.pool_size)
+        try:
+            done = await run_async(isbns, args.clients, args.seconds)
+            print(f"async (asyncio): {done / args.seconds:10.0f} lookups/s   pool {acrud.pool_stats()}")
+        finally:
+            await acrud.close_pool()
+
+    asyncio.run(async_run())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Per-call overhead of the checkout path: fresh cursors and SQL text every call
+# (how crud.py used to run it) vs the per-connection prepared-statement cache.
+# The saving is largest on MySQL, where a prepared statement skips parsing on
+# the server; sqlite3 already caches compiled statements, so on SQLite only
+# cursor and row-building overhead goes away and commits dominate the cycle.
+# Uses the configured backend (LIBRARYMS_BACKEND). Writes: it adds a scratch
+# member and copy, checks it out and back in, then deletes what it added.
+#
+#   LIBRARYMS_BACKEND=sqlite python3.13 bench/checkout_path.py --iterations 5000
+
+# Imports
+# argparse: benchmark options
+# time: per-call timing
+# datetime: loan dates for the scratch checkouts
+# sys/os: make src/ importable when run from the repo root
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import crud
+
+MEMBER_SQL = ("SELECT active_flag, expiration_date, professor_privileges "
+              "FROM Member WHERE member_id = %s LOCK IN SHARE MODE")
+CLAIM_SQL = ("UPDATE Copy SET status = 'Not Available', row_version = row_version + 1 "
+             "WHERE isbn = %s AND copy_id = %s AND status = 'Available'")
+LOAN_SQL = ("INSERT INTO Loan "
+            "(loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, NULL, 'None', %s)")
+RETURN_SQL = ("UPDATE Loan SET return_date = %s, overdue_status = 'None', row_version = row_version + 1 "
+              "WHERE loan_id = %s")
+SHELVE_SQL = "UPDATE Copy SET status = 'Available', row_version = row_version + 1 WHERE isbn = %s AND copy_id = %s"
+
+
+def _fresh(conn, sql, params, dictionary=False):
+    """One statement the old way: new cursor, SQL text parsed every call."""
+    cursor = conn.cursor(dictionary=dictionary)
+    try:
+        cursor.execute(sql, params)
+        if cursor.description:
+            return cursor.fetchall()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def cycle_unprepared(conn, member_id, isbn, copy_id, staff_id, loan_id, today):
+    _fresh(conn, MEMBER_SQL, (member_id,), dictionary=True)
+    _fresh(conn, CLAIM_SQL, (isbn, copy_id))
+    _fresh(conn, LOAN_SQL, (loan_id, member_id, isbn, copy_id, today, today + timedelta(days=30), staff_id))
+    conn.commit()
+    _fresh(conn, RETURN_SQL, (today, loan_id))
+    _fresh(conn, SHELVE_SQL, (isbn, copy_id))
+    conn.commit()
+
+def cycle_prepared(conn, member_id, isbn, copy_id, staff_id, loan_id, today):
+    crud._execute(conn, MEMBER_SQL, (member_id,)).fetchall()
+    crud._execute(conn, CLAIM_SQL, (isbn, copy_id))
+    crud._execute(conn, LOAN_SQL, (loan_id, member_id, isbn, copy_id, today, today + timedelta(days=30), staff_id))
+    conn.commit()
+    crud._execute(conn, RETURN_SQL, (today, loan_id))
+    crud._execute(conn, SHELVE_SQL, (isbn, copy_id))
+    conn.commit()
+
+def lookup_unprepared(conn, member_id):
+    return _fresh(conn, "SELECT * FROM Member WHERE member_id = %s", (member_id,), dictionary=True)[0]
+
+def lookup_prepared(conn, member_id, row_mode):
+    """The statement and row building get_member runs on a cache miss."""
+    cursor = crud._execute(conn, "SELECT * FROM Member WHERE member_id = %s", (member_id,))
+    return crud._shape(tuple(cursor.column_names), crud._fetch_one(cursor), row_mode)
+
+def timed(label, calls, fn):
+    start = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / calls * 1e6:9.1f} us/call")
+    return elapsed / calls
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-call overhead on the checkout path.")
+    parser.add_argument('--iterations', type=int, default=2000, help="Calls per measurement")
+    parser.add_argument('--isbn', default='9780131101630', help="Existing ISBN to add scratch copies to")
+    parser.add_argument('--staff-id', type=int, default=201, help="Existing staff id recorded on loans")
+    args = parser.parse_args()
+
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=2)
+    today = date.today()
+    member_id = crud.add_member(None, 'Benchmark Patron', '000000000', 'n/a', today + timedelta(days=365), True, False)
+    copy_id = crud.add_copy(args.isbn, None, 'Available', 'Benchmark')
+    if member_id is False or copy_id is False:
+        print("Could not create scratch rows; is the database initialized?")
+        return
+    loan_ids = list(crud._ids.next_ids('Loan', 2 * args.iterations))
+    conn = crud.get_connection()
+    try:
+        print(f"backend: {crud._backend.name}, {args.iterations} calls each\n")
+        print("member lookup (cache bypassed)")
+        old = timed("  fresh cursor, dict rows", args.iterations, lambda i: lookup_unprepared(conn, member_id))
+        for mode in crud.ROW_MODES:
+            new = timed(f"  prepared, {mode} rows", args.iterations,
+                        lambda i, mode=mode: lookup_prepared(conn, member_id, mode))
+            print(f"{'':<34} {old / new:9.2f}x")
+
+        print("\ncheckout + checkin cycle")
+        old = timed("  fresh cursors", args.iterations,
+                    lambda i: cycle_unprepared(conn, member_id, args.isbn, copy_id, args.staff_id, loan_ids[i], today))
+        new = timed("  prepared statements", args.iterations,
+                    lambda i: cycle_prepared(conn, member_id, args.isbn, copy_id, args.staff_id,
+                                             loan_ids[args.iterations + i], today))
+        print(f"{'':<34} {old / new:9.2f}x")
+    finally:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM Loan WHERE member_id = %s", (member_id,))
+        conn.commit()
+        cursor.close()
+        crud.release_connection()
+        crud.delete_copy(args.isbn, copy_id)
+        crud.delete_member(member_id)
+        crud.close_pool()
+
+if __name__ == '__main__':
+    main()
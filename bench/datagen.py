@@ -0,0 +1,314 @@
+# Deterministic synthetic LibraryMS data at realistic scale and skew.
+# The same seed and sizes always produce the same rows, so benchmark runs are
+# comparable. Writes CSV files for importer.py, a .sql file for init_db's
+# run_sql_file, or loads straight into the configured database.
+#
+#   python3.13 bench/datagen.py --scale small --out /tmp/libdata            # CSV per table
+#   python3.13 bench/datagen.py --scale large --format sql --out /tmp/big.sql
+#   LIBRARYMS_BACKEND=sqlite python3.13 bench/datagen.py --scale small --load
+#
+# Skew:
+# - Book popularity follows a Zipf law; popular titles get more copies and
+#   most of the loans.
+# - Checkouts cluster at semester starts and before finals.
+# - Professors (about 5% of members) borrow far more than other members, and
+#   some other members are heavy borrowers too.
+# - About 15% of copies (weighted to popular titles) are currently out. Each
+#   has exactly one open loan, and its status is 'Not Available'.
+
+# Imports
+# argparse: generator options
+# csv: per-table CSV output
+# random/itertools: seeded sampling from skewed distributions
+# time: load progress
+# sys/os: make src/ importable when run from the repo root
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import crud
+from availability import rebuild_statements
+
+# Preset sizes; any count can be overridden on the command line
+SCALES = {
+    'tiny': {'books': 1_000, 'copies': 3_000, 'members': 500, 'staff': 20, 'loans': 10_000},
+    'small': {'books': 50_000, 'copies': 150_000, 'members': 20_000, 'staff': 100, 'loans': 500_000},
+    'medium': {'books': 200_000, 'copies': 1_000_000, 'members': 100_000, 'staff': 500, 'loans': 5_000_000},
+    'large': {'books': 1_000_000, 'copies': 5_000_000, 'members': 500_000, 'staff': 2_000, 'loans': 50_000_000},
+}
+TABLE_ORDER = ('Book', 'Copy', 'Member', 'Staff', 'Loan')
+
+# Zipf exponent for title popularity (higher = more concentrated)
+ZIPF_S = 1.1
+# Share of members with professor privileges, and how much more they borrow
+PROFESSOR_SHARE = 0.05
+PROFESSOR_WEIGHT = 8.0
+# Relative checkout volume by month (semester starts and finals peak)
+MONTH_WEIGHTS = (1.4, 1.2, 1.0, 1.2, 0.8, 0.4, 0.4, 0.8, 1.6, 1.3, 1.2, 0.6)
+# Years of loan history before the end date
+HISTORY_YEARS = 3
+# Share of copies currently on loan, and how far back those checkouts go
+OPEN_FRACTION = 0.15
+OPEN_LOAN_DAYS = 60
+# First member/staff/loan id (keeps clear of hand-written seed rows)
+ID_BASE = 1_000_000
+# Rows drawn per sampling call, and rows per INSERT in .sql output
+SAMPLE_BATCH = 10_000
+SQL_ROWS_PER_INSERT = 1000
+
+SUBJECTS = ('Computer Science', 'Mathematics', 'Physics', 'Chemistry', 'Biology', 'History',
+            'Philosophy', 'Economics', 'Literature', 'Psychology', 'Engineering', 'Art')
+TITLE_WORDS = ('Introduction', 'Principles', 'Advanced', 'Modern', 'Applied', 'Theory', 'Foundations',
+               'Practical', 'Elements', 'Handbook', 'Topics', 'Methods', 'Systems', 'Analysis')
+FIRST_NAMES = ('Alice', 'Bob', 'Chloe', 'Daniel', 'Emily', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jamal',
+               'Kira', 'Luis', 'Maya', 'Noah', 'Olga', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tara')
+LAST_NAMES = ('Smith', 'Johnson', 'Tran', 'Kim', 'Zhang', 'Garcia', 'Okafor', 'Novak', 'Patel',
+              'Rossi', 'Silva', 'Muller', 'Haddad', 'Sato', 'Ivanova', 'Brown', 'Nguyen', 'Cohen')
+STREETS = ('Main St', 'Oak Ave', 'Pine Rd', 'Cedar Blvd', 'Birch Ln', 'Elm St', 'Maple Dr', 'Lake Rd')
+STAFF_ROLES = ('Librarian', 'Assistant', 'Clerk', 'Supervisor')
+
+
+def make_isbn(index):
+    """Valid, unique ISBN-13 for book number `index` (979 prefix, clear of real seed ISBNs)."""
+    body = f"979{index:09d}"
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+class SyntheticLibrary:
+    """Seeded generator for each table; every method yields rows as dicts in TABLE_COLUMNS order."""
+
+    def __init__(self, books, copies, members, staff, loans, seed=1, end=None):
+        self.counts = {'books': books, 'copies': copies, 'members': members, 'staff': staff, 'loans': loans}
+        self.seed = seed
+        self.end = end or date(2026, 1, 31)
+        rng = self._rng('setup')
+
+        # Title popularity: Zipf weight by a shuffled rank
+        ranks = list(range(books))
+        rng.shuffle(ranks)
+        self.book_weight = [1.0 / (r + 1) ** ZIPF_S for r in ranks]
+        self.book_cum = list(accumulate(self.book_weight))
+        # Copies per title grow with the square root of popularity
+        damped = [w ** 0.5 for w in self.book_weight]
+        scale = copies / sum(damped)
+        self.copy_count = [max(1, round(d * scale)) for d in damped]
+        self.total_copies = sum(self.copy_count)
+
+        # Borrowing intensity: professors borrow PROFESSOR_WEIGHT times more
+        self.professor = [rng.random() < PROFESSOR_SHARE for _ in range(members)]
+        self.member_cum = list(accumulate(
+            (PROFESSOR_WEIGHT if p else 1.0) * rng.paretovariate(2.5) for p in self.professor))
+
+        # Checkout days across the history window, weighted by month
+        start = self.end - timedelta(days=365 * HISTORY_YEARS)
+        self.days = [start + timedelta(days=i) for i in range((self.end - start).days)]
+        self.day_cum = list(accumulate(MONTH_WEIGHTS[d.month - 1] for d in self.days))
+
+    def _rng(self, stream):
+        """Independent, reproducible random stream per table."""
+        return random.Random(f"{self.seed}:{stream}")
+
+    def _loan_days(self, member):
+        return crud.PROFESSOR_LOAN_DAYS if self.professor[member] else crud.LOAN_DAYS
+
+    def books(self):
+        rng = self._rng('books')
+        for i in range(self.counts['books']):
+            subject = SUBJECTS[rng.randrange(len(SUBJECTS))]
+            words = rng.sample(TITLE_WORDS, 2)
+            yield {
+                'isbn': make_isbn(i),
+                'title': f"{words[0]} {subject}: {words[1]} Vol. {i % 7 + 1}",
+                'subject': subject,
+                'author': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                'description': f"{words[0]} treatment of {subject.lower()} ({words[1].lower()}).",
+            }
+
+    def _copy_states(self):
+        """(book, copy_id, on_loan) for every copy; shared by copies() and loans() so they agree."""
+        rng = self._rng('copy-states')
+        norm = self.total_copies / self.book_cum[-1]
+        for book, count in enumerate(self.copy_count):
+            p_out = min(0.8, OPEN_FRACTION * self.book_weight[book] / count * norm)
+            for copy_id in range(1, count + 1):
+                yield book, copy_id, rng.random() < p_out
+
+    def copies(self):
+        rng = self._rng('copies')
+        for book, copy_id, on_loan in self._copy_states():
+            yield {
+                'isbn': make_isbn(book),
+                'copy_id': copy_id,
+                'status': 'Not Available' if on_loan else 'Available',
+                'location': f"Shelf {chr(65 + rng.randrange(26))}{rng.randrange(1, 40)}",
+            }
+
+    def members(self):
+        rng = self._rng('members')
+        for i in range(self.counts['members']):
+            yield {
+                'member_id': ID_BASE + i,
+                'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                'ssn': f"{(i * 7919 + 100000000) % 1000000000:09d}",
+                'address': f"{rng.randrange(1, 9999)} {rng.choice(STREETS)}",
+                'expiration_date': self.end + timedelta(days=rng.randrange(-200, 730)),
+                'active_flag': rng.random() < 0.95,
+                'professor_privileges': self.professor[i],
+            }
+
+    def staff(self):
+        rng = self._rng('staff')
+        for i in range(self.counts['staff']):
+            yield {
+                'staff_id': ID_BASE + i,
+                'staff_name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                'staff_role': rng.choice(STAFF_ROLES),
+            }
+
+    def loans(self):
+        """Closed history first (weighted by popularity, season and borrower), then one open loan per copy out."""
+        rng = self._rng('loans')
+        members = range(self.counts['members'])
+        staff = self.counts['staff']
+        open_copies = [(b, c) for b, c, out in self._copy_states() if out]
+        history = max(0, self.counts['loans'] - len(open_copies))
+        loan_id = ID_BASE
+        while history > 0:
+            k = min(SAMPLE_BATCH, history)
+            books = rng.choices(range(len(self.book_cum)), cum_weights=self.book_cum, k=k)
+            borrowers = rng.choices(members, cum_weights=self.member_cum, k=k)
+            days = rng.choices(self.days, cum_weights=self.day_cum, k=k)
+            for book, member, day in zip(books, borrowers, days):
+                loan_days = self._loan_days(member)
+                due = day + timedelta(days=loan_days)
+                returned = min(day + timedelta(days=rng.randrange(1, loan_days + 21)), self.end)
+                yield {
+                    'loan_id': loan_id, 'member_id': ID_BASE + member, 'isbn': make_isbn(book),
+                    'copy_id': rng.randrange(1, self.copy_count[book] + 1),
+                    'checkout_date': day, 'due_date': due, 'return_date': returned,
+                    'overdue_status': 'Late' if returned > due else 'None',
+                    'staff_id': ID_BASE + rng.randrange(staff),
+                }
+                loan_id += 1
+            history -= k
+        for book, copy_id in open_copies:
+            member = rng.choices(members, cum_weights=self.member_cum)[0]
+            day = self.end - timedelta(days=rng.randrange(OPEN_LOAN_DAYS))
+            due = day + timedelta(days=self._loan_days(member))
+            late_days = (self.end - due).days
+            status = 'None' if late_days <= 0 else 'NoticeSent' if late_days <= 14 else 'Late'
+            yield {
+                'loan_id': loan_id, 'member_id': ID_BASE + member, 'isbn': make_isbn(book),
+                'copy_id': copy_id, 'checkout_date': day, 'due_date': due, 'return_date': None,
+                'overdue_status': status, 'staff_id': ID_BASE + rng.randrange(staff),
+            }
+            loan_id += 1
+
+    def rows(self, table):
+        return {'Book': self.books, 'Copy': self.copies, 'Member': self.members,
+                'Staff': self.staff, 'Loan': self.loans}[table]()
+
+
+# --- Output ---
+
+def write_csv(library, out_dir):
+    """One <Table>.csv per table, in the column layout importer.py expects."""
+    os.makedirs(out_dir, exist_ok=True)
+    for table in TABLE_ORDER:
+        path = os.path.join(out_dir, f"{table}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=crud.TABLE_COLUMNS[table])
+            writer.writeheader()
+            n = 0
+            for row in library.rows(table):
+                writer.writerow({k: ('' if v is None else int(v) if isinstance(v, bool) else v)
+                                 for k, v in row.items()})
+                n += 1
+        print(f"{table}: {n} rows -> {path}")
+
+def _sql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "''") + "'"
+
+def write_sql(library, path):
+    """A data.sql-style file of multi-row INSERT IGNORE statements, then an availability rebuild."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for table in TABLE_ORDER:
+            columns = crud.TABLE_COLUMNS[table]
+            head = f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES\n"
+            batch, n = [], 0
+            for row in library.rows(table):
+                batch.append("(" + ", ".join(_sql_literal(row[c]) for c in columns) + ")")
+                if len(batch) >= SQL_ROWS_PER_INSERT:
+                    f.write(head + ",\n".join(batch) + ";\n")
+                    batch = []
+                n += 1
+            if batch:
+                f.write(head + ",\n".join(batch) + ";\n")
+            print(f"{table}: {n} rows")
+        # The INSERTs bypass crud.py, so recount shelf availability at the end
+        for sql, _ in rebuild_statements():
+            f.write(sql.strip() + ";\n")
+    print(f"Wrote {path}")
+
+def load(library, chunk_size=crud.BATCH_SIZE):
+    """Insert every table through crud.bulk_insert (the pool must be initialized)."""
+    for table in TABLE_ORDER:
+        start = time.monotonic()
+        result = crud.bulk_insert(table, library.rows(table), chunk_size)
+        seconds = time.monotonic() - start
+        print(f"{table}: {result['inserted']} inserted, {len(result['rejected'])} rejected "
+              f"in {seconds:.1f}s ({result['inserted'] / max(seconds, 1e-9):.0f} rows/s)")
+        for index, _, reason in result['rejected'][:5]:
+            print(f"  row {index}: {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic LibraryMS data.")
+    parser.add_argument('--scale', choices=SCALES, default='tiny')
+    for name in SCALES['tiny']:
+        parser.add_argument(f'--{name}', type=int, help=f"Override the number of {name}")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--end', help="Last day of loan history, YYYY-MM-DD (default 2026-01-31)")
+    parser.add_argument('--format', choices=('csv', 'sql'), default='csv')
+    parser.add_argument('--out', help="Output directory (csv) or file (sql)")
+    parser.add_argument('--load', action='store_true', help="Insert into the configured database instead")
+    args = parser.parse_args()
+
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        if getattr(args, name) is not None:
+            counts[name] = getattr(args, name)
+    end = date.fromisoformat(args.end) if args.end else None
+    library = SyntheticLibrary(seed=args.seed, end=end, **counts)
+    print(f"{counts['books']} books, {library.total_copies} copies, {counts['members']} members, "
+          f"{counts['staff']} staff, {counts['loans']} loans (seed {args.seed})")
+
+    if args.load:
+        crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=2)
+        try:
+            load(library)
+        finally:
+            crud.close_pool()
+    elif args.out and args.format == 'csv':
+        write_csv(library, args.out)
+    elif args.out:
+        write_sql(library, args.out)
+    else:
+        parser.error("pass --out or --load")
+
+if __name__ == '__main__':
+    main()
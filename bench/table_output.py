@@ -0,0 +1,101 @@
+# Time to first row and total time for printing a long listing: the old
+# print_table (materialize every row, one pass for widths, one print() per
+# row) vs the streaming renderer in src/render.py, fed straight from
+# crud.iter_rows. Output goes to a counting sink, not the terminal, so the
+# numbers are formatting and fetching cost only. Read-only.
+#
+#   LIBRARYMS_BACKEND=sqlite python3.13 bench/table_output.py --table Loan --rows 100000
+#   python3.13 bench/table_output.py --table Book --rows 50000 --format csv
+
+# Imports
+# argparse: benchmark options
+# contextlib: point the old print()-based renderer at the sink
+# time/tracemalloc: first-row latency, total time and peak memory
+# sys/os: make src/ importable when run from the repo root
+import argparse
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import crud
+import render
+
+
+class Sink:
+    """Write target that records when the first data row (the third line) arrived."""
+
+    def __init__(self, header_lines):
+        self.header_lines = header_lines
+        self.started = time.perf_counter()
+        self.first_row = None
+        self.lines = 0
+
+    def write(self, text):
+        self.lines += text.count("\n")
+        if self.first_row is None and self.lines > self.header_lines:
+            self.first_row = time.perf_counter() - self.started
+        return len(text)
+
+    def flush(self):
+        pass
+
+def print_table_buffered(rows):
+    """print_table as it was: needs the whole list, walks it twice, prints row by row."""
+    if not rows:
+        print("No records found.")
+        return
+    headers = list(rows[0].keys())
+    display_headers = [render.HEADERS.get(h, h) for h in headers]
+    widths = {}
+    for h, dh in zip(headers, display_headers):
+        max_data = max(len(str(r[h])) for r in rows)
+        widths[h] = max(len(dh), max_data)
+    header_line = " | ".join(dh.ljust(widths[h]) for h, dh in zip(headers, display_headers))
+    print(header_line)
+    print("-" * len(header_line))
+    for r in rows:
+        print(" | ".join(str(r[h]).ljust(widths[h]) for h in headers))
+
+def run_buffered(table, n):
+    sink = Sink(2)
+    with contextlib.redirect_stdout(sink):
+        print_table_buffered(list(islice(crud.iter_rows(table), n)))
+    return sink
+
+def run_streaming(table, n, fmt):
+    sink = Sink({'table': 2, 'jsonl': 0}.get(fmt, 1))
+    render.print_table(islice(crud.iter_rows(table), n), fmt=fmt, out=sink)
+    return sink
+
+def measure(label, run, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    sink = run(*args)
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<20} first row {sink.first_row * 1e3:9.1f} ms   total {total:7.2f} s   "
+          f"peak {peak / 1e6:8.1f} MB   {sink.lines} lines")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare time to first row of the buffered and streaming table printers.")
+    parser.add_argument('--table', choices=sorted(crud.TABLE_KEYS), default='Loan')
+    parser.add_argument('--rows', type=int, default=100000, help="Rows to print")
+    parser.add_argument('--format', choices=render.OUTPUT_FORMATS, default='table',
+                        help="Output mode for the streaming renderer")
+    args = parser.parse_args()
+
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=2)
+    try:
+        measure("buffered (old)", run_buffered, args.table, args.rows)
+        measure(f"streaming {args.format}", run_streaming, args.table, args.rows, args.format)
+    finally:
+        crud.close_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+# Replays a mixed read/write workload against the CRUD API and reports
+# ops/sec and p50/p95/p99 latency per operation. Results can be saved as JSON
+# and compared against an earlier run to catch regressions.
+# Uses the configured backend (LIBRARYMS_BACKEND); load data with datagen.py
+# first. Checkouts made during the run are checked back in at the end.
+#
+#   python3.13 bench/workload.py --mix circulation --clients 16 --seconds 30 --save bench/results/base.json
+#   python3.13 bench/workload.py --mix circulation --clients 16 --seconds 30 --compare bench/results/base.json
+#   python3.13 bench/workload.py --mix checkout-storm --clients 64 --hot 20
+
+# Imports
+# argparse/json: options and stored results
+# random/itertools: seeded operation mix and skewed record choice
+# threading/time: concurrent clients and latency measurement
+# sys/os: make src/ importable when run from the repo root
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime
+from itertools import accumulate, islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import crud
+
+# Relative weight of each operation per workload mix
+MIXES = {
+    'browse': {'get_book': 40, 'search': 25, 'list': 15, 'get_member': 10, 'checkout': 5, 'checkin': 5},
+    'circulation': {'get_book': 15, 'get_member': 15, 'search': 10, 'list': 5, 'checkout': 28, 'checkin': 27},
+    # Every client fights over the --hot most popular copies
+    'checkout-storm': {'checkout': 50, 'checkin': 50},
+}
+# Records sampled from the database to drive the workload
+SAMPLE_SIZE = 20000
+# Zipf exponent for which sampled book/copy a client touches
+ZIPF_S = 1.1
+# Rows per list page
+LIST_PAGE = 50
+# Relative change that counts as a regression in --compare
+DEFAULT_TOLERANCE = 0.10
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+def _zipf_cum(n, rng):
+    ranks = list(range(n))
+    rng.shuffle(ranks)
+    return list(accumulate(1.0 / (r + 1) ** ZIPF_S for r in ranks))
+
+
+class Workload:
+    """Working set sampled from the database plus the operations clients run against it."""
+
+    def __init__(self, seed=1, sample=SAMPLE_SIZE, hot=None):
+        rng = random.Random(seed)
+        today = date.today()
+        self.isbns = [row['isbn'] for row in islice(crud.iter_books(), sample)]
+        copies = [(r['isbn'], r['copy_id']) for r in islice(crud.iter_copies(), sample * 3)
+                  if r['status'] == 'Available']
+        rng.shuffle(copies)
+        self.copies = copies[:hot] if hot else copies[:sample]
+        self.members = [r['member_id'] for r in islice(crud.iter_members(), sample)
+                        if r['active_flag'] and (r['expiration_date'] is None or r['expiration_date'] >= today)]
+        self.staff = [r['staff_id'] for r in islice(crud.iter_staff(), 1000)]
+        words = {w for isbn in self.isbns[:2000] for w in crud._search_terms(crud.get_book(isbn)['title'])}
+        self.terms = sorted(words)
+        if not (self.isbns and self.copies and self.members and self.staff):
+            raise RuntimeError("Not enough data to drive the workload; load some with bench/datagen.py.")
+        self.book_cum = _zipf_cum(len(self.isbns), rng)
+        self.copy_cum = _zipf_cum(len(self.copies), rng)
+
+    def run_op(self, op, rng, open_loans, cold):
+        """Run one operation; returns 'ok', 'refused' or 'error'."""
+        if cold:
+            crud.clear_caches()
+        if op == 'get_book':
+            isbn = rng.choices(self.isbns, cum_weights=self.book_cum)[0]
+            return 'ok' if crud.get_book(isbn) is not None else 'error'
+        if op == 'get_member':
+            return 'ok' if crud.get_member(rng.choice(self.members)) is not None else 'error'
+        if op == 'search':
+            crud.search_books(rng.choice(self.terms) if self.terms else 'a')
+            return 'ok'
+        if op == 'list':
+            crud.fetch_page('Book', (rng.choice(self.isbns),), LIST_PAGE)
+            return 'ok'
+        if op == 'checkout':
+            isbn, copy_id = rng.choices(self.copies, cum_weights=self.copy_cum)[0]
+            try:
+                loan = crud.checkout(rng.choice(self.members), isbn, copy_id, rng.choice(self.staff))
+            except crud.CirculationError:
+                return 'refused'
+            if loan is None:
+                return 'error'
+            open_loans.append(loan['loan_id'])
+            return 'ok'
+        if op == 'checkin':
+            try:
+                return 'ok' if crud.checkin(open_loans.pop(0)) is not None else 'error'
+            except crud.CirculationError:
+                return 'refused'
+        raise ValueError(f"Unknown operation {op!r}")
+
+
+def run(workload, mix, clients, seconds, warmup=0.0, seed=1, cold=False):
+    """Run `clients` threads for `seconds` (after `warmup`); returns the results dict."""
+    ops = list(MIXES[mix])
+    op_cum = list(accumulate(MIXES[mix][op] for op in ops))
+    samples = {op: [] for op in ops}
+    outcomes = {op: {'ok': 0, 'refused': 0, 'error': 0} for op in ops}
+    lock = threading.Lock()
+    start_at = time.monotonic() + warmup
+    stop_at = start_at + seconds
+
+    def client(i):
+        rng = random.Random(f"{seed}:{i}")
+        open_loans = []
+        mine = {op: [] for op in ops}
+        results = {op: {'ok': 0, 'refused': 0, 'error': 0} for op in ops}
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= stop_at:
+                    break
+                op = rng.choices(ops, cum_weights=op_cum)[0]
+                if op == 'checkin' and not open_loans:
+                    op = 'checkout'     # nothing of ours to return yet
+                t0 = time.perf_counter()
+                outcome = workload.run_op(op, rng, open_loans, cold)
+                elapsed = time.perf_counter() - t0
+                if now >= start_at:
+                    mine[op].append(elapsed)
+                    results[op][outcome] += 1
+        finally:
+            # Put the database back the way we found it
+            for loan_id in open_loans:
+                try:
+                    crud.checkin(loan_id)
+                except crud.CirculationError:
+                    pass
+            with lock:
+                for op in ops:
+                    samples[op].extend(mine[op])
+                    for k, v in results[op].items():
+                        outcomes[op][k] += v
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    report = {}
+    for op in ops:
+        values = sorted(samples[op])
+        if not values:
+            continue
+        report[op] = {
+            'count': len(values),
+            **outcomes[op],
+            'ops_per_s': len(values) / seconds,
+            'p50_ms': percentile(values, 50) * 1e3,
+            'p95_ms': percentile(values, 95) * 1e3,
+            'p99_ms': percentile(values, 99) * 1e3,
+            'max_ms': values[-1] * 1e3,
+        }
+    total = sum(r['count'] for r in report.values())
+    return {
+        'mix': mix,
+        'backend': crud._backend.name,
+        'clients': clients,
+        'seconds': seconds,
+        'seed': seed,
+        'cold': cold,
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'total_ops': total,
+        'ops_per_s': total / seconds,
+        'ops': report,
+        'pool': crud.pool_stats(),
+        'queries': crud.query_stats(),
+    }
+
+
+# --- Reporting ---
+
+def print_report(result):
+    print(f"\n{result['mix']} on {result['backend']}: {result['clients']} clients, {result['seconds']:.0f}s, "
+          f"{result['ops_per_s']:.0f} ops/s total")
+    print(f"{'operation':<12} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} "
+          f"{'refused':>8} {'errors':>7}")
+    for op, r in result['ops'].items():
+        print(f"{op:<12} {r['ops_per_s']:9.1f} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} "
+              f"{r['max_ms']:9.2f} {r['refused']:8d} {r['error']:7d}")
+    pool = result['pool']
+    print(f"pool: utilization {pool['utilization']:.0%}, waits {pool['waits']}, avg wait {pool['avg_wait_s'] * 1e3:.2f} ms")
+    slowest = sorted(result['queries'].items(), key=lambda kv: kv[1]['total_s'], reverse=True)[:5]
+    print("most time spent in:")
+    for statement, q in slowest:
+        print(f"  {q['total_s']:7.2f}s {q['calls']:8d} calls  p95 <= {q['p95_ms']:.1f} ms  {statement[:80]}")
+
+def compare(result, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Print changes against `baseline`; returns the list of regressions found."""
+    regressions = []
+    print(f"\nvs baseline from {baseline.get('started', '?')} ({baseline['mix']} on {baseline['backend']}):")
+    for op, r in result['ops'].items():
+        base = baseline['ops'].get(op)
+        if base is None:
+            continue
+        throughput = r['ops_per_s'] / base['ops_per_s'] - 1 if base['ops_per_s'] else 0.0
+        p95 = r['p95_ms'] / base['p95_ms'] - 1 if base['p95_ms'] else 0.0
+        flag = ""
+        if throughput < -tolerance or p95 > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(op)
+        print(f"{op:<12} ops/s {throughput:+7.1%}   p95 {p95:+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a mixed LibraryMS workload and report latency percentiles.")
+    parser.add_argument('--mix', choices=MIXES, default='circulation')
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent client threads")
+    parser.add_argument('--seconds', type=float, default=20.0, help="Measured duration")
+    parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured lead-in")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--hot', type=int, help="Only touch this many copies (contention)")
+    parser.add_argument('--cold', action='store_true', help="Clear the row caches before every operation")
+    parser.add_argument('--pool-size', type=int, default=crud.POOL_SIZE)
+    parser.add_argument('--save', help="Write the results as JSON to this path")
+    parser.add_argument('--compare', help="Baseline results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative throughput drop / p95 rise reported as a regression")
+    args = parser.parse_args()
+
+    hot = args.hot or (20 if args.mix == 'checkout-storm' else None)
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=args.pool_size)
+    try:
+        workload = Workload(args.seed, hot=hot)
+        crud.reset_query_stats()
+        result = run(workload, args.mix, args.clients, args.seconds, args.warmup, args.seed, args.cold)
+    finally:
+        crud.close_pool()
+    print_report(result)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+-- Secondary indexes for the circulation queries.
+-- ALGORITHM=INPLACE, LOCK=NONE builds each index online: reads and writes on
+-- the table keep going while InnoDB builds it.
+
+-- Catalog lookups by title, author and subject
+ALTER TABLE Book
+    ADD INDEX idx_book_title (title),
+    ADD INDEX idx_book_author (author),
+    ADD INDEX idx_book_subject (subject),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Shelf availability: copies by status
+ALTER TABLE Copy
+    ADD INDEX idx_copy_status (status),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- A member's open loans (return_date IS NULL) and loan history;
+-- also serves the member_id foreign key
+ALTER TABLE Loan
+    ADD INDEX idx_loan_member_return (member_id, return_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+-- Overdue processing: loans by due date and notice state, and returns by date
+ALTER TABLE Loan
+    ADD INDEX idx_loan_due_overdue (due_date, overdue_status),
+    ADD INDEX idx_loan_return_date (return_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
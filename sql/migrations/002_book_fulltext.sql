@@ -0,0 +1,7 @@
+-- Full-text index for catalog search over title, author, subject and description.
+-- The first FULLTEXT index on a table adds InnoDB's hidden FTS_DOC_ID column,
+-- which can't be done with LOCK=NONE; LOCK=SHARED keeps the catalog readable
+-- while the index builds.
+ALTER TABLE Book
+    ADD FULLTEXT INDEX ft_book_search (title, author, subject, description),
+    ALGORITHM=INPLACE, LOCK=SHARED;
@@ -0,0 +1,15 @@
+-- Server-side id generation for Member, Staff and Loan.
+-- The application reserves ids in blocks by advancing next_id (hi/lo), so
+-- desks never invent primary keys and bulk loads don't pay a round trip per id.
+CREATE TABLE IF NOT EXISTS IdSequence (
+    name VARCHAR(50) PRIMARY KEY,            -- Table the ids are for
+    next_id BIGINT NOT NULL                  -- First id not yet handed out
+);
+
+-- Start each sequence after the ids already in use
+INSERT IGNORE INTO IdSequence (name, next_id)
+    SELECT 'Member', COALESCE(MAX(member_id), 0) + 1 FROM Member;
+INSERT IGNORE INTO IdSequence (name, next_id)
+    SELECT 'Staff', COALESCE(MAX(staff_id), 0) + 1 FROM Staff;
+INSERT IGNORE INTO IdSequence (name, next_id)
+    SELECT 'Loan', COALESCE(MAX(loan_id), 0) + 1 FROM Loan;
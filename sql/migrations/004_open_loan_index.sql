@@ -0,0 +1,11 @@
+-- Open-loan index for overdue processing: open loans (return_date IS NULL)
+-- ordered by due date, with the notice state in the index so the overdue job's
+-- UPDATEs and notice queries never touch returned loans.
+-- It starts with return_date, so it also replaces idx_loan_return_date.
+ALTER TABLE Loan
+    ADD INDEX idx_loan_open_due (return_date, due_date, overdue_status),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+ALTER TABLE Loan
+    DROP INDEX idx_loan_return_date,
+    ALGORITHM=INPLACE, LOCK=NONE;
@@ -0,0 +1,18 @@
+-- Materialized shelf availability: copies per ISBN and location, and how many
+-- of them are 'Available'. crud.py keeps it in step with Copy in the same
+-- transaction as checkout, checkin and copy add/update/delete, so catalog
+-- pages read a few summary rows per title instead of scanning Copy.
+-- Copies without a location are counted under ''.
+CREATE TABLE IF NOT EXISTS CopyAvailability (
+    isbn VARCHAR(20),                        -- ISBN (FK)
+    location VARCHAR(100),                   -- Location ('' if none)
+    total INT NOT NULL,                      -- Copies at this location
+    available INT NOT NULL,                  -- Of those, copies on the shelf
+    PRIMARY KEY (isbn, location),
+    FOREIGN KEY (isbn) REFERENCES Book(isbn)
+);
+
+-- Start from the copies already in the catalog
+INSERT IGNORE INTO CopyAvailability (isbn, location, total, available)
+    SELECT isbn, COALESCE(location, ''), COUNT(*), SUM(CASE WHEN status = 'Available' THEN 1 ELSE 0 END)
+    FROM Copy GROUP BY isbn, COALESCE(location, '');
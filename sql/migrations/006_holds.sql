@@ -0,0 +1,31 @@
+-- Holds: a per-ISBN queue of members waiting for a title that is out.
+-- On return, crud.checkin hands the copy to the first eligible hold in the
+-- queue ('Waiting' -> 'Ready', with the copy set aside until ready_until);
+-- the member's checkout of that copy marks the hold 'Fulfilled'.
+-- priority is 0 for professors and 1 for everyone else; it only matters
+-- when allocation runs with professor priority.
+CREATE TABLE IF NOT EXISTS Hold (
+    hold_id INT PRIMARY KEY,                 -- HoldID
+    member_id INT NOT NULL,                  -- MemberID (FK)
+    isbn VARCHAR(20) NOT NULL,               -- ISBN (FK)
+    priority INT NOT NULL,                   -- Queue class (lower goes first)
+    placed_at DATETIME NOT NULL,             -- When the hold was placed
+    status ENUM('Waiting','Ready','Fulfilled','Cancelled','Expired') NOT NULL, -- Hold status
+    copy_id INT,                             -- Copy set aside once Ready
+    ready_until DATE,                        -- Pickup deadline once Ready
+    FOREIGN KEY (member_id) REFERENCES Member(member_id),
+    FOREIGN KEY (isbn) REFERENCES Book(isbn)
+);
+
+-- Head of the queue for a title, FIFO (hold ids are handed out in order)
+-- and with professor priority; either way one index seek per return.
+-- A member's own holds, and ready holds past their pickup date.
+ALTER TABLE Hold
+    ADD INDEX idx_hold_queue (isbn, status, hold_id),
+    ADD INDEX idx_hold_priority_queue (isbn, status, priority, hold_id),
+    ADD INDEX idx_hold_member (member_id, status),
+    ADD INDEX idx_hold_ready (status, ready_until),
+    ALGORITHM=INPLACE, LOCK=NONE;
+
+INSERT IGNORE INTO IdSequence (name, next_id)
+    SELECT 'Hold', COALESCE(MAX(hold_id), 0) + 1 FROM Hold;
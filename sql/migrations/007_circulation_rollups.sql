@@ -0,0 +1,49 @@
+-- Daily rollups of circulation for reports.py. They are refreshed
+-- incrementally from Loan, one closed day at a time, up to the watermark in
+-- RollupWatermark, and reports over any date range read only these tables.
+-- Unknown staff and locations are counted under 0 and ''.
+
+-- Checkouts, returns and late returns per day, title, staff member and shelf location
+CREATE TABLE IF NOT EXISTS CirculationDaily (
+    day DATE NOT NULL,                       -- Checkout or return date
+    isbn VARCHAR(20) NOT NULL,               -- ISBN
+    staff_id INT NOT NULL,                   -- StaffID who made the loan (0 if none)
+    location VARCHAR(100) NOT NULL,          -- Copy location ('' if none)
+    checkouts INT NOT NULL,                  -- Loans made that day
+    returns INT NOT NULL,                    -- Loans returned that day
+    late_returns INT NOT NULL,               -- Of those, returned after the due date
+    PRIMARY KEY (day, isbn, staff_id, location)
+);
+
+-- The same per member
+CREATE TABLE IF NOT EXISTS MemberDaily (
+    day DATE NOT NULL,                       -- Checkout or return date
+    member_id INT NOT NULL,                  -- MemberID
+    checkouts INT NOT NULL,                  -- Loans made that day
+    returns INT NOT NULL,                    -- Loans returned that day
+    late_returns INT NOT NULL,               -- Of those, returned after the due date
+    PRIMARY KEY (day, member_id)
+);
+
+-- Copies out on loan at the end of each day, per location
+CREATE TABLE IF NOT EXISTS LocationDaily (
+    day DATE NOT NULL,                       -- Day
+    location VARCHAR(100) NOT NULL,          -- Copy location ('' if none)
+    checkouts INT NOT NULL,                  -- Loans made that day
+    returns INT NOT NULL,                    -- Loans returned that day
+    on_loan INT NOT NULL,                    -- Copies out at the end of the day
+    PRIMARY KEY (day, location)
+);
+
+-- Last day each rollup has been refreshed through (NULL: never)
+CREATE TABLE IF NOT EXISTS RollupWatermark (
+    name VARCHAR(50) PRIMARY KEY,            -- Rollup name
+    through_day DATE                         -- Last day included
+);
+
+INSERT IGNORE INTO RollupWatermark (name, through_day) VALUES ('circulation', NULL);
+
+-- Refreshes read a day range of checkouts (returns use idx_loan_open_due)
+ALTER TABLE Loan
+    ADD INDEX idx_loan_checkout_date (checkout_date),
+    ALGORITHM=INPLACE, LOCK=NONE;
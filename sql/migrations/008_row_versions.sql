@@ -0,0 +1,12 @@
+-- Row versions for optimistic concurrency. Every UPDATE of these rows bumps
+-- row_version: the update_* functions, checkout/checkin, hold allocation and
+-- overdue processing. Inserted rows (imports and snapshot loads too) start
+-- at 0. update_*(..., expected_version=n) only applies when the row is
+-- still at version n (compare-and-set in the UPDATE's WHERE), so two desks
+-- editing the same record can't silently overwrite each other.
+-- ALGORITHM=INSTANT adds the column without rebuilding the table.
+ALTER TABLE Book ADD COLUMN row_version INT NOT NULL DEFAULT 0, ALGORITHM=INSTANT;
+ALTER TABLE Copy ADD COLUMN row_version INT NOT NULL DEFAULT 0, ALGORITHM=INSTANT;
+ALTER TABLE Member ADD COLUMN row_version INT NOT NULL DEFAULT 0, ALGORITHM=INSTANT;
+ALTER TABLE Staff ADD COLUMN row_version INT NOT NULL DEFAULT 0, ALGORITHM=INSTANT;
+ALTER TABLE Loan ADD COLUMN row_version INT NOT NULL DEFAULT 0, ALGORITHM=INSTANT;
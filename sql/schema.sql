@@ -1,3 +1,6 @@
+-- Baseline schema (version 0). Indexes and later changes live in
+-- sql/migrations and are applied in order by init_db.py.
+
 -- Book Table
 CREATE TABLE IF NOT EXISTS Book (
     isbn VARCHAR(20) PRIMARY KEY,            -- ISBN
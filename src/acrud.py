@@ -0,0 +1,566 @@
+# Imports
+# asyncio: event loop primitives for the pool, cancellation and timeouts
+# mysql.connector.aio: asyncio driver shipped with mysql-connector-python 9.x
+# time: pool idle ages and wait-time counters
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+import mysql.connector.aio
+from mysql.connector import Error
+
+from availability import ADJUST_SQL, ENSURE_SQL, PRUNE_SQL, location_key
+from crud import (TABLE_COLUMNS, TABLE_KEYS, PAGE_SIZE, POOL_SIZE, VERSION_COLUMN, UpdateConflict, update_statement,
+                  COPY_FIRST_LOAN_SQL, HOLD_CANCEL_SQL, HOLD_HEAD_SQL, HOLD_MEMBER_SQL, HOLD_PICKUP_DAYS,
+                  HOLD_READY_SQL, REWIND_ROLLUPS_SQL, _can_hold, _queue_order, _to_date)
+from idgen import ID_BLOCK_SIZE
+
+# Asyncio counterpart of crud.py for async front ends (web/API).
+# Every function is a coroutine with the same name, arguments and return
+# values as its crud.py twin, plus an optional per-query `timeout` in seconds
+# (add_copy needs an explicit copy_id here).
+# Database errors are printed and reported as False/None/[] just like crud.py;
+# a timeout raises TimeoutError and cancellation propagates as usual. In both
+# of those cases the connection is discarded instead of being reused, because
+# the server may still be in the middle of answering it.
+
+# Default per-query timeout in seconds
+QUERY_TIMEOUT = 10.0
+# Seconds to wait for a graceful close of a discarded connection
+CLOSE_TIMEOUT = 1.0
+
+
+class AsyncConnectionPool:
+    """
+    Bounded asyncio pool of mysql.connector.aio connections.
+    Same policy as pool.ConnectionPool: lazy creation up to `size`, LIFO reuse,
+    idle eviction after `idle_timeout`, and a health check (with reconnect)
+    for connections idle longer than `ping_interval`.
+    """
+
+    def __init__(self, factory, size=POOL_SIZE, timeout=30.0, idle_timeout=300.0, ping_interval=1.0):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self._idle = deque()        # (conn, released_at)
+        self._open = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._reconnects = 0
+        self._discarded = 0
+
+    async def acquire(self, timeout=None):
+        """Check a connection out, waiting up to `timeout` seconds for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        stale = []
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                now = time.monotonic()
+                while self._idle and now - self._idle[0][1] > self.idle_timeout:
+                    stale.append(self._idle.popleft()[0])
+                    self._open -= 1
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    conn, released_at = None, now
+                    self._open += 1
+                    break
+                remaining = start + timeout - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise TimeoutError(f"No connection available after {timeout:.1f}s.")
+                try:
+                    await asyncio.wait_for(self._cond.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            self._in_use += 1
+            self._checkouts += 1
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self._waits += 1
+                self._wait_time += waited
+
+        for old in stale:
+            await _close_quietly(old)
+        try:
+            if conn is None:
+                conn = await self.factory()
+                self._created += 1
+            elif time.monotonic() - released_at > self.ping_interval and not await _healthy(conn):
+                await _close_quietly(conn)
+                conn = await self.factory()
+                self._created += 1
+                self._reconnects += 1
+        except BaseException:
+            async with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    async def release(self, conn, broken=False):
+        """Return a connection; broken ones (cancelled/timed-out queries) are closed."""
+        if not broken and getattr(conn, 'in_transaction', False):
+            try:
+                await conn.rollback()
+            except Exception:
+                broken = True
+        async with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._open -= 1
+                self._discarded += broken
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if broken or self._closed:
+            await _close_quietly(conn)
+
+    async def close(self):
+        async with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._open -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            await _close_quietly(conn)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'open': self._open,
+            'in_use': self._in_use,
+            'idle': len(self._idle),
+            'utilization': self._in_use / self.size,
+            'checkouts': self._checkouts,
+            'waits': self._waits,
+            'total_wait_s': self._wait_time,
+            'timeouts': self._timeouts,
+            'created': self._created,
+            'reconnects': self._reconnects,
+            'discarded': self._discarded,
+        }
+
+
+async def _healthy(conn):
+    try:
+        return await conn.is_connected()
+    except Exception:
+        return False
+
+async def _close_quietly(conn):
+    try:
+        await asyncio.wait_for(conn.close(), CLOSE_TIMEOUT)
+    except BaseException:
+        pass
+
+
+# --- Pool Setup ---
+
+_pool = None
+# Hi/lo id blocks, same IdSequence table as idgen.IdAllocator: name -> (next, limit)
+_id_blocks = {}
+_id_lock = None
+
+def init_pool(host, user, password, database, size=POOL_SIZE):
+    """Create the shared asyncio connection pool."""
+    global _pool, _id_lock
+    _id_blocks.clear()
+    _id_lock = asyncio.Lock()
+
+    async def factory():
+        return await mysql.connector.aio.connect(host=host, user=user, password=password, database=database)
+
+    _pool = AsyncConnectionPool(factory, size=size)
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+def pool_stats():
+    if _pool is None:
+        raise RuntimeError("Database connection has not been initialized.")
+    return _pool.stats()
+
+async def _run(sql, params=(), fetch=None, timeout=None):
+    """
+    Run one statement on a pooled connection.
+    fetch is None for writes (commits, returns rowcount), 'one' or 'all' for
+    dict rows. Raises TimeoutError if the statement exceeds `timeout`.
+    """
+    if _pool is None:
+        raise RuntimeError("Database connection has not been initialized.")
+    timeout = QUERY_TIMEOUT if timeout is None else timeout
+    conn = await _pool.acquire()
+    healthy = False
+    try:
+        cursor = await conn.cursor(dictionary=fetch is not None)
+        try:
+            await asyncio.wait_for(cursor.execute(sql, params), timeout)
+            if fetch == 'one':
+                result = await asyncio.wait_for(cursor.fetchone(), timeout)
+            elif fetch == 'all':
+                result = await asyncio.wait_for(cursor.fetchall(), timeout)
+            else:
+                await asyncio.wait_for(conn.commit(), timeout)
+                result = cursor.rowcount
+        except Error:
+            # The server answered with an error; the connection itself is fine
+            healthy = True
+            raise
+        healthy = True
+        await cursor.close()
+        return result
+    finally:
+        await _pool.release(conn, broken=not healthy)
+
+async def _transaction(work, timeout=None):
+    """
+    Run `await work(execute)` as one transaction on a pooled connection.
+    execute(sql, params, fetch=False) returns the rowcount, or the tuple rows
+    with fetch=True. Commits on success and rolls back on a database error
+    or UpdateConflict; `timeout` applies to each statement.
+    """
+    if _pool is None:
+        raise RuntimeError("Database connection has not been initialized.")
+    timeout = QUERY_TIMEOUT if timeout is None else timeout
+    conn = await _pool.acquire()
+    healthy = False
+    try:
+        cursor = await conn.cursor()
+
+        async def execute(sql, params=(), fetch=False):
+            await asyncio.wait_for(cursor.execute(sql, params), timeout)
+            if fetch:
+                return await asyncio.wait_for(cursor.fetchall(), timeout)
+            return cursor.rowcount
+
+        try:
+            result = await work(execute)
+            await asyncio.wait_for(conn.commit(), timeout)
+        except (Error, UpdateConflict):
+            await asyncio.wait_for(conn.rollback(), timeout)
+            healthy = True
+            raise
+        healthy = True
+        await cursor.close()
+        return result
+    finally:
+        await _pool.release(conn, broken=not healthy)
+
+async def _next_id(name):
+    """Async counterpart of IdAllocator.next_id."""
+    async with _id_lock:
+        start, limit = _id_blocks.get(name, (0, 0))
+        if start >= limit:
+            conn = await _pool.acquire()
+            healthy = False
+            try:
+                cursor = await conn.cursor()
+                await cursor.execute("SELECT next_id FROM IdSequence WHERE name = %s FOR UPDATE", (name,))
+                row = await cursor.fetchone()
+                if row is None:
+                    raise RuntimeError(f"No IdSequence row for {name}; run init_db.py to apply migrations.")
+                start, limit = row[0], row[0] + ID_BLOCK_SIZE
+                await cursor.execute("UPDATE IdSequence SET next_id = %s WHERE name = %s", (limit, name))
+                await conn.commit()
+                await cursor.close()
+                healthy = True
+            finally:
+                await _pool.release(conn, broken=not healthy)
+        _id_blocks[name] = (start + 1, limit)
+        return start
+
+def _insert_sql(table):
+    columns = TABLE_COLUMNS[table]
+    return (f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+async def _insert(table, values, what, timeout, id_column=None):
+    """Insert one row; with id_column, a None id is generated and returned."""
+    try:
+        new_id = True
+        if id_column is not None:
+            position = TABLE_COLUMNS[table].index(id_column)
+            new_id = values[position]
+            if new_id is None:
+                new_id = await _next_id(table)
+                values = values[:position] + (new_id,) + values[position + 1:]
+        await _run(_insert_sql(table), values, timeout=timeout)
+        return new_id
+    except Error as e:
+        print(f"Error adding {what}:", e)
+        return False
+
+async def _get(table, where, params, what, timeout):
+    try:
+        return await _run(f"SELECT * FROM {table} WHERE {where}", params, fetch='one', timeout=timeout)
+    except Error as e:
+        print(f"Error fetching {what}:", e)
+        return None
+
+async def _update(table, key, fields, expected_version, what, timeout):
+    try:
+        sql, values = update_statement(table, fields, expected_version)
+    except ValueError as e:
+        print(f"Error updating {what}:", e)
+        return False
+    params = values + list(key) + ([expected_version] if expected_version is not None else [])
+    where = " AND ".join(f"{k} = %s" for k in TABLE_KEYS[table])
+
+    async def work(execute):
+        if await execute(sql, params) > 0:
+            return True
+        if expected_version is None:
+            return False
+        current = await execute(f"SELECT {VERSION_COLUMN} FROM {table} WHERE {where}", key, fetch=True)
+        if current:
+            raise UpdateConflict(table, key, expected_version, current[0][0])
+        return False
+
+    try:
+        return await _transaction(work, timeout)
+    except Error as e:
+        print(f"Error updating {what}:", e)
+        return False
+
+async def _delete(table, where, key, what, timeout):
+    try:
+        return await _run(f"DELETE FROM {table} WHERE {where}", key, timeout=timeout) > 0
+    except Error as e:
+        print(f"Error deleting {what}:", e)
+        return False
+
+
+# --- Book CRUD ---
+
+async def add_book(isbn, title, subject, author, description, timeout=None):
+    """Insert a new book into the Book table."""
+    return await _insert('Book', (isbn, title, subject, author, description), "book", timeout)
+
+async def get_book(isbn, timeout=None):
+    """Fetch a single book by ISBN."""
+    return await _get('Book', "isbn = %s", (isbn,), "book", timeout)
+
+async def update_book(isbn, expected_version=None, timeout=None, **kwargs):
+    """Update book fields given as keyword arguments; expected_version as in crud.update_book."""
+    return await _update('Book', (isbn,), kwargs, expected_version, "book", timeout)
+
+async def delete_book(isbn, timeout=None):
+    """Delete a book by ISBN."""
+    return await _delete('Book', "isbn = %s", (isbn,), "book", timeout)
+
+# --- Copy CRUD ---
+# Copy writes keep CopyAvailability in step and serve the hold queue in the
+# same transaction, as in crud.py
+
+async def _adjust_availability(execute, isbn, location, total, available):
+    location = location_key(location)
+    if total > 0:
+        await execute(ENSURE_SQL, (isbn, location))
+    await execute(ADJUST_SQL, (total, available, isbn, location))
+    if total < 0:
+        await execute(PRUNE_SQL, (isbn, location))
+
+async def _allocate_hold(execute, isbn, copy_id, today):
+    """Async crud._allocate_hold: set the copy aside for the first eligible Waiting hold, if any."""
+    ready_until = today + timedelta(days=HOLD_PICKUP_DAYS)
+    sql = HOLD_HEAD_SQL.format(order=_queue_order(None))
+    while True:
+        head = await execute(sql, (isbn,), fetch=True)
+        if not head:
+            return None
+        hold_id, member_id = head[0]
+        member = await execute(HOLD_MEMBER_SQL, (member_id,), fetch=True)
+        if not _can_hold(member[0], today):
+            await execute(HOLD_CANCEL_SQL, (hold_id,))
+            continue
+        if await execute(HOLD_READY_SQL, (copy_id, ready_until, hold_id)) == 1:
+            return {'hold_id': hold_id, 'member_id': member_id, 'ready_until': ready_until}
+
+async def add_copy(isbn, copy_id, status, location, timeout=None):
+    """
+    Insert a new copy into the Copy table. An 'Available' copy goes to the
+    first waiting hold on the title, if any. Returns True, or False on error.
+    """
+    async def work(execute):
+        shelf_status = status
+        if status == 'Available' and await _allocate_hold(execute, isbn, copy_id, datetime.today().date()):
+            shelf_status = 'Not Available'      # set aside for the hold
+        await execute(_insert_sql('Copy'), (isbn, copy_id, shelf_status, location))
+        await _adjust_availability(execute, isbn, location, 1, int(shelf_status == 'Available'))
+        return True
+
+    try:
+        return await _transaction(work, timeout)
+    except Error as e:
+        print("Error adding copy:", e)
+        return False
+
+async def get_copy(isbn, copy_id, timeout=None):
+    """Fetch a single copy by ISBN and copy_id."""
+    return await _get('Copy', "isbn = %s AND copy_id = %s", (isbn, copy_id), "copy", timeout)
+
+async def update_copy(isbn, copy_id, expected_version=None, timeout=None, **kwargs):
+    """Update copy fields given keyword arguments; a copy put back to 'Available' goes to a waiting hold first."""
+    try:
+        sql, values = update_statement('Copy', kwargs)
+    except ValueError as e:
+        print("Error updating copy:", e)
+        return False
+
+    async def work(execute):
+        old = await execute(f"SELECT status, location, {VERSION_COLUMN} FROM Copy "
+                            "WHERE isbn = %s AND copy_id = %s FOR UPDATE", (isbn, copy_id), fetch=True)
+        if not old:
+            return False
+        status, location, version = old[0]
+        if expected_version is not None and version != expected_version:
+            raise UpdateConflict('Copy', (isbn, copy_id), expected_version, version)
+        await execute(sql, values + [isbn, copy_id])
+        new_status, new_location = kwargs.get('status', status), kwargs.get('location', location)
+        if (new_status == 'Available' and status != 'Available'
+                and await _allocate_hold(execute, isbn, copy_id, datetime.today().date())):
+            await execute("UPDATE Copy SET status = 'Not Available', row_version = row_version + 1 "
+                          "WHERE isbn = %s AND copy_id = %s", (isbn, copy_id))
+            new_status = 'Not Available'
+        if (status, location) != (new_status, new_location):
+            await _adjust_availability(execute, isbn, location, -1, -int(status == 'Available'))
+            await _adjust_availability(execute, isbn, new_location, 1, int(new_status == 'Available'))
+        if new_location != location:
+            # The copy's loans move to the new location in the circulation rollups
+            first = _to_date((await execute(COPY_FIRST_LOAN_SQL, (isbn, copy_id), fetch=True))[0][0])
+            if first is not None:
+                await execute(REWIND_ROLLUPS_SQL, (first - timedelta(days=1), first))
+        return True
+
+    try:
+        return await _transaction(work, timeout)
+    except Error as e:
+        print("Error updating copy:", e)
+        return False
+
+async def delete_copy(isbn, copy_id, timeout=None):
+    """Delete a copy by ISBN and copy_id."""
+    async def work(execute):
+        row = await execute("SELECT status, location FROM Copy WHERE isbn = %s AND copy_id = %s FOR UPDATE",
+                            (isbn, copy_id), fetch=True)
+        if not row:
+            return False
+        status, location = row[0]
+        await execute("DELETE FROM Copy WHERE isbn = %s AND copy_id = %s", (isbn, copy_id))
+        await _adjust_availability(execute, isbn, location, -1, -int(status == 'Available'))
+        return True
+
+    try:
+        return await _transaction(work, timeout)
+    except Error as e:
+        print("Error deleting copy:", e)
+        return False
+
+# --- Member CRUD ---
+
+async def add_member(member_id, name, ssn, address, expiration_date, active_flag, professor_privileges, timeout=None):
+    """Insert a new member into the Member table."""
+    values = (member_id, name, ssn, address, expiration_date, active_flag, professor_privileges)
+    return await _insert('Member', values, "member", timeout, 'member_id')
+
+async def get_member(member_id, timeout=None):
+    """Fetch a single member by member_id."""
+    return await _get('Member', "member_id = %s", (member_id,), "member", timeout)
+
+async def update_member(member_id, expected_version=None, timeout=None, **kwargs):
+    """Update member fields given keyword arguments."""
+    return await _update('Member', (member_id,), kwargs, expected_version, "member", timeout)
+
+async def delete_member(member_id, timeout=None):
+    """Delete a member by member_id."""
+    return await _delete('Member', "member_id = %s", (member_id,), "member", timeout)
+
+# --- Staff CRUD ---
+
+async def add_staff(staff_id, staff_name, staff_role, timeout=None):
+    """Insert a new staff member into the Staff table."""
+    return await _insert('Staff', (staff_id, staff_name, staff_role), "staff", timeout, 'staff_id')
+
+async def get_staff(staff_id, timeout=None):
+    """Fetch a single staff member by staff_id."""
+    return await _get('Staff', "staff_id = %s", (staff_id,), "staff", timeout)
+
+async def update_staff(staff_id, expected_version=None, timeout=None, **kwargs):
+    """Update staff fields given keyword arguments."""
+    return await _update('Staff', (staff_id,), kwargs, expected_version, "staff", timeout)
+
+async def delete_staff(staff_id, timeout=None):
+    """Delete a staff member by staff_id."""
+    return await _delete('Staff', "staff_id = %s", (staff_id,), "staff", timeout)
+
+# --- Loan CRUD ---
+
+async def add_loan(loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date,
+                   overdue_status, staff_id, timeout=None):
+    """Insert a new loan into the Loan table."""
+    values = (loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id)
+    return await _insert('Loan', values, "loan", timeout, 'loan_id')
+
+async def get_loan(loan_id, timeout=None):
+    """Fetch a single loan by loan_id."""
+    return await _get('Loan', "loan_id = %s", (loan_id,), "loan", timeout)
+
+async def update_loan(loan_id, expected_version=None, timeout=None, **kwargs):
+    """Update loan fields given keyword arguments."""
+    return await _update('Loan', (loan_id,), kwargs, expected_version, "loan", timeout)
+
+async def delete_loan(loan_id, timeout=None):
+    """Delete a loan by loan_id."""
+    return await _delete('Loan', "loan_id = %s", (loan_id,), "loan", timeout)
+
+# --- Keyset Pagination ---
+
+async def fetch_page(table, after=None, page_size=PAGE_SIZE, timeout=None):
+    """Async crud.fetch_page: returns (rows, next_after)."""
+    keys = TABLE_KEYS[table]
+    if after is not None and not isinstance(after, tuple):
+        after = (after,)
+    where = ""
+    params = []
+    if after is not None:
+        where = f"WHERE ({', '.join(keys)}) > ({', '.join(['%s'] * len(keys))}) "
+        params.extend(after)
+    params.append(page_size)
+    try:
+        rows = await _run(f"SELECT * FROM {table} {where}ORDER BY {', '.join(keys)} LIMIT %s",
+                          params, fetch='all', timeout=timeout)
+    except Error as e:
+        print(f"Error paging {table}:", e)
+        return [], None
+    if len(rows) < page_size:
+        return rows, None
+    return rows, tuple(rows[-1][k] for k in keys)
+
+async def iter_rows(table, page_size=PAGE_SIZE, after=None, timeout=None):
+    """Async generator over every row of `table` in primary-key order."""
+    while True:
+        rows, after = await fetch_page(table, after, page_size, timeout)
+        for row in rows:
+            yield row
+        if after is None:
+            return
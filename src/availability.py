@@ -0,0 +1,62 @@
+# Imports
+# collections: per-(isbn, location) deltas for bulk copy loads
+from collections import Counter
+
+# Statements that keep CopyAvailability (migration 005) in step with Copy.
+# Callers run them in the same transaction as the Copy change they mirror.
+
+# Make sure the (isbn, location) row exists before adjusting it
+ENSURE_SQL = ("INSERT IGNORE INTO CopyAvailability (isbn, location, total, available) "
+              "VALUES (%s, %s, 0, 0)")
+# Add (total, available) deltas to one (isbn, location) row
+ADJUST_SQL = ("UPDATE CopyAvailability SET total = total + %s, available = available + %s "
+              "WHERE isbn = %s AND location = %s")
+# A copy went on or off the shelf: move `available` at the copy's own location
+SHELVE_SQL = ("UPDATE CopyAvailability SET available = available + %s "
+              "WHERE isbn = %s AND location = "
+              "(SELECT COALESCE(location, '') FROM Copy WHERE isbn = %s AND copy_id = %s)")
+# Drop a location once its last copy is gone (keeps Book rows deletable)
+PRUNE_SQL = "DELETE FROM CopyAvailability WHERE isbn = %s AND location = %s AND total = 0"
+
+
+def location_key(location):
+    """Location as stored in CopyAvailability (the key column can't be NULL)."""
+    return location if location is not None else ''
+
+def copy_deltas(copies):
+    """
+    Sum (isbn, status, location) tuples into [(isbn, location, total, available), ...]
+    for adjusting the summary after a bulk load.
+    """
+    totals, available = Counter(), Counter()
+    for isbn, status, location in copies:
+        key = (isbn, location_key(location))
+        totals[key] += 1
+        available[key] += status == 'Available'
+    return [(isbn, location, totals[isbn, location], available[isbn, location]) for isbn, location in totals]
+
+def rebuild_statements(isbns=None):
+    """[(sql, params), ...] that recompute CopyAvailability from Copy (all of it, or just `isbns`)."""
+    where, params = "", ()
+    if isbns is not None:
+        where = f"WHERE isbn IN ({', '.join(['%s'] * len(isbns))}) "
+        params = tuple(isbns)
+    return [
+        (f"DELETE FROM CopyAvailability {where}", params),
+        ("INSERT INTO CopyAvailability (isbn, location, total, available) "
+         "SELECT isbn, COALESCE(location, ''), COUNT(*), SUM(CASE WHEN status = 'Available' THEN 1 ELSE 0 END) "
+         f"FROM Copy {where}GROUP BY isbn, COALESCE(location, '')", params),
+    ]
+
+def rebuild_availability(cursor, isbns=None):
+    """
+    Recompute CopyAvailability from Copy (all of it, or just `isbns`).
+    Run after Copy rows were changed behind crud.py's back (seed data,
+    hand-written SQL).
+    """
+    if isbns is not None:
+        isbns = list(isbns)
+        if not isbns:
+            return
+    for sql, params in rebuild_statements(isbns):
+        cursor.execute(sql, params)
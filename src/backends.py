@@ -0,0 +1,453 @@
+# Imports
+# os: backend selection from the environment
+# re/functools.lru_cache: MySQL -> SQLite statement translation, cached per statement
+# sqlite3: embedded engine for branch kiosks and CI
+# weakref: cursors don't keep their connection alive
+import os
+import re
+import sqlite3
+import weakref
+from datetime import date, datetime
+from functools import lru_cache
+
+# Storage backends for LibraryMS.
+# A backend opens connections and knows its SQL dialect. The CRUD layer is
+# written in MySQL's dialect with %s placeholders; MySQLBackend runs it as is,
+# SQLiteBackend wraps sqlite3 so the same statements, cursors
+# (conn.cursor(dictionary=True)) and error numbers work in-process.
+
+# Which backend crud.py / init_db.py use: 'mysql' or 'sqlite'
+BACKEND = os.environ.get('LIBRARYMS_BACKEND', 'mysql')
+# The MySQL driver takes longer to import than everything else put together,
+# so it is only loaded when MySQL is the configured backend
+mysql = None
+if BACKEND == 'mysql':
+    try:
+        import mysql.connector
+    except ImportError:     # SQLite-only installs don't need the MySQL driver
+        mysql = None
+
+# Database file for the SQLite backend
+SQLITE_PATH = os.environ.get('LIBRARYMS_SQLITE_PATH', 'library.db')
+# Seconds a SQLite connection waits for another writer before giving up
+SQLITE_BUSY_TIMEOUT = 10.0
+# Compiled statements kept per SQLite connection
+SQLITE_STATEMENT_CACHE = 512
+
+
+class DatabaseError(Exception):
+    """Error raised by the SQLite backend, numbered like the MySQL error it mirrors."""
+
+    def __init__(self, msg, errno=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.errno = errno
+
+class IntegrityError(DatabaseError):
+    pass
+
+# What CRUD code catches: `except Error as e` works for either backend
+Error = (DatabaseError,) + ((mysql.connector.Error,) if mysql is not None else ())
+
+
+# --- MySQL ---
+
+class MySQLBackend:
+    """MySQL server via mysql-connector-python."""
+
+    name = 'mysql'
+    supports_table_stats = True
+
+    def __init__(self, host=None, user=None, password=None, database=None):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.database = database
+
+    def connect(self):
+        if mysql is None:
+            raise RuntimeError("mysql-connector-python is not installed (pip install mysql-connector-python), "
+                               "or LIBRARYMS_BACKEND is not 'mysql' so it was not loaded")
+        config = {'host': self.host, 'user': self.user, 'password': self.password}
+        if self.database:
+            config['database'] = self.database
+        return mysql.connector.connect(**config)
+
+    def check(self, conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def prepared_cursor(self, conn):
+        """Server-side prepared statement: prepared on first execute, then only parameters are sent."""
+        return conn.cursor(prepared=True)
+
+    def stream_cursor(self, conn):
+        """Unbuffered cursor: rows stay on the server until fetched, so a full-table read runs in bounded memory."""
+        return conn.cursor(buffered=False)
+
+    def translate_script(self, statement):
+        """Statements from sql/ files run unchanged on MySQL."""
+        return [statement]
+
+    def explain_sql(self, sql):
+        return "EXPLAIN " + sql
+
+    def set_load_checks(self, cursor, enabled):
+        """Turn foreign-key and unique checks on or off for this session."""
+        value = 1 if enabled else 0
+        cursor.execute(f"SET FOREIGN_KEY_CHECKS = {value}")
+        cursor.execute(f"SET UNIQUE_CHECKS = {value}")
+
+    def lock_migrations(self, cursor, timeout):
+        cursor.execute("SELECT GET_LOCK('libraryms_migrate', %s)", (timeout,))
+        return cursor.fetchone()[0] == 1
+
+    def unlock_migrations(self, cursor):
+        cursor.execute("SELECT RELEASE_LOCK('libraryms_migrate')")
+        cursor.fetchone()
+
+    def estimate_rows(self, cursor, table):
+        """Row count from the optimizer's table statistics (no scan)."""
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def search_query(self, terms, limit, offset):
+        """FULLTEXT search: every term as a required prefix, ranked by natural-language relevance."""
+        sql = ("SELECT isbn, title, subject, author, description, "
+               "MATCH(title, author, subject, description) AGAINST (%s IN NATURAL LANGUAGE MODE) AS relevance "
+               "FROM Book "
+               "WHERE MATCH(title, author, subject, description) AGAINST (%s IN BOOLEAN MODE) "
+               "ORDER BY relevance DESC, isbn "
+               "LIMIT %s OFFSET %s")
+        boolean_query = " ".join(f"+{w}*" for w in terms)
+        return sql, (" ".join(terms), boolean_query, limit, offset)
+
+
+# --- SQLite ---
+
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(" "))
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+_LOCKING_READ = re.compile(r"\s+(FOR\s+UPDATE|FOR\s+SHARE|LOCK\s+IN\s+SHARE\s+MODE)\s*$", re.IGNORECASE)
+_FIRST_WORD = re.compile(r"\s*(\w+)")
+
+@lru_cache(maxsize=1024)
+def _translate(sql):
+    """
+    Rewrite one MySQL-dialect statement for SQLite.
+    Returns (sql, begin) where begin is True if the statement must run inside
+    a write transaction (writes, DDL and locking reads).
+    """
+    locking = bool(_LOCKING_READ.search(sql))
+    if locking:
+        sql = _LOCKING_READ.sub("", sql)
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bGREATEST\(", "MAX(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bLEAST\(", "MIN(", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bNOW\(\)", "CURRENT_TIMESTAMP", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bCURDATE\(\)", "DATE('now')", sql, flags=re.IGNORECASE)
+    first = _FIRST_WORD.match(sql)
+    verb = first.group(1).upper() if first else ''
+    begin = locking or verb not in ('SELECT', 'WITH', 'PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'EXPLAIN')
+    return sql, begin
+
+def _map_error(e):
+    """Turn a sqlite3 error into a DatabaseError carrying the matching MySQL errno."""
+    text = str(e)
+    name = getattr(e, 'sqlite_errorname', '')
+    if isinstance(e, sqlite3.IntegrityError):
+        if 'UNIQUE' in text or 'PRIMARY KEY' in text:
+            return IntegrityError(text, 1062)           # ER_DUP_ENTRY
+        if 'FOREIGN KEY' in text:
+            return IntegrityError(text, 1452)           # ER_NO_REFERENCED_ROW_2
+        if 'CHECK' in text:
+            return IntegrityError(text, 3819)           # ER_CHECK_CONSTRAINT_VIOLATED
+        if 'NOT NULL' in text:
+            return IntegrityError(text, 1048)           # ER_BAD_NULL_ERROR
+        return IntegrityError(text)
+    if name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED')) or 'database is locked' in text:
+        return DatabaseError(text, 1205)                # ER_LOCK_WAIT_TIMEOUT: retryable
+    if 'already exists' in text:
+        return DatabaseError(text, 1061 if 'index' in text else 1050)
+    if 'duplicate column' in text:
+        return DatabaseError(text, 1060)
+    if 'no such index' in text:
+        return DatabaseError(text, 1091)
+    return DatabaseError(text)
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over sqlite3 (tuple or dict rows, %s params)."""
+
+    def __init__(self, connection, dictionary=False):
+        # Like mysql.connector, hold the connection weakly so cached cursors don't keep it alive
+        self._connection = weakref.proxy(connection)
+        self._cursor = connection._conn.cursor()
+        self._dictionary = dictionary
+        self._names = None
+
+    def _run(self, method, sql, params):
+        text, begin = _translate(sql)
+        conn = self._connection._conn
+        try:
+            if begin and not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            method(text, params)
+        except sqlite3.Error as e:
+            raise _map_error(e) from e
+        description = self._cursor.description
+        self._names = [d[0] for d in description] if description else None
+
+    def execute(self, sql, params=()):
+        self._run(self._cursor.execute, sql, tuple(params or ()))
+
+    def executemany(self, sql, seq_params):
+        self._run(self._cursor.executemany, sql, [tuple(p) for p in seq_params])
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self._names, row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self._dictionary:
+            return rows
+        names = self._names
+        return [dict(zip(names, r)) for r in rows]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(self._names or ())
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    mysql.connector-style connection over sqlite3.
+    Like MySQL with autocommit off, writes open a transaction that lasts until
+    commit()/rollback(); it is started with BEGIN IMMEDIATE so the write lock
+    is taken up front (SQLite's equivalent of the FOR UPDATE / LOCK IN SHARE
+    MODE reads the CRUD layer uses). Plain SELECTs outside a transaction run
+    in autocommit and hold no snapshot.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(
+            path,
+            timeout=SQLITE_BUSY_TIMEOUT,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE,
+            uri=path.startswith('file:'),
+        )
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._open = True
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def is_connected(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+        self._conn.close()
+
+
+class SQLiteBackend:
+    """Embedded SQLite database file (WAL mode) for branch kiosks and CI."""
+
+    name = 'sqlite'
+    supports_table_stats = False
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._wal_set = False
+
+    def connect(self):
+        conn = SQLiteConnection(self.path)
+        if not self._wal_set and self.path != ':memory:':
+            # journal_mode is stored in the database file, so once is enough
+            conn._conn.execute("PRAGMA journal_mode = WAL")
+            self._wal_set = True
+        return conn
+
+    def check(self, conn):
+        return conn.is_connected()
+
+    def prepared_cursor(self, conn):
+        """Tuple cursor; sqlite3 keeps the compiled statement in the connection's statement cache."""
+        return conn.cursor()
+
+    def stream_cursor(self, conn):
+        """sqlite3 cursors already step through the result as rows are fetched."""
+        return conn.cursor()
+
+    def translate_script(self, statement):
+        """Rewrite a statement from sql/ (schema, migrations, data) for SQLite."""
+        stripped = statement.strip()
+        if stripped.startswith('/*!'):
+            return []                                   # MySQL-only version comment
+        m = re.match(r"SET\s+(FOREIGN_KEY_CHECKS|UNIQUE_CHECKS)\s*=\s*(\d)", stripped, re.IGNORECASE)
+        if m:
+            if m.group(1).upper() == 'UNIQUE_CHECKS':
+                return []
+            return [f"PRAGMA foreign_keys = {'ON' if m.group(2) == '1' else 'OFF'}"]
+        if re.match(r"CREATE\s+TABLE", stripped, re.IGNORECASE):
+            # ENUM('a','b') -> TEXT CHECK (col IN ('a','b'))
+            return [re.sub(r"(\w+)\s+ENUM\(([^)]*)\)", r"\1 TEXT CHECK (\1 IN (\2))", stripped)]
+        m = re.match(r"ALTER\s+TABLE\s+(\w+)\s+(.*)$", stripped, re.IGNORECASE | re.DOTALL)
+        if m:
+            return self._translate_alter(m.group(1), m.group(2))
+        return [stripped]
+
+    def _translate_alter(self, table, clauses):
+        statements = []
+        for clause in _split_top_level(clauses):
+            words = clause.split()
+            head = " ".join(words[:3]).upper()
+            if head.startswith(('ALGORITHM', 'LOCK')):
+                continue
+            m = re.match(r"ADD\s+(UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\((.*)\)$", clause, re.IGNORECASE | re.DOTALL)
+            if m:
+                unique = "UNIQUE " if m.group(1) else ""
+                statements.append(f"CREATE {unique}INDEX IF NOT EXISTS {m.group(2)} ON {table} ({m.group(3)})")
+                continue
+            m = re.match(r"ADD\s+FULLTEXT\s+(?:INDEX|KEY)\s+\w+\s*\((.*)\)$", clause, re.IGNORECASE | re.DOTALL)
+            if m:
+                statements.extend(_fts_statements(table, [c.strip() for c in m.group(1).split(',')]))
+                continue
+            m = re.match(r"DROP\s+(?:INDEX|KEY)\s+(\w+)$", clause, re.IGNORECASE)
+            if m:
+                statements.append(f"DROP INDEX IF EXISTS {m.group(1)}")
+                continue
+            if head.startswith('ADD'):
+                column = re.sub(r"^ADD\s+(COLUMN\s+)?", "", clause, flags=re.IGNORECASE)
+                statements.append(f"ALTER TABLE {table} ADD COLUMN {column}")
+                continue
+            raise ValueError(f"Can't translate ALTER TABLE clause for SQLite: {clause}")
+        return statements
+
+    def explain_sql(self, sql):
+        # Without the locking clause, so the plan is read without taking the write lock
+        return "EXPLAIN QUERY PLAN " + _LOCKING_READ.sub("", sql)
+
+    def set_load_checks(self, cursor, enabled):
+        # PRAGMA foreign_keys is ignored inside a transaction
+        cursor._connection.commit()
+        cursor.execute(f"PRAGMA foreign_keys = {'ON' if enabled else 'OFF'}")
+
+    def lock_migrations(self, cursor, timeout):
+        # Each migration runs in a write transaction, which SQLite already serializes
+        return True
+
+    def unlock_migrations(self, cursor):
+        pass
+
+    def estimate_rows(self, cursor, table):
+        return None
+
+    def search_query(self, terms, limit, offset):
+        """FTS5 search (Book_fts): every term as a prefix, ranked by bm25."""
+        sql = ("SELECT b.isbn, b.title, b.subject, b.author, b.description, "
+               "-bm25(Book_fts) AS relevance "
+               "FROM Book_fts JOIN Book b ON b.rowid = Book_fts.rowid "
+               "WHERE Book_fts MATCH %s "
+               "ORDER BY relevance DESC, b.isbn "
+               "LIMIT %s OFFSET %s")
+        match = " ".join(f'"{w}"*' for w in terms)
+        return sql, (match, limit, offset)
+
+
+def _split_top_level(text):
+    """Split ALTER TABLE clauses on commas that are not inside parentheses."""
+    parts, depth, current = [], 0, []
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+def _fts_statements(table, columns):
+    """FTS5 index over `columns`, kept in sync with `table` by triggers."""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='rowid')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.rowid, {old}); "
+        f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.rowid, {new}); END",
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+def backend_from_config(prompt_credentials):
+    """Build the configured backend, prompting for MySQL credentials only if needed."""
+    if BACKEND == 'sqlite':
+        return SQLiteBackend(SQLITE_PATH)
+    if BACKEND != 'mysql':
+        raise ValueError(f"Unknown LIBRARYMS_BACKEND {BACKEND!r}; use 'mysql' or 'sqlite'.")
+    return MySQLBackend(*prompt_credentials())
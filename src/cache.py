@@ -0,0 +1,117 @@
+# Imports
+# threading: one lock per cache so desk threads can share it
+# time: TTL expiry
+# collections.OrderedDict: recency order for LRU eviction
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() on a miss (None is a legitimate cached value)
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live.
+
+    Holds at most `maxsize` entries; the least recently used one is evicted
+    when a new key would exceed that. Entries older than `ttl` seconds are
+    treated as misses, which bounds staleness for changes made by other
+    processes that can't invalidate this cache.
+    `key`, if given, maps every key before get/put/invalidate, so spellings
+    of the same key (1001 and '1001') share one entry.
+
+    A value read from the database can be outdated by the time it is put if
+    another thread invalidated the key in between. Take generation() before
+    the read and pass it to put(): the put is dropped if the key (or the
+    whole cache) was invalidated since. The last `maxsize` invalidations are
+    remembered; puts older than the ones forgotten are dropped as well.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, key=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._key = key or (lambda k: k)
+        self._data = OrderedDict()      # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._invalidated = OrderedDict()   # key -> generation it was last invalidated at
+        self._floor = 0                     # puts from before this generation are dropped
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def get(self, key):
+        """Return the cached value, or MISSING."""
+        key = self._key(key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def generation(self):
+        """Token to take before reading a value from the database, for put()."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, generation=None):
+        key = self._key(key)
+        with self._lock:
+            if generation is not None and (generation < self._floor
+                                           or self._invalidated.get(key, 0) > generation):
+                self.stale_puts += 1
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        key = self._key(key)
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                self._floor = self._invalidated.popitem(last=False)[1]
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+
+    def stats(self):
+        """Snapshot of hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl_s': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'stale_puts': self.stale_puts,
+            }
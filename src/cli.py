@@ -0,0 +1,368 @@
+# Imports
+# argparse/shlex: subcommands, and the same commands read from a batch file
+# sys/time: exit status, batch summary
+# datetime: --date options and date fields
+import argparse
+import shlex
+import sys
+import time
+from datetime import date
+from itertools import islice
+
+# Non-interactive front end to crud.py for scripts, cron jobs and bulk desk work:
+#
+#   python3.13 src/cli.py book get 9780131101630
+#   python3.13 src/cli.py member update 1001 address="12 High St" expiration_date=2027-06-30
+#   python3.13 src/cli.py book update 9780131101630 --expected-version 3 subject=Programming
+#   python3.13 src/cli.py --format csv loan list --limit 1000 > loans.csv
+#   python3.13 src/cli.py loan checkout 1001 9780131101630 1 201
+#   python3.13 src/cli.py batch returns.txt --group-size 50
+#
+# crud (and with it the database driver) is imported only when a command runs,
+# so --help and argument errors come back straight away.
+
+RESOURCES = ('book', 'copy', 'member', 'staff', 'loan', 'hold')
+TABLES = {'book': 'Book', 'copy': 'Copy', 'member': 'Member', 'staff': 'Staff', 'loan': 'Loan', 'hold': 'Hold'}
+# Positional key arguments of get/update/delete
+KEYS = {
+    'book': (('isbn', str),),
+    'copy': (('isbn', str), ('copy_id', int)),
+    'member': (('member_id', int),),
+    'staff': (('staff_id', int),),
+    'loan': (('loan_id', int),),
+    'hold': (('hold_id', int),),
+}
+INT_FIELDS = {'copy_id', 'member_id', 'staff_id', 'loan_id', 'hold_id', 'active_flag', 'professor_privileges'}
+DATE_FIELDS = {'expiration_date', 'checkout_date', 'due_date', 'return_date'}
+OUTPUT_FORMATS = ('table', 'csv', 'tsv', 'json', 'jsonl')
+# Commands per transaction in batch mode
+BATCH_GROUP_SIZE = 100
+CLI_POOL_SIZE = 2
+
+crud = None
+
+def _load_crud():
+    global crud
+    if crud is None:
+        import crud as module
+        crud = module
+    return crud
+
+
+# --- Argument Helpers ---
+
+def _value(field, text):
+    """A field=value argument as the type crud expects; NULL means None."""
+    if text.upper() == 'NULL':
+        return None
+    if field in INT_FIELDS:
+        return int(text)
+    if field in DATE_FIELDS:
+        return date.fromisoformat(text)
+    return text
+
+def _fields(pairs):
+    fields = {}
+    for pair in pairs:
+        field, sep, text = pair.partition('=')
+        if not sep or not field:
+            raise ValueError(f"expected field=value, got {pair!r}")
+        fields[field] = _value(field, text)
+    return fields
+
+def _keys(args):
+    return [getattr(args, name) for name, _ in KEYS[args.resource]]
+
+def _print(rows, args):
+    crud.print_table(rows, fmt=args.format, pager=args.format == 'table' and args.pager)
+
+def _done(ok):
+    return 0 if ok else 1
+
+
+# --- Commands ---
+
+def cmd_add(args):
+    add = getattr(crud, f"add_{args.resource}")
+    fields = _fields(args.fields)
+    # Ids and copy numbers are generated when left out
+    for name, kind in KEYS[args.resource]:
+        if kind is int:
+            fields.setdefault(name, None)
+    try:
+        return _done(add(**fields))
+    except TypeError as e:
+        print(f"Cannot add {args.resource}: {e}", file=sys.stderr)
+        return 2
+
+def cmd_get(args):
+    row = getattr(crud, f"get_{args.resource}")(*_keys(args))
+    if row is None:
+        print(f"No {args.resource} found.", file=sys.stderr)
+        return 1
+    _print([row], args)
+    return 0
+
+def cmd_list(args):
+    after = args.after
+    if after is not None and args.resource == 'copy':
+        isbn, _, copy_id = after.partition(':')
+        after = (isbn, int(copy_id))
+    elif after is not None and args.resource != 'book':
+        after = int(after)
+    rows = crud.iter_rows(TABLES[args.resource], after=after)
+    _print(islice(rows, args.limit) if args.limit else rows, args)
+    return 0
+
+def cmd_update(args):
+    update = getattr(crud, f"update_{args.resource}")
+    try:
+        return _done(update(*_keys(args), expected_version=args.expected_version, **_fields(args.fields)))
+    except crud.UpdateConflict as e:
+        print(f"Conflict: {e}", file=sys.stderr)
+        return 1
+    except TypeError as e:
+        print(f"Cannot update {args.resource}: {e}", file=sys.stderr)
+        return 2
+
+def cmd_delete(args):
+    return _done(getattr(crud, f"delete_{args.resource}")(*_keys(args)))
+
+def cmd_search(args):
+    _print(crud.search_books(' '.join(args.query), args.page), args)
+    return 0
+
+def cmd_availability(args):
+    found = crud.availability(args.isbns)
+    if found is None:
+        return 1
+    _print([{'isbn': isbn, 'available': a['available'], 'total': a['total'],
+             'location': ", ".join(f"{loc or '?'} ({n})" for loc, n in a['locations'].items())}
+            for isbn, a in found.items()], args)
+    return 0
+
+def cmd_account(args):
+    account = crud.member_account(args.member_id, history_page_size=args.history)
+    if account is None:
+        print("No member found.", file=sys.stderr)
+        return 1
+    if args.format != 'table':
+        _print([account], args)
+        return 0
+    member = account['member']
+    print(f"{member['name']} (#{member['member_id']}), expires {member['expiration_date']}")
+    print(f"{len(account['open_loans'])} on loan, {account['overdue_count']} overdue, "
+          f"fines due {account['fines_due']:.2f}")
+    crud.print_table(account['open_loans'])
+    print("History:")
+    crud.print_table(account['history'])
+    return 0
+
+def _circulation(work):
+    """Run a checkout/checkin/hold call; a refusal is reported and exits 1."""
+    try:
+        return work()
+    except crud.CirculationError as e:
+        print(f"Refused: {e}", file=sys.stderr)
+        return None
+
+def cmd_checkout(args):
+    loan = _circulation(lambda: crud.checkout(args.member_id, args.isbn, args.copy_id, args.staff_id, args.date))
+    if loan is None:
+        return 1
+    _print([loan], args)
+    return 0
+
+def cmd_checkin(args):
+    loan = _circulation(lambda: crud.checkin(args.loan_id, args.date))
+    if loan is None:
+        return 1
+    _print([loan], args)
+    return 0
+
+def cmd_place_hold(args):
+    hold = _circulation(lambda: crud.place_hold(args.member_id, args.isbn))
+    if hold is None:
+        return 1
+    _print([hold], args)
+    return 0
+
+def cmd_list_holds(args):
+    _print(crud.list_holds(args.isbn, args.limit), args)
+    return 0
+
+def cmd_cancel_hold(args):
+    return _done(_circulation(lambda: crud.cancel_hold(args.hold_id)))
+
+def cmd_expire_holds(args):
+    summary = crud.expire_holds(args.date)
+    if summary is None:
+        return 1
+    _print([summary], args)
+    return _done(not summary['failed'])
+
+
+def run_command(args):
+    """Run one parsed command; returns its exit status."""
+    try:
+        return args.handler(args)
+    except (ValueError, *crud.Error) as e:
+        print(f"{args.resource} {args.verb}: {e}", file=sys.stderr)
+        return 2
+
+
+# --- Batch Files ---
+
+def run_batch(parser, lines, group_size=BATCH_GROUP_SIZE, keep_going=False):
+    """
+    Run one command per line (blank lines and # comments skipped) over one
+    pooled connection, committing every `group_size` commands. If a command
+    fails, its group is rolled back; unless keep_going, the run stops there.
+    Returns the exit status.
+    """
+    started = time.perf_counter()
+    committed = rolled_back = 0
+    group = []          # line numbers in the open transaction
+    failed = False
+    crud.begin_batch()
+    try:
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            group.append(number)
+            try:
+                args = parser.parse_args(shlex.split(line))
+                if args.command == 'batch':
+                    raise ValueError("batch files can't run other batch files")
+                status = run_command(args)
+            except SystemExit:      # argparse already printed the problem
+                status = 2
+            except ValueError as e:
+                print(f"line {number}: {e}", file=sys.stderr)
+                status = 2
+            if status or crud.batch_failed():
+                crud.end_batch(commit=False)
+                rolled_back += len(group)
+                print(f"line {number} failed; rolled back lines {group[0]}-{number}", file=sys.stderr)
+                group = []
+                failed = True
+                crud.begin_batch()
+                if not keep_going:
+                    break
+            elif len(group) >= group_size:
+                crud.end_batch()
+                committed += len(group)
+                group = []
+                crud.begin_batch()
+    finally:
+        if crud.end_batch():
+            committed += len(group)
+        else:
+            rolled_back += len(group)
+    print(f"{committed} command(s) committed, {rolled_back} rolled back in "
+          f"{time.perf_counter() - started:.2f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+# --- Command Line ---
+
+def _add_keys(command, resource):
+    for name, kind in KEYS[resource]:
+        command.add_argument(name, type=kind)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='libraryms', description="Run LibraryMS operations without the menus.")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='table', help="Output mode for results")
+    parser.add_argument('--pager', action='store_true', help="Page table output on a terminal")
+    parser.add_argument('--pool-size', type=int, default=CLI_POOL_SIZE)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    verbs_of = {}
+    for resource in RESOURCES:
+        group = commands.add_parser(resource, help=f"{resource} operations")
+        group.set_defaults(resource=resource)
+        verbs = verbs_of[resource] = group.add_subparsers(dest='verb', required=True)
+        if resource != 'hold':
+            add = verbs.add_parser('add', help=f"Add a {resource}")
+            add.add_argument('fields', nargs='+', metavar='field=value')
+            add.set_defaults(handler=cmd_add)
+            update = verbs.add_parser('update', help=f"Change fields of a {resource}")
+            _add_keys(update, resource)
+            update.add_argument('fields', nargs='+', metavar='field=value')
+            update.add_argument('--expected-version', type=int, metavar='N',
+                                help="Only update if the row_version is still N (see get)")
+            update.set_defaults(handler=cmd_update)
+            delete = verbs.add_parser('delete', help=f"Delete a {resource}")
+            _add_keys(delete, resource)
+            delete.set_defaults(handler=cmd_delete)
+            listing = verbs.add_parser('list', help=f"List {resource} rows in key order")
+            listing.add_argument('--limit', type=int, help="At most this many rows (default: all)")
+            listing.add_argument('--after', help="Start after this key (copies: ISBN:COPY_ID)")
+            listing.set_defaults(handler=cmd_list)
+        get = verbs.add_parser('get', help=f"Show one {resource}")
+        _add_keys(get, resource)
+        get.set_defaults(handler=cmd_get)
+
+    search = verbs_of['book'].add_parser('search', help="Catalog search")
+    search.add_argument('query', nargs='+')
+    search.add_argument('--page', type=int, default=1)
+    search.set_defaults(handler=cmd_search)
+    available = verbs_of['book'].add_parser('availability', help="Copies on the shelf per ISBN")
+    available.add_argument('isbns', nargs='+')
+    available.set_defaults(handler=cmd_availability)
+
+    account = verbs_of['member'].add_parser('account', help="Open loans, fines and recent history")
+    account.add_argument('member_id', type=int)
+    account.add_argument('--history', type=int, default=20, help="History rows to show")
+    account.set_defaults(handler=cmd_account)
+
+    checkout = verbs_of['loan'].add_parser('checkout', help="Lend a copy")
+    for name in ('member_id', 'isbn', 'copy_id', 'staff_id'):
+        checkout.add_argument(name, type=str if name == 'isbn' else int)
+    checkout.add_argument('--date', type=date.fromisoformat, help="Checkout date (default: today)")
+    checkout.set_defaults(handler=cmd_checkout)
+    checkin = verbs_of['loan'].add_parser('checkin', help="Return a loan")
+    checkin.add_argument('loan_id', type=int)
+    checkin.add_argument('--date', type=date.fromisoformat, help="Return date (default: today)")
+    checkin.set_defaults(handler=cmd_checkin)
+
+    hold = verbs_of['hold']
+    place = hold.add_parser('place', help="Join the queue for a title")
+    place.add_argument('member_id', type=int)
+    place.add_argument('isbn')
+    place.set_defaults(handler=cmd_place_hold)
+    queue = hold.add_parser('list', help="The queue for a title")
+    queue.add_argument('isbn')
+    queue.add_argument('--limit', type=int, default=50)
+    queue.set_defaults(handler=cmd_list_holds)
+    cancel = hold.add_parser('cancel', help="Cancel a hold")
+    cancel.add_argument('hold_id', type=int)
+    cancel.set_defaults(handler=cmd_cancel_hold)
+    expire = hold.add_parser('expire', help="Expire uncollected holds and pass the copies on")
+    expire.add_argument('--date', type=date.fromisoformat, help="Today (default: today)")
+    expire.set_defaults(handler=cmd_expire_holds)
+
+    batch = commands.add_parser('batch', help="Run the commands in a file ('-' for stdin)")
+    batch.add_argument('file')
+    batch.add_argument('--group-size', type=int, default=BATCH_GROUP_SIZE, help="Commands per transaction")
+    batch.add_argument('--keep-going', action='store_true', help="Continue after a failed group")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _load_crud()
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=args.pool_size)
+    try:
+        if args.command != 'batch':
+            return run_command(args)
+        if args.file == '-':
+            return run_batch(parser, sys.stdin, args.group_size, args.keep_going)
+        with open(args.file) as f:
+            return run_batch(parser, f, args.group_size, args.keep_going)
+    finally:
+        crud.close_pool()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,61 +1,55 @@
-import mysql.connector
-from mysql.connector import Error
 import getpass
+import logging
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
+from itertools import islice
+
+from availability import (ADJUST_SQL, ENSURE_SQL, PRUNE_SQL, SHELVE_SQL, copy_deltas, location_key,
+                          rebuild_availability)
+from backends import Error, MySQLBackend, SQLiteBackend, backend_from_config
+from cache import LRUCache, MISSING
+from idgen import IdAllocator, sync_sequences, SEQUENCE_COLUMNS
+from metrics import InstrumentedCursor, QueryStats, statement_label
+from pool import ConnectionPool, PoolTimeout
+from render import print_table
 
 # Set to False to prompt for host, user, and database interactively
 USE_DEFAULT = True
 
-# --- Table Printing Helper ---
-def print_table(rows):
-    """Print a list of dicts as a simple table."""
-    if not rows:
-        print("No records found.")
-        return
-    headers = list(rows[0].keys())
-    header_map = {
-        'loan_id': 'Loan #',
-        'member_id': 'Member #',
-        'name': 'Name',
-        'ssn': 'SSN',
-        'address': 'Address',
-        'expiration_date': 'Expiration Date',
-        'active_flag': 'Active',
-        'professor_privileges': 'Privileges',
-        'isbn': 'ISBN',
-        'title': 'Title',
-        'subject': 'Subject',
-        'author': 'Author',
-        'description': 'Description',
-        'copy_id': 'Copy ID',
-        'status': 'Status',
-        'location': 'Location',
-        'checkout_date': 'Checkout Date',
-        'due_date': 'Due Date',
-        'return_date': 'Return Date',
-        'overdue_status': 'Overdue Status',
-        'staff_id': 'Staff ID',
-        'staff_name': 'Staff Name',
-        'staff_role': 'Role'
-    }
-    display_headers = [header_map.get(h, h) for h in headers]
-    # compute column widths based on display headers and data
-    widths = {}
-    for h, dh in zip(headers, display_headers):
-        max_data = max(len(str(r[h])) for r in rows)
-        widths[h] = max(len(dh), max_data)
-
-    # print header
-    header_line = " | ".join(dh.ljust(widths[h]) for h, dh in zip(headers, display_headers))
-    print(header_line)
-    print("-" * len(header_line))
-    # print each row
-    for r in rows:
-        line = " | ".join(str(r[h]).ljust(widths[h]) for h in headers)
-        print(line)
-
-# Module-level connection (initialized on first use)
-_conn = None
+# Maximum number of simultaneous database connections (one per busy desk)
+POOL_SIZE = 32
+
+# Module-level backend, connection pool and id generator (set by init_backend)
+_backend = None
+_pool = None
+_ids = None
+# Per-thread checkout: the connection a thread currently holds and how many
+# nested CRUD calls are using it
+_local = threading.local()
+
+def _id_key(value):
+    """Integer ids arrive as ints or, from the CLI and HTTP API, as digit strings; cache them as ints."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def _copy_key(key):
+    isbn, copy_id = key
+    return isbn, _id_key(copy_id)
+
+# Read-through caches for point lookups (see cache.py). Only rows that exist
+# are cached; add_/update_/delete_ functions invalidate the affected key.
+# The TTL bounds staleness for changes made by other processes. Integer key
+# parts are normalized, so '1001' and 1001 are one entry.
+_book_cache = LRUCache(maxsize=10000, ttl=300)
+_copy_cache = LRUCache(maxsize=10000, ttl=30, key=_copy_key)
+_member_cache = LRUCache(maxsize=10000, ttl=60, key=_id_key)
+_staff_cache = LRUCache(maxsize=1000, ttl=600, key=_id_key)
 
 def prompt_credentials():
     """
@@ -78,451 +72,1602 @@ def prompt_credentials():
     return host, user, password, database
 
 def open_connection(host, user, password, database):
-    config = {
-        'host': host,
-        'user': user,
-        'password': password,
-        'database': database
+    return MySQLBackend(host, user, password, database).connect()
+
+def init_backend(backend, size=POOL_SIZE):
+    """Create the shared connection pool on `backend` (see backends.py)."""
+    global _backend, _pool, _ids
+    _backend = backend
+    _pool = ConnectionPool(backend.connect, size=size, check=backend.check)
+    _ids = IdAllocator(_pool)
+    return _pool
+
+def init_pool(host, user, password, database, size=POOL_SIZE):
+    """Create the shared connection pool on a MySQL server."""
+    return init_backend(MySQLBackend(host, user, password, database), size)
+
+def init_sqlite(path, size=POOL_SIZE):
+    """Create the shared connection pool on an embedded SQLite database file."""
+    return init_backend(SQLiteBackend(path), size)
+
+def close_pool():
+    """Close all pooled connections."""
+    global _backend, _pool, _ids
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+        _ids = None
+        _backend = None
+
+def pool_stats():
+    """Return the pool's wait-time and utilization counters."""
+    if _pool is None:
+        raise RuntimeError("Database connection has not been initialized.")
+    return _pool.stats()
+
+def cache_stats():
+    """Return hit/miss/eviction counters for each point-lookup cache."""
+    return {
+        'book': _book_cache.stats(),
+        'copy': _copy_cache.stats(),
+        'member': _member_cache.stats(),
+        'staff': _staff_cache.stats(),
     }
-    return mysql.connector.connect(**config)
+
+def clear_caches():
+    """Drop every cached row (e.g. after bulk changes made outside this process)."""
+    for cache in (_book_cache, _copy_cache, _member_cache, _staff_cache):
+        cache.clear()
 
 def get_connection():
-    """Return the existing database connection."""
-    global _conn
-    if _conn is None:
+    """
+    Check a connection out of the pool for the calling thread.
+    Nested calls on the same thread share one connection; every call must be
+    paired with release_connection().
+    """
+    if _pool is None:
         raise RuntimeError("Database connection has not been initialized.")
-    return _conn
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _pool.acquire()
+        _local.conn = conn
+        _local.depth = 0
+    _local.depth += 1
+    return conn
 
-def add_book(isbn, title, subject, author, description):
-    """Insert a new book into the Book table."""
+def release_connection(broken=False):
+    """Give the calling thread's connection back once its outermost user is done."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.depth -= 1
+    if _local.depth == 0 or broken:
+        _local.conn = None
+        _local.depth = 0
+        _pool.release(conn, broken=broken)
+
+def _next_ids(table, count=1):
+    """
+    New ids for `table`, reserved on this thread's connection if it holds one
+    (so it never waits on a second). Take ids before writing anything: the
+    reservation commits the connection. Inside a batch it is part of the
+    batch's transaction instead, so no block is kept for other threads.
+    """
+    conn = getattr(_local, 'conn', None)
+    return _ids.next_ids(table, count, conn, shared=not isinstance(conn, _BatchConnection))
+
+def _next_id(table):
+    return _next_ids(table)[0]
+
+
+# --- Batches ---
+
+class _BatchConnection:
+    """
+    The calling thread's connection while a batch is open: commit() is held
+    back until end_batch(); rollback() happens at once and marks the batch failed.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.failed = False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.failed = True
+        self.conn.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def begin_batch():
+    """
+    Run the CRUD calls that follow on this thread as one transaction, on one
+    pooled connection, until end_batch(). A call that fails or is refused
+    rolls back the whole batch so far; batch_failed() tells the caller.
+    """
     conn = get_connection()
+    _local.conn = _BatchConnection(conn)
+
+def batch_failed():
+    return isinstance(getattr(_local, 'conn', None), _BatchConnection) and _local.conn.failed
+
+def end_batch(commit=True):
+    """Commit the batch (unless it failed or commit=False) and release its connection. Returns True if committed."""
+    batch = _local.conn
+    _local.conn = batch.conn
+    try:
+        if commit and not batch.failed:
+            batch.conn.commit()
+            return True
+        batch.conn.rollback()
+        # Rows read inside the rolled-back transaction may have been cached
+        clear_caches()
+        return False
+    finally:
+        release_connection()
+
+# --- Query Instrumentation ---
+
+# Statements slower than this are logged with their EXPLAIN plan
+SLOW_QUERY_SECONDS = 0.2
+# Explain the same slow statement at most this often (seconds)
+SLOW_EXPLAIN_INTERVAL = 60.0
+# How long the slow-query log waits for a spare connection to run EXPLAIN on
+EXPLAIN_TIMEOUT = 0.5
+EXPLAINABLE = {'SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE'}
+
+# Every statement crud runs is timed into this registry (see metrics.py)
+_query_stats = QueryStats()
+_slow_log = logging.getLogger('libraryms.slow_query')
+_explained = {}         # sql -> when it was last explained
+
+def open_cursor(conn, dictionary=False):
+    """A cursor on `conn` whose statements are timed and counted in query_stats()."""
+    return InstrumentedCursor(conn.cursor(dictionary=dictionary), _query_stats,
+                              SLOW_QUERY_SECONDS, _log_slow_query)
+
+def open_stream(conn):
+    """An instrumented unbuffered tuple cursor for reading a whole table with fetchmany()."""
+    return InstrumentedCursor(_backend.stream_cursor(conn), _query_stats,
+                              SLOW_QUERY_SECONDS, _log_slow_query)
+
+def _explain(sql, params):
+    """
+    The plan for `sql`, taken on another pooled connection so the slow
+    statement's own cursor and transaction are left alone. None if no
+    connection is free right away.
+    """
+    try:
+        conn = _pool.acquire(timeout=EXPLAIN_TIMEOUT)
+    except PoolTimeout:
+        return None
     cursor = conn.cursor()
-    sql = ("INSERT INTO Book (isbn, title, subject, author, description) "
-           "VALUES (%s, %s, %s, %s, %s)")
     try:
-        cursor.execute(sql, (isbn, title, subject, author, description))
-        conn.commit()
-        return True
+        cursor.execute(_backend.explain_sql(sql), params)
+        columns = cursor.column_names
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
     except Error as e:
-        print("Error adding book:", e)
-        return False
+        return f"EXPLAIN failed: {e}"
     finally:
         cursor.close()
+        _pool.release(conn)
+
+def _log_slow_query(sql, params, seconds):
+    """Log a statement that exceeded SLOW_QUERY_SECONDS, with its plan."""
+    plan = None
+    now = time.monotonic()
+    verb = sql.lstrip().split(None, 1)[0].upper()
+    if verb in EXPLAINABLE and now - _explained.get(sql, -SLOW_EXPLAIN_INTERVAL) >= SLOW_EXPLAIN_INTERVAL:
+        _explained[sql] = now
+        plan = _explain(sql, params)
+    _slow_log.warning("slow query (%.1f ms): %s params=%r plan=%s",
+                      seconds * 1e3, statement_label(sql, 500), tuple(params), plan)
 
-def get_book(isbn):
-    """Fetch a single book by ISBN."""
+def query_stats():
+    """Per-statement calls, errors, lock waits, rows and latency percentiles."""
+    return _query_stats.snapshot()
+
+def reset_query_stats():
+    _query_stats.reset()
+
+def metrics_text():
+    """Query, pool and cache metrics in Prometheus text format (for /metrics)."""
+    lines = [_query_stats.prometheus()]
+    if _pool is not None:
+        pool = _pool.stats()
+        for name in ('in_use', 'idle', 'open', 'size'):
+            lines.append(f"# TYPE libraryms_pool_{name} gauge\nlibraryms_pool_{name} {pool[name]}")
+        for name in ('checkouts', 'waits', 'timeouts', 'created', 'reconnects', 'evicted'):
+            lines.append(f"# TYPE libraryms_pool_{name}_total counter\nlibraryms_pool_{name}_total {pool[name]}")
+        lines.append(f"# TYPE libraryms_pool_wait_seconds_total counter\n"
+                     f"libraryms_pool_wait_seconds_total {pool['total_wait_s']:.6f}")
+    caches = cache_stats()
+    for name in ('hits', 'misses', 'evictions'):
+        lines.append(f"# TYPE libraryms_cache_{name}_total counter")
+        for cache, stats in caches.items():
+            lines.append(f'libraryms_cache_{name}_total{{cache="{cache}"}} {stats[name]}')
+    return "\n".join(lines) + "\n"
+
+# --- Prepared Statements ---
+
+# Prepared statements kept per connection (the fixed SQL of the hot paths)
+STATEMENT_CACHE_SIZE = 64
+# Row shapes the point lookups can return
+ROW_MODES = ('dict', 'tuple', 'namedtuple')
+
+# connection -> OrderedDict(sql -> prepared cursor); entries die with their connection
+_statements = weakref.WeakKeyDictionary()
+_statements_lock = threading.Lock()
+# column names -> namedtuple class for row_mode='namedtuple'
+_row_types = {}
+
+def _execute(conn, sql, params=()):
+    """
+    Run one of the fixed statements through `conn`'s prepared-statement cache
+    and return its cursor. The statement is prepared on first use and its
+    cursor is reused afterwards, so later calls only send parameters. The
+    cursor belongs to the cache: fetch all rows and don't close it.
+    """
+    with _statements_lock:
+        cache = _statements.get(conn)
+        if cache is None:
+            cache = _statements[conn] = OrderedDict()
+    cursor = cache.get(sql)
+    if cursor is None:
+        cursor = cache[sql] = InstrumentedCursor(_backend.prepared_cursor(conn), _query_stats,
+                                                  SLOW_QUERY_SECONDS, _log_slow_query)
+        if len(cache) > STATEMENT_CACHE_SIZE:
+            cache.popitem(last=False)[1].close()
+    else:
+        cache.move_to_end(sql)
+    try:
+        cursor.execute(sql, params)
+    except Error:
+        # Don't reuse a cursor that may be left mid-result; prepare afresh next time
+        cache.pop(sql, None)
+        raise
+    return cursor
+
+def _fetch_one(cursor):
+    """First row of a point query (reads the whole result so the cursor can be reused)."""
+    rows = cursor.fetchall()
+    return rows[0] if rows else None
+
+def _shape(columns, row, row_mode):
+    """Build a tuple row into the requested shape."""
+    if row is None or row_mode == 'tuple':
+        return row
+    if row_mode == 'dict':
+        return dict(zip(columns, row))
+    if row_mode == 'namedtuple':
+        row_type = _row_types.get(columns)
+        if row_type is None:
+            row_type = _row_types[columns] = namedtuple('Row', columns)
+        return row_type._make(row)
+    raise ValueError(f"row_mode must be one of {ROW_MODES}")
+
+def _lookup(cache, key, sql, params, row_mode, noun):
+    """
+    Point lookup through `cache` (None for no cache) and the prepared-statement
+    cache. Rows are cached as (columns, tuple) and shaped per call.
+    """
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not MISSING:
+            return _shape(*cached, row_mode)
+        # A write that invalidates the key while we read keeps our row out of the cache
+        generation = cache.generation()
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM Book WHERE isbn = %s", (isbn,))
-        return cursor.fetchone()
+        cursor = _execute(conn, sql, params)
+        row = _fetch_one(cursor)
+        if row is None:
+            return None
+        columns = tuple(cursor.column_names)
+        if cache is not None:
+            cache.put(key, (columns, row), generation)
+        return _shape(columns, row, row_mode)
     except Error as e:
-        print("Error fetching book:", e)
+        print(f"Error fetching {noun}:", e)
         return None
+    finally:
+        release_connection()
+
+# --- Keyset Pagination ---
+
+# Rows fetched per round trip when paging through a table
+PAGE_SIZE = 500
+# Below this many (estimated) rows an exact COUNT(*) is cheap enough to run
+EXACT_COUNT_THRESHOLD = 10000
+
+# Primary key columns per table, used to page with WHERE pk > last ORDER BY pk
+TABLE_KEYS = {
+    'Book': ('isbn',),
+    'Copy': ('isbn', 'copy_id'),
+    'Member': ('member_id',),
+    'Staff': ('staff_id',),
+    'Loan': ('loan_id',),
+    'Hold': ('hold_id',),
+}
+
+def fetch_page(table, after=None, page_size=PAGE_SIZE):
+    """
+    Fetch the page of rows whose primary key comes right after `after`.
+    Returns (rows, next_after); next_after is None once the table is exhausted.
+    Each page is an index range scan on the primary key, so page N costs the
+    same as page 1 no matter how large the table is.
+    """
+    keys = TABLE_KEYS[table]
+    if after is not None and not isinstance(after, tuple):
+        after = (after,)
+    where = ""
+    params = []
+    if after is not None:
+        where = f"WHERE ({', '.join(keys)}) > ({', '.join(['%s'] * len(keys))}) "
+        params.extend(after)
+    sql = f"SELECT * FROM {table} {where}ORDER BY {', '.join(keys)} LIMIT %s"
+    params.append(page_size)
+    conn = get_connection()
+    cursor = open_cursor(conn, dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    except Error as e:
+        print(f"Error paging {table}:", e)
+        return [], None
     finally:
         cursor.close()
+        release_connection()
+    if len(rows) < page_size:
+        return rows, None
+    last = rows[-1]
+    return rows, tuple(last[k] for k in keys)
 
-def list_books():
-    """List books, prompting the user for how many to return."""
+def iter_rows(table, page_size=PAGE_SIZE, after=None):
+    """
+    Stream every row of `table` in primary-key order, one page at a time.
+    Only one page is held in memory, and the connection goes back to the pool
+    between pages so a slow consumer doesn't pin it.
+    """
+    while True:
+        rows, after = fetch_page(table, after, page_size)
+        yield from rows
+        if after is None:
+            return
+
+def iter_books(page_size=PAGE_SIZE, after=None):
+    """Stream books in ISBN order."""
+    return iter_rows('Book', page_size, after)
+
+def iter_copies(page_size=PAGE_SIZE, after=None):
+    """Stream copies in (isbn, copy_id) order."""
+    return iter_rows('Copy', page_size, after)
+
+def iter_members(page_size=PAGE_SIZE, after=None):
+    """Stream members in member_id order."""
+    return iter_rows('Member', page_size, after)
+
+def iter_staff(page_size=PAGE_SIZE, after=None):
+    """Stream staff in staff_id order."""
+    return iter_rows('Staff', page_size, after)
+
+def iter_loans(page_size=PAGE_SIZE, after=None):
+    """Stream loans in loan_id order."""
+    return iter_rows('Loan', page_size, after)
+
+def count_rows(table, exact=False):
+    """
+    Return the number of rows in `table`.
+    Unless exact is True, large tables are answered from the optimizer's
+    table statistics (on backends that keep them) instead of a full COUNT(*) scan.
+    """
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = open_cursor(conn)
     try:
-        # Show total number of books
-        cursor.execute("SELECT COUNT(*) AS total FROM Book;")
-        total = cursor.fetchone()['total']
-        print(f"There are {total} books in the database.")
-        count = input("How many books would you like to list? [10]: ").strip()
-        try:
-            n = int(count)
-        except ValueError:
-            print("Invalid number; defaulting to 10.")
-            n = 10
-        cursor.execute("SELECT * FROM Book LIMIT %s", (n,))
-        return cursor.fetchall()
+        if not exact and _backend.supports_table_stats:
+            estimate = _backend.estimate_rows(cursor, table)
+            if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+                return estimate
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        return cursor.fetchone()[0]
     except Error as e:
-        print("Error listing books:", e)
-        return []
+        print(f"Error counting {table}:", e)
+        return None
     finally:
         cursor.close()
+        release_connection()
+
+def _list_prompt(table, noun):
+    """
+    Report the table size, ask how many rows to show, and stream that many
+    (an iterator, so print_table can start before the rest is fetched).
+    """
+    total = count_rows(table)
+    if total is not None:
+        about = "" if total < EXACT_COUNT_THRESHOLD else "about "
+        print(f"There are {about}{total} {noun} in the database.")
+    count = input(f"How many {noun} would you like to list? (a number or 'all') [10]: ").strip()
+    if count.lower() == 'all':
+        return iter_rows(table)
+    try:
+        n = int(count)
+    except ValueError:
+        print("Invalid number; defaulting to 10.")
+        n = 10
+    return islice(iter_rows(table, page_size=max(1, min(n, PAGE_SIZE))), n)
+
+# --- Optimistic Updates ---
+
+# Columns the update_* functions may change, per table. Field names from
+# callers only select from these lists; the SQL is built from them, never
+# from the caller's keys. Primary keys are not updatable.
+UPDATABLE_COLUMNS = {
+    'Book': ('title', 'subject', 'author', 'description'),
+    'Copy': ('status', 'location'),
+    'Member': ('name', 'ssn', 'address', 'expiration_date', 'active_flag', 'professor_privileges'),
+    'Staff': ('staff_name', 'staff_role'),
+    'Loan': ('member_id', 'isbn', 'copy_id', 'checkout_date', 'due_date', 'return_date',
+             'overdue_status', 'staff_id'),
+}
+# Bumped by every write (migration 008)
+VERSION_COLUMN = 'row_version'
+
+class UpdateConflict(Exception):
+    """A compare-and-set update found the row at another version than the caller read."""
+
+    def __init__(self, table, key, expected, current):
+        super().__init__(f"{table} {'/'.join(map(str, key))} was changed by someone else "
+                         f"(expected version {expected}, now {current}).")
+        self.table = table
+        self.key = key
+        self.expected = expected
+        self.current = current
+
+def update_statement(table, fields, expected_version=None):
+    """
+    (sql, values) for one UPDATE that sets `fields` and bumps the row version,
+    keyed by TABLE_KEYS[table] (key values go after `values`, then the expected
+    version if given). Raises ValueError for fields not in UPDATABLE_COLUMNS.
+    The same set of fields always gives the same SQL, so it stays prepared.
+    """
+    allowed = UPDATABLE_COLUMNS[table]
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise ValueError(f"can't update {', '.join(sorted(unknown))}; "
+                         f"updatable {table} fields: {', '.join(allowed)}")
+    if not fields:
+        raise ValueError("no fields to update")
+    columns = [c for c in allowed if c in fields]
+    assignments = ", ".join(f"{c} = %s" for c in columns)
+    where = " AND ".join(f"{k} = %s" for k in TABLE_KEYS[table])
+    if expected_version is not None:
+        where += f" AND {VERSION_COLUMN} = %s"
+    sql = f"UPDATE {table} SET {assignments}, {VERSION_COLUMN} = {VERSION_COLUMN} + 1 WHERE {where}"
+    return sql, [fields[c] for c in columns]
 
-def update_book(isbn, **kwargs):
-    """Update book fields given as keyword arguments."""
+def _current_version(conn, table, key):
+    where = " AND ".join(f"{k} = %s" for k in TABLE_KEYS[table])
+    row = _fetch_one(_execute(conn, f"SELECT {VERSION_COLUMN} FROM {table} WHERE {where}", key))
+    return None if row is None else row[0]
+
+def _update_row(table, key, fields, expected_version, cache, noun):
+    """
+    Apply an update_* call as one statement. Returns True if the row was
+    updated, False if it doesn't exist or the update failed; raises
+    UpdateConflict if expected_version no longer matches.
+    """
+    try:
+        sql, values = update_statement(table, fields, expected_version)
+    except ValueError as e:
+        print(f"Error updating {noun}:", e)
+        return False
+    params = values + list(key) + ([expected_version] if expected_version is not None else [])
     conn = get_connection()
-    cursor = conn.cursor()
-    fields = ", ".join(f"{col} = %s" for col in kwargs)
-    values = list(kwargs.values()) + [isbn]
-    sql = f"UPDATE Book SET {fields} WHERE isbn = %s"
+    current = None
     try:
-        cursor.execute(sql, values)
+        updated = _execute(conn, sql, params).rowcount > 0
+        if not updated and expected_version is not None:
+            current = _current_version(conn, table, key)
         conn.commit()
-        return cursor.rowcount > 0
     except Error as e:
-        print("Error updating book:", e)
+        conn.rollback()
+        print(f"Error updating {noun}:", e)
         return False
+    finally:
+        if cache is not None:
+            cache.invalidate(key[0] if len(key) == 1 else tuple(key))
+        release_connection()
+    if current is not None:
+        raise UpdateConflict(table, key, expected_version, current)
+    return updated
+
+
+# --- Book CRUD ---
+
+def add_book(isbn, title, subject, author, description):
+    """Insert a new book into the Book table."""
+    conn = get_connection()
+    sql = ("INSERT INTO Book (isbn, title, subject, author, description) "
+           "VALUES (%s, %s, %s, %s, %s)")
+    try:
+        _execute(conn, sql, (isbn, title, subject, author, description))
+        conn.commit()
+        _book_cache.invalidate(isbn)
+        return True
+    except Error as e:
+        print("Error adding book:", e)
+        return False
+    finally:
+        release_connection()
+
+def get_book(isbn, row_mode='dict'):
+    """Fetch a single book by ISBN. row_mode: 'dict' (default), 'tuple' or 'namedtuple'."""
+    return _lookup(_book_cache, isbn, "SELECT * FROM Book WHERE isbn = %s", (isbn,), row_mode, 'book')
+
+def list_books():
+    """List books, prompting the user for how many to return."""
+    return _list_prompt('Book', 'books')
+
+# Results per page for catalog search
+SEARCH_PAGE_SIZE = 20
+# InnoDB ignores words shorter than innodb_ft_min_token_size (default 3)
+SEARCH_MIN_WORD = 3
+
+def _search_terms(query):
+    """Split a patron's query into words safe for a BOOLEAN MODE match."""
+    words = re.findall(r"\w+", query)
+    return [w for w in words if len(w) >= SEARCH_MIN_WORD]
+
+def search_books(query, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Relevance-ranked catalog search over title, author, subject and description.
+    Every word must match (as a prefix, so "pyth" finds "Python"); results are
+    ranked by natural-language relevance and returned one page at a time.
+    Served by the ft_book_search FULLTEXT index on MySQL and by the Book_fts
+    FTS5 table on SQLite; the backend supplies the query.
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+    sql, params = _backend.search_query(terms, page_size, (page - 1) * page_size)
+    conn = get_connection()
+    cursor = open_cursor(conn, dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    except Error as e:
+        print("Error searching books:", e)
+        return []
     finally:
         cursor.close()
+        release_connection()
+
+def update_book(isbn, expected_version=None, **kwargs):
+    """
+    Update book fields given as keyword arguments, in one statement.
+    With expected_version, only if the book is still at that row_version
+    (raises UpdateConflict otherwise).
+    """
+    return _update_row('Book', (isbn,), kwargs, expected_version, _book_cache, 'book')
 
 def delete_book(isbn):
     """Delete a book by ISBN."""
     conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM Book WHERE isbn = %s", (isbn,))
+        cursor = _execute(conn, "DELETE FROM Book WHERE isbn = %s", (isbn,))
         conn.commit()
+        _book_cache.invalidate(isbn)
         return cursor.rowcount > 0
     except Error as e:
         print("Error deleting book:", e)
         return False
     finally:
-        cursor.close()
+        release_connection()
 
  # --- Copy CRUD ---
 
+# The circulation rollups (reports.py) count a copy's loans under its current
+# location, so moving a copy changes days they already cover: the watermark
+# goes back to the day before its first loan and the next refresh recomputes from there
+COPY_FIRST_LOAN_SQL = "SELECT MIN(checkout_date) FROM Loan WHERE isbn = %s AND copy_id = %s"
+REWIND_ROLLUPS_SQL = "UPDATE RollupWatermark SET through_day = %s WHERE through_day >= %s"
+
+def _rewind_rollups(conn, isbn, copy_id):
+    first = _to_date(_fetch_one(_execute(conn, COPY_FIRST_LOAN_SQL, (isbn, copy_id)))[0])
+    if first is not None:
+        _execute(conn, REWIND_ROLLUPS_SQL, (first - timedelta(days=1), first))
+
 def add_copy(isbn, copy_id, status, location):
-    """Insert a new copy into the Copy table."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """
+    Insert a new copy into the Copy table.
+    Pass copy_id=None to number it after the highest copy of that ISBN; the
+    ISBN's key range is locked so two desks can't pick the same number.
+    An 'Available' copy goes to the first waiting hold on the title, if any,
+    instead of the shelf. Returns the copy_id, or False on error.
+    """
     sql = ("INSERT INTO Copy (isbn, copy_id, status, location) "
            "VALUES (%s, %s, %s, %s)")
+
+    def work(conn):
+        new_id = copy_id
+        if new_id is None:
+            cursor = _execute(conn, "SELECT COALESCE(MAX(copy_id), 0) + 1 FROM Copy WHERE isbn = %s FOR UPDATE",
+                              (isbn,))
+            new_id = _fetch_one(cursor)[0]
+        shelf_status = status
+        if status == 'Available' and _allocate_hold(conn, isbn, new_id, datetime.today().date()):
+            shelf_status = 'Not Available'      # set aside for the hold
+        _execute(conn, sql, (isbn, new_id, shelf_status, location))
+        _adjust_availability(conn, isbn, location, 1, int(shelf_status == 'Available'))
+        return new_id
+
     try:
-        cursor.execute(sql, (isbn, copy_id, status, location))
-        conn.commit()
-        return True
+        new_id = _run_transaction(work)
+        _copy_cache.invalidate((isbn, new_id))
+        return new_id
     except Error as e:
         print("Error adding copy:", e)
         return False
-    finally:
-        cursor.close()
 
-def get_copy(isbn, copy_id):
-    """Fetch a single copy by ISBN and copy_id."""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+def get_copy(isbn, copy_id, row_mode='dict'):
+    """Fetch a single copy by ISBN and copy_id. row_mode: 'dict' (default), 'tuple' or 'namedtuple'."""
+    return _lookup(_copy_cache, (isbn, copy_id), "SELECT * FROM Copy WHERE isbn = %s AND copy_id = %s",
+                   (isbn, copy_id), row_mode, 'copy')
+
+def list_copies():
+    """List copies, prompting the user for how many to return."""
+    return _list_prompt('Copy', 'copies')
+
+def update_copy(isbn, copy_id, expected_version=None, **kwargs):
+    """
+    Update copy fields given keyword arguments (see update_book for
+    expected_version). A change of status or location is carried into
+    CopyAvailability in the same transaction, and a new location rewinds the
+    circulation rollups to the copy's first loan. A copy put back to
+    'Available' goes to the first waiting hold on the title, if any, as on a return.
+    """
     try:
-        cursor.execute(
-            "SELECT * FROM Copy WHERE isbn = %s AND copy_id = %s",
-            (isbn, copy_id)
-        )
-        return cursor.fetchone()
+        sql, values = update_statement('Copy', kwargs)
+    except ValueError as e:
+        print("Error updating copy:", e)
+        return False
+
+    def work(conn):
+        old = _fetch_one(_execute(
+            conn, f"SELECT status, location, {VERSION_COLUMN} FROM Copy WHERE isbn = %s AND copy_id = %s FOR UPDATE",
+            (isbn, copy_id)))
+        if old is None:
+            return False
+        status, location, version = old
+        if expected_version is not None and version != expected_version:
+            raise UpdateConflict('Copy', (isbn, copy_id), expected_version, version)
+        # The row is locked, so the version check above holds for this UPDATE
+        _execute(conn, sql, values + [isbn, copy_id])
+        new_status, new_location = kwargs.get('status', status), kwargs.get('location', location)
+        if (new_status == 'Available' and status != 'Available'
+                and _allocate_hold(conn, isbn, copy_id, datetime.today().date())):
+            _execute(conn, "UPDATE Copy SET status = 'Not Available', row_version = row_version + 1 "
+                     "WHERE isbn = %s AND copy_id = %s", (isbn, copy_id))
+            new_status = 'Not Available'
+        if (status, location) != (new_status, new_location):
+            _adjust_availability(conn, isbn, location, -1, -int(status == 'Available'))
+            _adjust_availability(conn, isbn, new_location, 1, int(new_status == 'Available'))
+        if new_location != location:
+            _rewind_rollups(conn, isbn, copy_id)
+        return True
+
+    try:
+        return _run_transaction(work)
     except Error as e:
-        print("Error fetching copy:", e)
-        return None
+        print("Error updating copy:", e)
+        return False
     finally:
-        cursor.close()
+        _copy_cache.invalidate((isbn, copy_id))
+
+def delete_copy(isbn, copy_id):
+    """Delete a copy by ISBN and copy_id (and count it out of CopyAvailability)."""
+    def work(conn):
+        row = _fetch_one(_execute(conn, "SELECT status, location FROM Copy WHERE isbn = %s AND copy_id = %s FOR UPDATE",
+                                  (isbn, copy_id)))
+        if row is None:
+            return False
+        _execute(conn, "DELETE FROM Copy WHERE isbn = %s AND copy_id = %s", (isbn, copy_id))
+        _adjust_availability(conn, isbn, row[1], -1, -int(row[0] == 'Available'))
+        return True
 
-def list_copies():
-    """List copies, prompting the user for how many to return."""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        # Show total number of copies
-        cursor.execute("SELECT COUNT(*) AS total FROM Copy;")
-        total = cursor.fetchone()['total']
-        print(f"There are {total} copies in the database.")
-        count = input("How many copies would you like to list? [10]: ").strip()
-        try:
-            n = int(count)
-        except ValueError:
-            print("Invalid number; defaulting to 10.")
-            n = 10
-        cursor.execute("SELECT * FROM Copy LIMIT %s", (n,))
-        return cursor.fetchall()
+        return _run_transaction(work)
     except Error as e:
-        print("Error listing copies:", e)
-        return []
+        print("Error deleting copy:", e)
+        return False
     finally:
-        cursor.close()
+        _copy_cache.invalidate((isbn, copy_id))
+
+# --- Shelf Availability ---
+
+# Most ISBNs looked up per statement; batches are padded to a power of two so
+# only a handful of distinct statements get prepared
+AVAILABILITY_BATCH = 512
+
+def _adjust_availability(conn, isbn, location, total, available):
+    """Add (total, available) to the CopyAvailability row of one ISBN and location."""
+    location = location_key(location)
+    if total > 0:
+        _execute(conn, ENSURE_SQL, (isbn, location))
+    _execute(conn, ADJUST_SQL, (total, available, isbn, location))
+    if total < 0:
+        _execute(conn, PRUNE_SQL, (isbn, location))
+
+def _count_copies(cursor, rows):
+    """Add freshly inserted Copy rows (value tuples) to CopyAvailability."""
+    for isbn, location, total, available in copy_deltas((r[0], r[2], r[3]) for r in rows):
+        cursor.execute(ENSURE_SQL, (isbn, location))
+        cursor.execute(ADJUST_SQL, (total, available, isbn, location))
 
-def update_copy(isbn, copy_id, **kwargs):
-    """Update copy fields given keyword arguments."""
+def availability(isbns):
+    """
+    Shelf availability for many ISBNs at once (e.g. a page of search results):
+      {isbn: {'total': n, 'available': n, 'locations': {location: available}}}
+    `locations` lists only where a copy is on the shelf. Read from the
+    CopyAvailability summary, so no Copy rows are scanned; ISBNs without
+    copies come back with zeros. Returns None on a database error.
+    """
+    isbns = list(dict.fromkeys(isbns))
+    result = {isbn: {'total': 0, 'available': 0, 'locations': {}} for isbn in isbns}
     conn = get_connection()
-    cursor = conn.cursor()
-    fields = ", ".join(f"{col} = %s" for col in kwargs)
-    values = list(kwargs.values()) + [isbn, copy_id]
-    sql = f"UPDATE Copy SET {fields} WHERE isbn = %s AND copy_id = %s"
     try:
-        cursor.execute(sql, values)
-        conn.commit()
-        return cursor.rowcount > 0
+        for start in range(0, len(isbns), AVAILABILITY_BATCH):
+            batch = isbns[start:start + AVAILABILITY_BATCH]
+            size = 1 << (len(batch) - 1).bit_length()
+            batch += batch[-1:] * (size - len(batch))
+            cursor = _execute(conn, "SELECT isbn, location, total, available FROM CopyAvailability "
+                                    f"WHERE isbn IN ({', '.join(['%s'] * size)})", batch)
+            for isbn, location, total, available in cursor.fetchall():
+                entry = result[isbn]
+                entry['total'] += total
+                entry['available'] += available
+                if available:
+                    entry['locations'][location or None] = available
+        return result
     except Error as e:
-        print("Error updating copy:", e)
-        return False
+        print("Error fetching availability:", e)
+        return None
     finally:
-        cursor.close()
+        release_connection()
 
-def delete_copy(isbn, copy_id):
-    """Delete a copy by ISBN and copy_id."""
+def refresh_availability(isbns=None):
+    """Rebuild CopyAvailability from Copy after out-of-band changes; returns True on success."""
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = open_cursor(conn)
     try:
-        cursor.execute(
-            "DELETE FROM Copy WHERE isbn = %s AND copy_id = %s",
-            (isbn, copy_id)
-        )
+        rebuild_availability(cursor, isbns)
         conn.commit()
-        return cursor.rowcount > 0
+        return True
     except Error as e:
-        print("Error deleting copy:", e)
+        conn.rollback()
+        print("Error rebuilding availability:", e)
         return False
     finally:
         cursor.close()
+        release_connection()
 
 # --- Member CRUD ---
 
 def add_member(member_id, name, ssn, address, expiration_date, active_flag, professor_privileges):
-    """Insert a new member into the Member table."""
+    """
+    Insert a new member into the Member table.
+    Pass member_id=None to have one generated. Returns the member_id, or False on error.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
     sql = ("INSERT INTO Member "
            "(member_id, name, ssn, address, expiration_date, active_flag, professor_privileges) "
            "VALUES (%s, %s, %s, %s, %s, %s, %s)")
     try:
-        cursor.execute(sql, (member_id, name, ssn, address, expiration_date, active_flag, professor_privileges))
+        if member_id is None:
+            member_id = _next_id('Member')
+        _execute(conn, sql, (member_id, name, ssn, address, expiration_date, active_flag, professor_privileges))
         conn.commit()
-        return True
+        _member_cache.invalidate(member_id)
+        return member_id
     except Error as e:
         print("Error adding member:", e)
         return False
     finally:
-        cursor.close()
+        release_connection()
 
-def get_member(member_id):
-    """Fetch a single member by member_id."""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT * FROM Member WHERE member_id = %s", (member_id,))
-        return cursor.fetchone()
-    except Error as e:
-        print("Error fetching member:", e)
-        return None
-    finally:
-        cursor.close()
+def get_member(member_id, row_mode='dict'):
+    """Fetch a single member by member_id. row_mode: 'dict' (default), 'tuple' or 'namedtuple'."""
+    return _lookup(_member_cache, member_id, "SELECT * FROM Member WHERE member_id = %s", (member_id,), row_mode, 'member')
 
 def list_members():
     """List members, prompting the user for how many to return."""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Show total number of members
-        cursor.execute("SELECT COUNT(*) AS total FROM Member;")
-        total = cursor.fetchone()['total']
-        print(f"There are {total} members in the database.")
-        count = input("How many members would you like to list? [10]: ").strip()
-        try:
-            n = int(count)
-        except ValueError:
-            print("Invalid number; defaulting to 10.")
-            n = 10
-        cursor.execute("SELECT * FROM Member LIMIT %s", (n,))
-        return cursor.fetchall()
-    except Error as e:
-        print("Error listing members:", e)
-        return []
-    finally:
-        cursor.close()
+    return _list_prompt('Member', 'members')
 
-def update_member(member_id, **kwargs):
-    """Update member fields given keyword arguments."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    fields = ", ".join(f"{col} = %s" for col in kwargs)
-    values = list(kwargs.values()) + [member_id]
-    sql = f"UPDATE Member SET {fields} WHERE member_id = %s"
-    try:
-        cursor.execute(sql, values)
-        conn.commit()
-        return cursor.rowcount > 0
-    except Error as e:
-        print("Error updating member:", e)
-        return False
-    finally:
-        cursor.close()
+def update_member(member_id, expected_version=None, **kwargs):
+    """Update member fields given keyword arguments (see update_book for expected_version)."""
+    return _update_row('Member', (member_id,), kwargs, expected_version, _member_cache, 'member')
 
 def delete_member(member_id):
     """Delete a member by member_id."""
     conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM Member WHERE member_id = %s", (member_id,))
+        cursor = _execute(conn, "DELETE FROM Member WHERE member_id = %s", (member_id,))
         conn.commit()
+        _member_cache.invalidate(member_id)
         return cursor.rowcount > 0
     except Error as e:
         print("Error deleting member:", e)
         return False
     finally:
-        cursor.close()
+        release_connection()
 
 # --- Staff CRUD ---
 
 def add_staff(staff_id, staff_name, staff_role):
-    """Insert a new staff member into the Staff table."""
+    """
+    Insert a new staff member into the Staff table.
+    Pass staff_id=None to have one generated. Returns the staff_id, or False on error.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
     sql = ("INSERT INTO Staff (staff_id, staff_name, staff_role) "
            "VALUES (%s, %s, %s)")
     try:
-        cursor.execute(sql, (staff_id, staff_name, staff_role))
+        if staff_id is None:
+            staff_id = _next_id('Staff')
+        _execute(conn, sql, (staff_id, staff_name, staff_role))
         conn.commit()
-        return True
+        _staff_cache.invalidate(staff_id)
+        return staff_id
     except Error as e:
         print("Error adding staff:", e)
         return False
     finally:
-        cursor.close()
+        release_connection()
 
-def get_staff(staff_id):
-    """Fetch a single staff member by staff_id."""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT * FROM Staff WHERE staff_id = %s", (staff_id,))
-        return cursor.fetchone()
-    except Error as e:
-        print("Error fetching staff:", e)
-        return None
-    finally:
-        cursor.close()
+def get_staff(staff_id, row_mode='dict'):
+    """Fetch a single staff member by staff_id. row_mode: 'dict' (default), 'tuple' or 'namedtuple'."""
+    return _lookup(_staff_cache, staff_id, "SELECT * FROM Staff WHERE staff_id = %s", (staff_id,), row_mode, 'staff')
 
 def list_staff():
     """List staff members, prompting the user for how many to return."""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Show total number of staff
-        cursor.execute("SELECT COUNT(*) AS total FROM Staff;")
-        total = cursor.fetchone()['total']
-        print(f"There are {total} staff members in the database.")
-        count = input("How many staff members would you like to list? [10]: ").strip()
-        try:
-            n = int(count)
-        except ValueError:
-            print("Invalid number; defaulting to 10.")
-            n = 10
-        cursor.execute("SELECT * FROM Staff LIMIT %s", (n,))
-        return cursor.fetchall()
-    except Error as e:
-        print("Error listing staff:", e)
-        return []
-    finally:
-        cursor.close()
+    return _list_prompt('Staff', 'staff members')
 
-def update_staff(staff_id, **kwargs):
-    """Update staff fields given keyword arguments."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    fields = ", ".join(f"{col} = %s" for col in kwargs)
-    values = list(kwargs.values()) + [staff_id]
-    sql = f"UPDATE Staff SET {fields} WHERE staff_id = %s"
-    try:
-        cursor.execute(sql, values)
-        conn.commit()
-        return cursor.rowcount > 0
-    except Error as e:
-        print("Error updating staff:", e)
-        return False
-    finally:
-        cursor.close()
+def update_staff(staff_id, expected_version=None, **kwargs):
+    """Update staff fields given keyword arguments (see update_book for expected_version)."""
+    return _update_row('Staff', (staff_id,), kwargs, expected_version, _staff_cache, 'staff')
 
 def delete_staff(staff_id):
     """Delete a staff member by staff_id."""
     conn = get_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("DELETE FROM Staff WHERE staff_id = %s", (staff_id,))
+        cursor = _execute(conn, "DELETE FROM Staff WHERE staff_id = %s", (staff_id,))
         conn.commit()
+        _staff_cache.invalidate(staff_id)
         return cursor.rowcount > 0
     except Error as e:
         print("Error deleting staff:", e)
         return False
     finally:
-        cursor.close()
+        release_connection()
 
 # --- Loan CRUD ---
 
 def add_loan(loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id):
-    """Insert a new loan into the Loan table."""
+    """
+    Insert a new loan into the Loan table.
+    Pass loan_id=None to have one generated. Returns the loan_id, or False on error.
+    A raw insert for records and imports: it does not claim the copy or check
+    the member, so lend copies with checkout() instead.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
     sql = ("INSERT INTO Loan "
            "(loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id) "
            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)")
     try:
-        cursor.execute(sql, (loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id))
+        if loan_id is None:
+            loan_id = _next_id('Loan')
+        _execute(conn, sql, (loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id))
         conn.commit()
-        return True
+        return loan_id
     except Error as e:
         print("Error adding loan:", e)
         return False
     finally:
-        cursor.close()
+        release_connection()
+
+def get_loan(loan_id, row_mode='dict'):
+    """Fetch a single loan by loan_id. row_mode: 'dict' (default), 'tuple' or 'namedtuple'."""
+    return _lookup(None, loan_id, "SELECT * FROM Loan WHERE loan_id = %s", (loan_id,), row_mode, 'loan')
+
+def list_loans():
+    """List loans, prompting the user for how many to return."""
+    return _list_prompt('Loan', 'loans')
+
+def update_loan(loan_id, expected_version=None, **kwargs):
+    """Update loan fields given keyword arguments (see update_book for expected_version)."""
+    return _update_row('Loan', (loan_id,), kwargs, expected_version, None, 'loan')
+
+def delete_loan(loan_id):
+    """Delete a loan by loan_id."""
+    conn = get_connection()
+    try:
+        cursor = _execute(conn, "DELETE FROM Loan WHERE loan_id = %s", (loan_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+    except Error as e:
+        print("Error deleting loan:", e)
+        return False
+    finally:
+        release_connection()
+
+# --- Circulation ---
+
+# Loan periods in days (professors get the longer one)
+LOAN_DAYS = 30
+PROFESSOR_LOAN_DAYS = 90
+# MySQL deadlock / lock wait timeout: safe to retry the whole transaction
+RETRYABLE_ERRORS = {1205, 1213}
+TRANSACTION_RETRIES = 3
+
+class CirculationError(Exception):
+    """A checkout or return was refused (copy on loan, member expired, ...)."""
 
-def get_loan(loan_id):
-    """Fetch a single loan by loan_id."""
+def _run_transaction(work):
+    """
+    Run work(conn) as one transaction on the calling thread's connection.
+    Commits on success, rolls back on any failure, and retries on deadlocks.
+    """
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT * FROM Loan WHERE loan_id = %s", (loan_id,))
-        return cursor.fetchone()
+        for attempt in range(TRANSACTION_RETRIES):
+            try:
+                result = work(conn)
+                conn.commit()
+                return result
+            except Error as e:
+                conn.rollback()
+                if e.errno not in RETRYABLE_ERRORS or attempt == TRANSACTION_RETRIES - 1:
+                    raise
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        release_connection()
+
+def checkout(member_id, isbn, copy_id, staff_id, checkout_date=None):
+    """
+    Lend a copy to a member in one transaction.
+    The member must be active and unexpired; the copy is claimed with a
+    conditional UPDATE (status must still be 'Available'), so two desks can
+    never lend the same copy. Returns {'loan_id', 'due_date'}, raises
+    CirculationError if the loan is refused, or returns None on a database error.
+    """
+    today = checkout_date or datetime.today().date()
+    if isinstance(today, str):
+        today = datetime.strptime(today, "%Y-%m-%d").date()
+
+    # Taken before the transaction so no row locks are held while a new id
+    # block is reserved; a refused checkout just skips one id
+    loan_id = _next_id('Loan')
+    copy_keys = [(isbn, copy_id)]
+
+    def work(conn):
+        del copy_keys[1:]       # a retried transaction starts over
+        member = _fetch_one(_execute(
+            conn,
+            "SELECT active_flag, expiration_date, professor_privileges "
+            "FROM Member WHERE member_id = %s LOCK IN SHARE MODE",
+            (member_id,)
+        ))
+        if member is None:
+            raise CirculationError(f"Member {member_id} not found.")
+        active, expires, professor = member
+        if not active:
+            raise CirculationError(f"Member {member_id} is not active.")
+        if expires is not None and str(expires) < today.isoformat():
+            raise CirculationError(f"Membership of {member_id} expired on {expires}.")
+
+        claimed = _execute(
+            conn,
+            "UPDATE Copy SET status = 'Not Available', row_version = row_version + 1 "
+            "WHERE isbn = %s AND copy_id = %s AND status = 'Available'",
+            (isbn, copy_id)
+        ).rowcount
+        if claimed == 1:
+            _execute(conn, SHELVE_SQL, (-1, isbn, isbn, copy_id))
+        elif _execute(
+                conn,
+                "UPDATE Hold SET status = 'Fulfilled' "
+                "WHERE isbn = %s AND status = 'Ready' AND copy_id = %s AND member_id = %s",
+                (isbn, copy_id, member_id)
+        ).rowcount != 1:
+            # Neither on the shelf nor set aside for this member
+            cursor = _execute(conn, "SELECT status FROM Copy WHERE isbn = %s AND copy_id = %s", (isbn, copy_id))
+            if _fetch_one(cursor) is None:
+                raise CirculationError(f"Copy {isbn}/{copy_id} not found.")
+            cursor = _execute(conn, "SELECT hold_id FROM Hold WHERE isbn = %s AND status = 'Ready' AND copy_id = %s",
+                              (isbn, copy_id))
+            if _fetch_one(cursor) is not None:
+                raise CirculationError(f"Copy {isbn}/{copy_id} is set aside for another member's hold.")
+            raise CirculationError(f"Copy {isbn}/{copy_id} is already on loan.")
+        # Any other hold this member has on the title is satisfied by this loan
+        copy_keys.extend(_close_member_holds(conn, member_id, isbn, today))
+
+        due = today + timedelta(days=PROFESSOR_LOAN_DAYS if professor else LOAN_DAYS)
+        _execute(
+            conn,
+            "INSERT INTO Loan "
+            "(loan_id, member_id, isbn, copy_id, checkout_date, due_date, return_date, overdue_status, staff_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s, NULL, 'None', %s)",
+            (loan_id, member_id, isbn, copy_id, today, due, staff_id)
+        )
+        return {'loan_id': loan_id, 'due_date': due}
+
+    try:
+        return _run_transaction(work)
     except Error as e:
-        print("Error fetching loan:", e)
+        print("Error checking out copy:", e)
         return None
     finally:
-        cursor.close()
+        for key in copy_keys:
+            _copy_cache.invalidate(key)
 
-def list_loans():
-    """List loans, prompting the user for how many to return."""
+def checkin(loan_id, return_date=None, professor_priority=None):
+    """
+    Close a loan and put its copy back on the shelf in one transaction.
+    The loan row is locked first so a double scan at two desks can't return
+    it twice. A late return marks the loan 'Late'. If the title has holds
+    waiting, the copy is set aside for the first eligible one instead of
+    being shelved (see _pass_on_copy). Returns
+    {'loan_id', 'isbn', 'copy_id', 'days_late', 'hold'} where hold is None or
+    {'hold_id', 'member_id', 'ready_until'}, raises CirculationError if
+    the loan doesn't exist or is already closed, or returns None on a database error.
+    """
+    today = return_date or datetime.today().date()
+    if isinstance(today, str):
+        today = datetime.strptime(today, "%Y-%m-%d").date()
+    copy_key = []
+
+    def work(conn):
+        loan = _fetch_one(_execute(
+            conn,
+            "SELECT isbn, copy_id, due_date, return_date FROM Loan WHERE loan_id = %s FOR UPDATE",
+            (loan_id,)
+        ))
+        if loan is None:
+            raise CirculationError(f"Loan {loan_id} not found.")
+        isbn, copy_id, due, returned = loan
+        copy_key[:] = [isbn, copy_id]
+        if returned is not None:
+            raise CirculationError(f"Loan {loan_id} was already returned on {returned}.")
+        if isinstance(due, str):
+            due = datetime.strptime(due, "%Y-%m-%d").date()
+        days_late = max(0, (today - due).days) if due else 0
+        _execute(
+            conn,
+            "UPDATE Loan SET return_date = %s, overdue_status = %s, row_version = row_version + 1 "
+            "WHERE loan_id = %s",
+            (today, 'Late' if days_late else 'None', loan_id)
+        )
+        hold = _pass_on_copy(conn, isbn, copy_id, today, professor_priority)
+        return {'loan_id': loan_id, 'isbn': isbn, 'copy_id': copy_id, 'days_late': days_late, 'hold': hold}
+
+    try:
+        return _run_transaction(work)
+    except Error as e:
+        print("Error checking in loan:", e)
+        return None
+    finally:
+        if copy_key:
+            _copy_cache.invalidate(tuple(copy_key))
+
+# --- Member Account ---
+
+# Fine per day a loan is kept past its due date, and the most one loan can accrue
+FINE_PER_DAY = 0.25
+MAX_FINE_PER_LOAN = 10.00
+# Returned loans shown per page of account history
+HISTORY_PAGE_SIZE = 20
+
+ACCOUNT_COLUMNS = ("l.member_id, l.loan_id, l.isbn, l.copy_id, l.checkout_date, l.due_date, "
+                   "l.return_date, l.overdue_status, b.title, b.author")
+
+def _account_sql(paged):
+    """
+    The member row joined to their open loans plus one page of returned loans,
+    newest return first. Both halves are ranges on idx_loan_member_return
+    (member_id, return_date), and the history half stops after LIMIT rows, so
+    the cost doesn't grow with the length of the member's history.
+    """
+    after = "AND (l.return_date, l.loan_id) < (%s, %s) " if paged else ""
+    return (
+        "SELECT m.member_id, m.name, m.address, m.expiration_date, m.active_flag, m.professor_privileges, "
+        "x.kind, x.loan_id, x.isbn, x.copy_id, x.checkout_date, x.due_date, x.return_date, "
+        "x.overdue_status, x.title, x.author "
+        "FROM Member m LEFT JOIN ("
+        f"SELECT 'open' AS kind, {ACCOUNT_COLUMNS} "
+        "FROM Loan l LEFT JOIN Book b ON b.isbn = l.isbn "
+        "WHERE l.member_id = %s AND l.return_date IS NULL "
+        "UNION ALL "
+        "SELECT * FROM ("
+        f"SELECT 'history' AS kind, {ACCOUNT_COLUMNS} "
+        "FROM Loan l LEFT JOIN Book b ON b.isbn = l.isbn "
+        f"WHERE l.member_id = %s AND l.return_date IS NOT NULL {after}"
+        "ORDER BY l.return_date DESC, l.loan_id DESC LIMIT %s"
+        ") h"
+        ") x ON x.member_id = m.member_id "
+        "WHERE m.member_id = %s"
+    )
+
+def _to_date(value):
+    """DATE column value as a date (SQLite hands back text from compound queries)."""
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+def _fine(days_late):
+    return round(min(days_late * FINE_PER_DAY, MAX_FINE_PER_LOAN), 2)
+
+def member_account(member_id, history_after=None, history_page_size=HISTORY_PAGE_SIZE, today=None):
+    """
+    Everything a member's account page shows, in one round trip:
+      {'member': {...}, 'open_loans': [...], 'overdue_count': n, 'fines_due': x,
+       'history': [...], 'history_next': (return_date, loan_id) or None}
+    Loans carry the book's title and author, days_late and fine. Open loans
+    accrue FINE_PER_DAY once overdue (up to MAX_FINE_PER_LOAN); fines_due is
+    their total. Pass history_next back as history_after for the next page of
+    returned loans. Returns None if the member doesn't exist or on a database error.
+    """
+    today = _to_date(today) or datetime.today().date()
+    if history_after is None:
+        params = (member_id, member_id, history_page_size + 1, member_id)
+    else:
+        params = (member_id, member_id, *history_after, history_page_size + 1, member_id)
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
     try:
-        # Show total number of loans
-        cursor.execute("SELECT COUNT(*) AS total FROM Loan;")
-        total = cursor.fetchone()['total']
-        print(f"There are {total} loans in the database.")
-        count = input("How many loans would you like to list? [10]: ").strip()
-        try:
-            n = int(count)
-        except ValueError:
-            print("Invalid number; defaulting to 10.")
-            n = 10
-        cursor.execute("SELECT * FROM Loan LIMIT %s", (n,))
-        return cursor.fetchall()
+        cursor = _execute(conn, _account_sql(history_after is not None), params)
+        rows = cursor.fetchall()
     except Error as e:
-        print("Error listing loans:", e)
+        print("Error fetching member account:", e)
+        return None
+    finally:
+        release_connection()
+    if not rows:
+        return None
+
+    first = rows[0]
+    member = dict(zip(('member_id', 'name', 'address', 'expiration_date', 'active_flag', 'professor_privileges'),
+                      first[:6]))
+    member['expiration_date'] = _to_date(member['expiration_date'])
+    open_loans, history = [], []
+    for row in rows:
+        kind, loan_id, isbn, copy_id, checked_out, due, returned, status, title, author = row[6:]
+        if kind is None:
+            continue        # member without loans
+        due, returned = _to_date(due), _to_date(returned)
+        days_late = max(0, ((returned or today) - due).days) if due else 0
+        loan = {'loan_id': loan_id, 'isbn': isbn, 'copy_id': copy_id, 'title': title, 'author': author,
+                'checkout_date': _to_date(checked_out), 'due_date': due, 'return_date': returned,
+                'overdue_status': status, 'days_late': days_late, 'fine': _fine(days_late)}
+        (open_loans if kind == 'open' else history).append(loan)
+
+    open_loans.sort(key=lambda loan: (loan['due_date'] or today, loan['loan_id']))
+    history.sort(key=lambda loan: (loan['return_date'], loan['loan_id']), reverse=True)
+    history_next = None
+    if len(history) > history_page_size:
+        del history[history_page_size:]
+        history_next = (history[-1]['return_date'], history[-1]['loan_id'])
+    overdue = [loan for loan in open_loans if loan['days_late']]
+    return {
+        'member': member,
+        'open_loans': open_loans,
+        'overdue_count': len(overdue),
+        'fines_due': round(sum((loan['fine'] for loan in overdue), 0.0), 2),
+        'history': history,
+        'history_next': history_next,
+    }
+
+# --- Holds ---
+
+# Days a copy set aside for a hold waits for pickup
+HOLD_PICKUP_DAYS = 7
+# Serve professors' holds before everyone else's (FIFO within each group)
+HOLD_PROFESSOR_PRIORITY = False
+# Waiting holds shown by list_holds
+HOLD_LIST_LIMIT = 50
+
+def _queue_order(professor_priority, alias=""):
+    """ORDER BY for a title's queue; each matches one of the Hold queue indexes."""
+    if HOLD_PROFESSOR_PRIORITY if professor_priority is None else professor_priority:
+        return f"{alias}priority, {alias}hold_id"
+    return f"{alias}hold_id"
+
+# Statements of the allocation below (acrud.py runs the same ones)
+HOLD_HEAD_SQL = ("SELECT hold_id, member_id FROM Hold WHERE isbn = %s AND status = 'Waiting' "
+                 "ORDER BY {order} LIMIT 1")
+HOLD_MEMBER_SQL = "SELECT active_flag, expiration_date FROM Member WHERE member_id = %s"
+HOLD_CANCEL_SQL = "UPDATE Hold SET status = 'Cancelled' WHERE hold_id = %s AND status = 'Waiting'"
+HOLD_READY_SQL = ("UPDATE Hold SET status = 'Ready', copy_id = %s, ready_until = %s "
+                  "WHERE hold_id = %s AND status = 'Waiting'")
+
+def _can_hold(member, today):
+    """Whether a (active_flag, expiration_date) member row may still be served a hold."""
+    return bool(member[0]) and (member[1] is None or str(member[1]) >= today.isoformat())
+
+def _allocate_hold(conn, isbn, copy_id, today, professor_priority=None):
+    """
+    Set `copy_id` aside for the first eligible Waiting hold on `isbn`.
+    The head of the queue is one index seek and is claimed with a conditional
+    UPDATE, so two returns of the same title never hand out the same hold.
+    Holds of members who are no longer active or unexpired are cancelled
+    on the way. Returns {'hold_id', 'member_id', 'ready_until'} or None.
+    """
+    ready_until = today + timedelta(days=HOLD_PICKUP_DAYS)
+    sql = HOLD_HEAD_SQL.format(order=_queue_order(professor_priority))
+    while True:
+        head = _fetch_one(_execute(conn, sql, (isbn,)))
+        if head is None:
+            return None
+        hold_id, member_id = head
+        if not _can_hold(_fetch_one(_execute(conn, HOLD_MEMBER_SQL, (member_id,))), today):
+            _execute(conn, HOLD_CANCEL_SQL, (hold_id,))
+            continue
+        if _execute(conn, HOLD_READY_SQL, (copy_id, ready_until, hold_id)).rowcount == 1:
+            return {'hold_id': hold_id, 'member_id': member_id, 'ready_until': ready_until}
+
+def _pass_on_copy(conn, isbn, copy_id, today, professor_priority=None):
+    """
+    A copy came free (returned, or its hold lapsed): give it to the next hold
+    on the title, or put it back on the shelf. Returns the hold it went to, or None.
+    """
+    hold = _allocate_hold(conn, isbn, copy_id, today, professor_priority)
+    if hold is None:
+        shelved = _execute(
+            conn,
+            "UPDATE Copy SET status = 'Available', row_version = row_version + 1 "
+            "WHERE isbn = %s AND copy_id = %s AND status <> 'Available'",
+            (isbn, copy_id)
+        ).rowcount
+        if shelved:
+            _execute(conn, SHELVE_SQL, (1, isbn, isbn, copy_id))
+    return hold
+
+def _close_member_holds(conn, member_id, isbn, today):
+    """
+    Mark a member's open holds on `isbn` Fulfilled after they borrowed it;
+    a copy that was set aside for them is passed on. Returns the copies passed on.
+    """
+    passed = []
+    holds = _execute(
+        conn,
+        "SELECT hold_id, status, copy_id FROM Hold "
+        "WHERE member_id = %s AND status IN ('Waiting', 'Ready') AND isbn = %s FOR UPDATE",
+        (member_id, isbn)
+    ).fetchall()
+    for hold_id, status, held_copy in holds:
+        _execute(conn, "UPDATE Hold SET status = 'Fulfilled' WHERE hold_id = %s", (hold_id,))
+        if status == 'Ready':
+            _pass_on_copy(conn, isbn, held_copy, today)
+            passed.append((isbn, held_copy))
+    return passed
+
+def _queue_position(conn, isbn, priority, hold_id, professor_priority=None):
+    """1-based place of a Waiting hold in its title's queue."""
+    if _queue_order(professor_priority) == "hold_id":
+        sql = "SELECT COUNT(*) FROM Hold WHERE isbn = %s AND status = 'Waiting' AND hold_id < %s"
+        params = (isbn, hold_id)
+    else:
+        sql = ("SELECT COUNT(*) FROM Hold WHERE isbn = %s AND status = 'Waiting' "
+               "AND (priority, hold_id) < (%s, %s)")
+        params = (isbn, priority, hold_id)
+    return _fetch_one(_execute(conn, sql, params))[0] + 1
+
+def place_hold(member_id, isbn, placed_at=None):
+    """
+    Put a member in the queue for a title that has no copy on the shelf.
+    Returns {'hold_id', 'position'}, raises CirculationError if the hold is
+    refused (unknown member or title, inactive or expired member, a copy is
+    available, or the member already holds the title), or returns None on a
+    database error.
+    """
+    placed_at = placed_at or datetime.now().replace(microsecond=0)
+    hold_id = _next_id('Hold')
+
+    def work(conn):
+        # Locking the member row keeps one member from queueing twice at two desks
+        member = _fetch_one(_execute(
+            conn,
+            "SELECT active_flag, expiration_date, professor_privileges FROM Member WHERE member_id = %s FOR UPDATE",
+            (member_id,)
+        ))
+        if member is None:
+            raise CirculationError(f"Member {member_id} not found.")
+        active, expires, professor = member
+        if not active:
+            raise CirculationError(f"Member {member_id} is not active.")
+        if expires is not None and str(expires) < placed_at.date().isoformat():
+            raise CirculationError(f"Membership of {member_id} expired on {expires}.")
+        shelf = _fetch_one(_execute(
+            conn,
+            "SELECT b.isbn, COALESCE(SUM(a.available), 0) FROM Book b "
+            "LEFT JOIN CopyAvailability a ON a.isbn = b.isbn WHERE b.isbn = %s GROUP BY b.isbn",
+            (isbn,)
+        ))
+        if shelf is None:
+            raise CirculationError(f"Book {isbn} not found.")
+        if shelf[1] > 0:
+            raise CirculationError(f"A copy of {isbn} is on the shelf; check it out instead.")
+        existing = _fetch_one(_execute(
+            conn,
+            "SELECT hold_id FROM Hold WHERE member_id = %s AND status IN ('Waiting', 'Ready') AND isbn = %s",
+            (member_id, isbn)
+        ))
+        if existing is not None:
+            raise CirculationError(f"Member {member_id} already has hold #{existing[0]} on {isbn}.")
+        priority = 0 if professor else 1
+        _execute(
+            conn,
+            "INSERT INTO Hold (hold_id, member_id, isbn, priority, placed_at, status, copy_id, ready_until) "
+            "VALUES (%s, %s, %s, %s, %s, 'Waiting', NULL, NULL)",
+            (hold_id, member_id, isbn, priority, placed_at)
+        )
+        return {'hold_id': hold_id, 'position': _queue_position(conn, isbn, priority, hold_id)}
+
+    try:
+        return _run_transaction(work)
+    except Error as e:
+        print("Error placing hold:", e)
+        return None
+
+def get_hold(hold_id):
+    """Fetch a hold by hold_id; Waiting holds also get their queue 'position'."""
+    conn = get_connection()
+    try:
+        cursor = _execute(conn, "SELECT * FROM Hold WHERE hold_id = %s", (hold_id,))
+        hold = _shape(tuple(cursor.column_names), _fetch_one(cursor), 'dict')
+        if hold is not None and hold['status'] == 'Waiting':
+            hold['position'] = _queue_position(conn, hold['isbn'], hold['priority'], hold_id)
+        return hold
+    except Error as e:
+        print("Error fetching hold:", e)
+        return None
+    finally:
+        release_connection()
+
+def list_holds(isbn, limit=HOLD_LIST_LIMIT, professor_priority=None):
+    """A title's open holds: copies waiting for pickup, then the queue in serving order."""
+    conn = get_connection()
+    cursor = open_cursor(conn, dictionary=True)
+    columns = ("h.hold_id, h.member_id, m.name, h.status, h.placed_at, h.copy_id, h.ready_until "
+               "FROM Hold h JOIN Member m ON m.member_id = h.member_id")
+    try:
+        cursor.execute(f"SELECT {columns} WHERE h.isbn = %s AND h.status = 'Ready' ORDER BY h.hold_id", (isbn,))
+        rows = cursor.fetchall()
+        cursor.execute(f"SELECT {columns} WHERE h.isbn = %s AND h.status = 'Waiting' "
+                       f"ORDER BY {_queue_order(professor_priority, 'h.')} "
+                       "LIMIT %s", (isbn, limit))
+        return rows + cursor.fetchall()
+    except Error as e:
+        print("Error listing holds:", e)
         return []
     finally:
         cursor.close()
+        release_connection()
+
+def cancel_hold(hold_id, today=None):
+    """
+    Cancel a Waiting or Ready hold. A copy that was set aside goes to the next
+    hold or back on the shelf. Returns True, or False if there was no open hold
+    (or on a database error).
+    """
+    today = _to_date(today) or datetime.today().date()
+    copy_key = []
+
+    def work(conn):
+        hold = _fetch_one(_execute(
+            conn, "SELECT isbn, status, copy_id FROM Hold WHERE hold_id = %s FOR UPDATE", (hold_id,)
+        ))
+        if hold is None or hold[1] not in ('Waiting', 'Ready'):
+            return False
+        isbn, status, held_copy = hold
+        _execute(conn, "UPDATE Hold SET status = 'Cancelled' WHERE hold_id = %s", (hold_id,))
+        if status == 'Ready':
+            copy_key[:] = [isbn, held_copy]
+            _pass_on_copy(conn, isbn, held_copy, today)
+        return True
 
-def update_loan(loan_id, **kwargs):
-    """Update loan fields given keyword arguments."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    fields = ", ".join(f"{col} = %s" for col in kwargs)
-    values = list(kwargs.values()) + [loan_id]
-    sql = f"UPDATE Loan SET {fields} WHERE loan_id = %s"
     try:
-        cursor.execute(sql, values)
-        conn.commit()
-        return cursor.rowcount > 0
+        return _run_transaction(work)
     except Error as e:
-        print("Error updating loan:", e)
+        print("Error cancelling hold:", e)
         return False
     finally:
-        cursor.close()
+        if copy_key:
+            _copy_cache.invalidate(tuple(copy_key))
 
-def delete_loan(loan_id):
-    """Delete a loan by loan_id."""
+def expire_holds(today=None, professor_priority=None):
+    """
+    Expire Ready holds whose pickup date has passed and pass each copy on to
+    the next hold (or the shelf), one transaction per hold. Run daily.
+    Returns {'expired': n, 'reassigned': n, 'shelved': n, 'failed': n}, or
+    None on a database error. A hold that failed stays Ready for the next run.
+    """
+    today = _to_date(today) or datetime.today().date()
+    summary = {'expired': 0, 'reassigned': 0, 'shelved': 0, 'failed': 0}
     conn = get_connection()
-    cursor = conn.cursor()
+    cursor = open_cursor(conn)
     try:
-        cursor.execute("DELETE FROM Loan WHERE loan_id = %s", (loan_id,))
-        conn.commit()
-        return cursor.rowcount > 0
+        cursor.execute("SELECT hold_id FROM Hold WHERE status = 'Ready' AND ready_until < %s", (today,))
+        lapsed = [row[0] for row in cursor.fetchall()]
     except Error as e:
-        print("Error deleting loan:", e)
-        return False
+        print("Error expiring holds:", e)
+        return None
     finally:
         cursor.close()
+        release_connection()
+
+    for hold_id in lapsed:
+        def work(conn):
+            hold = _fetch_one(_execute(
+                conn, "SELECT isbn, copy_id FROM Hold WHERE hold_id = %s AND status = 'Ready' FOR UPDATE", (hold_id,)
+            ))
+            if hold is None:
+                return None     # picked up or cancelled meanwhile
+            _execute(conn, "UPDATE Hold SET status = 'Expired' WHERE hold_id = %s", (hold_id,))
+            return hold, _pass_on_copy(conn, *hold, today, professor_priority)
+
+        try:
+            result = _run_transaction(work)
+        except Error as e:
+            print(f"Error expiring hold #{hold_id}:", e)
+            summary['failed'] += 1
+            continue
+        if result is None:
+            continue
+        (isbn, copy_id), hold = result
+        summary['expired'] += 1
+        summary['reassigned' if hold else 'shelved'] += 1
+        _copy_cache.invalidate((isbn, copy_id))
+    return summary
+
+# --- Bulk Inserts ---
+
+# Default number of rows sent per multi-row INSERT / transaction
+BATCH_SIZE = 1000
+
+# Insertable columns per table, in the order the add_* functions take them
+TABLE_COLUMNS = {
+    'Book': ('isbn', 'title', 'subject', 'author', 'description'),
+    'Copy': ('isbn', 'copy_id', 'status', 'location'),
+    'Member': ('member_id', 'name', 'ssn', 'address', 'expiration_date',
+               'active_flag', 'professor_privileges'),
+    'Staff': ('staff_id', 'staff_name', 'staff_role'),
+    'Loan': ('loan_id', 'member_id', 'isbn', 'copy_id', 'checkout_date',
+             'due_date', 'return_date', 'overdue_status', 'staff_id'),
+}
+
+def _row_values(columns, row):
+    """Turn a tuple or dict row into a value tuple; raise ValueError if it doesn't fit."""
+    if isinstance(row, dict):
+        unknown = set(row) - set(columns)
+        if unknown:
+            raise ValueError(f"unknown column(s): {', '.join(sorted(unknown))}")
+        missing = [c for c in columns if c not in row]
+        if missing:
+            raise ValueError(f"missing column(s): {', '.join(missing)}")
+        return tuple(row[c] for c in columns)
+    values = tuple(row)
+    if len(values) != len(columns):
+        raise ValueError(f"expected {len(columns)} values, got {len(values)}")
+    return values
+
+def bulk_insert(table, rows, chunk_size=BATCH_SIZE):
+    """
+    Stream rows (tuples or dicts) into `table` in chunks of chunk_size.
+    Member/Staff/Loan rows with a None id get one from the id generator.
+    Each chunk goes out as one multi-row INSERT (executemany) in one transaction.
+    If a chunk fails, it is retried row by row so only the offending rows are
+    rejected. Returns {'inserted': n, 'rejected': [(index, row, reason), ...]}.
+    """
+    columns = TABLE_COLUMNS[table]
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    result = {'inserted': 0, 'rejected': []}
+    after = _count_copies if table == 'Copy' else None
+    explicit_ids = False
+    conn = get_connection()
+    cursor = open_cursor(conn)
+    try:
+        chunk = []
+        for index, row in enumerate(rows):
+            try:
+                chunk.append((index, row, _row_values(columns, row)))
+            except ValueError as e:
+                result['rejected'].append((index, row, str(e)))
+                continue
+            if len(chunk) >= chunk_size:
+                explicit_ids |= _assign_ids(table, chunk)
+                _insert_chunk(conn, cursor, sql, chunk, result, after)
+                chunk = []
+        if chunk:
+            explicit_ids |= _assign_ids(table, chunk)
+            _insert_chunk(conn, cursor, sql, chunk, result, after)
+        if explicit_ids:
+            # Keep generated ids clear of the ones this load brought in
+            sync_sequences(cursor, [table])
+            conn.commit()
+            _ids.discard(table)
+    finally:
+        cursor.close()
+        release_connection()
+    result['rejected'].sort(key=lambda r: r[0])
+    return result
+
+def _assign_ids(table, chunk):
+    """
+    Fill in generated ids for rows whose id column is None, one block per chunk.
+    Returns True if any row in the chunk brought its own id.
+    """
+    if table not in SEQUENCE_COLUMNS:
+        return False
+    position = TABLE_COLUMNS[table].index(SEQUENCE_COLUMNS[table])
+    missing = [i for i, (_, _, values) in enumerate(chunk) if values[position] is None]
+    if missing:
+        for i, new_id in zip(missing, _next_ids(table, len(missing))):
+            index, row, values = chunk[i]
+            chunk[i] = (index, row, values[:position] + (new_id,) + values[position + 1:])
+    return len(missing) < len(chunk)
+
+def _insert_chunk(conn, cursor, sql, chunk, result, after=None):
+    """
+    Insert one chunk in a single transaction, isolating bad rows on failure.
+    after(cursor, rows), if given, runs on the inserted value tuples before the commit.
+    """
+    try:
+        rows = [values for _, _, values in chunk]
+        cursor.executemany(sql, rows)
+        if after is not None:
+            after(cursor, rows)
+        conn.commit()
+        result['inserted'] += len(chunk)
+        return
+    except Error:
+        conn.rollback()
+    # Slow path: same transaction, one row at a time, keep the good ones
+    inserted = []
+    for index, row, values in chunk:
+        try:
+            cursor.execute(sql, values)
+            inserted.append(values)
+        except Error as e:
+            result['rejected'].append((index, row, str(e)))
+    if after is not None and inserted:
+        after(cursor, inserted)
+    conn.commit()
+    result['inserted'] += len(inserted)
+
+def add_books(rows, chunk_size=BATCH_SIZE):
+    """Bulk-insert books given as (isbn, title, subject, author, description) tuples or dicts."""
+    return bulk_insert('Book', rows, chunk_size)
+
+def add_copies(rows, chunk_size=BATCH_SIZE):
+    """Bulk-insert copies given as (isbn, copy_id, status, location) tuples or dicts."""
+    return bulk_insert('Copy', rows, chunk_size)
+
+def add_members(rows, chunk_size=BATCH_SIZE):
+    """Bulk-insert members given as tuples in add_member() argument order or dicts."""
+    return bulk_insert('Member', rows, chunk_size)
+
+def add_staff_members(rows, chunk_size=BATCH_SIZE):
+    """Bulk-insert staff given as (staff_id, staff_name, staff_role) tuples or dicts."""
+    return bulk_insert('Staff', rows, chunk_size)
+
+def add_loans(rows, chunk_size=BATCH_SIZE):
+    """Bulk-insert loans given as tuples in add_loan() argument order or dicts."""
+    return bulk_insert('Loan', rows, chunk_size)
 
 def loans_menu():
     """Submenu for Loan operations."""
@@ -533,12 +1678,11 @@ def loans_menu():
         print(" 3. List Loans")
         print(" 4. Update Loan")
         print(" 5. Delete Loan")
+        print(" 6. Check Out Copy")
+        print(" 7. Check In Loan")
         print(" 0. Back")
         choice = input("Loan choice: ").strip()
         if choice == "1":
-            # Prompt for Loan ID
-            lid = int(input("Loan ID: "))
-
             # Validate Member ID
             while True:
                 mid = int(input("Member ID (0 to abort): "))
@@ -579,24 +1723,26 @@ def loans_menu():
             default_co = datetime.today().date().isoformat()
             co = input(f"Checkout Date (YYYY-MM-DD) [Today]: ").strip() or default_co
 
-            # Compute and prompt for Due Date with default based on privileges
-            default_due = (datetime.strptime(co, "%Y-%m-%d") + timedelta(days=days)).date().isoformat()
-            du = input(f"Due Date (YYYY-MM-DD) [{days} days]: ").strip() or default_due
-
-            # Prompt for Return Date with default None
-            re = input("Return Date (YYYY-MM-DD) [None]: ").strip() or None
-
-            # Prompt for Overdue Status with default None
-            ans = input("Overdue Status ([N]one, Notice[S]ent, [L]ate) [None]: ").strip()
-            if ans == "N" or "n":
-                status = "None"
-            elif ans == "S" or "s":
-                status = "Notice Sent"
-            elif ans == "L" or "l":
-                status = "Late"
-            else:
-                print("Defaulting to None.")
-                status = "None"
+            # Prompt for Return Date with default None. A loan that is still
+            # out is a checkout: it must claim the copy, so it goes through checkout()
+            re = input("Return Date (YYYY-MM-DD) [None: check the copy out]: ").strip() or None
+
+            if re is not None:
+                # Compute and prompt for Due Date with default based on privileges
+                default_due = (datetime.strptime(co, "%Y-%m-%d") + timedelta(days=days)).date().isoformat()
+                du = input(f"Due Date (YYYY-MM-DD) [{days} days]: ").strip() or default_due
+
+                # Prompt for Overdue Status with default None
+                ans = input("Overdue Status ([N]one, Notice[S]ent, [L]ate) [None]: ").strip().lower()
+                if ans in ("", "n"):
+                    status = "None"
+                elif ans == "s":
+                    status = "NoticeSent"
+                elif ans == "l":
+                    status = "Late"
+                else:
+                    print("Defaulting to None.")
+                    status = "None"
             # Validate Staff ID
             while True:
                 try:
@@ -615,8 +1761,17 @@ def loans_menu():
             if sid == 0:
                 continue
 
-            # Finally, add the loan
-            print("Added Loan:", add_loan(lid, mid, isbn, cid, co, du, re, status, sid))
+            # Finally, add the loan: a returned one as a plain record, an open one as a checkout
+            if re is not None:
+                print("Added Loan:", add_loan(None, mid, isbn, cid, co, du, re, status, sid))
+                continue
+            try:
+                loan = checkout(mid, isbn, cid, sid, co)
+            except CirculationError as e:
+                print("Checkout refused:", e)
+            else:
+                if loan:
+                    print(f"Checked out as loan #{loan['loan_id']}, due {loan['due_date']}.")
         elif choice == "2":
             lid = int(input("Loan ID: "))
             rec = get_loan(lid)
@@ -625,8 +1780,7 @@ def loans_menu():
             else:
                 print("No loan found.")
         elif choice == "3":
-            rows = list_loans()
-            print_table(rows)
+            print_table(list_loans(), pager=True)
         elif choice == "4":
             lid = int(input("Loan ID: "))
             field = input("Field to update: ")
@@ -635,6 +1789,32 @@ def loans_menu():
         elif choice == "5":
             lid = int(input("Loan ID: "))
             print("Deleted Loan:", delete_loan(lid))
+        elif choice == "6":
+            mid = int(input("Member ID: "))
+            isbn = input("ISBN: ").strip()
+            cid = int(input("Copy ID: "))
+            sid = int(input("Staff ID: "))
+            try:
+                loan = checkout(mid, isbn, cid, sid)
+            except CirculationError as e:
+                print("Checkout refused:", e)
+            else:
+                if loan:
+                    print(f"Checked out as loan #{loan['loan_id']}, due {loan['due_date']}.")
+        elif choice == "7":
+            lid = int(input("Loan ID: "))
+            try:
+                result = checkin(lid)
+            except CirculationError as e:
+                print("Return refused:", e)
+            else:
+                if result:
+                    late = f" ({result['days_late']} days late)" if result['days_late'] else ""
+                    print(f"Returned {result['isbn']} copy {result['copy_id']}{late}.")
+                    if result['hold']:
+                        hold = result['hold']
+                        print(f"Set aside for hold #{hold['hold_id']} (member {hold['member_id']}) "
+                              f"until {hold['ready_until']}.")
         elif choice == "0":
             break
         else:
@@ -651,6 +1831,7 @@ def books_menu():
         print(" 3. List Books")
         print(" 4. Update Book")
         print(" 5. Delete Book")
+        print(" 6. Search Books")
         print(" 0. Back")
         choice = input("Book choice: ").strip()
         if choice == "1":
@@ -668,8 +1849,7 @@ def books_menu():
             else:
                 print("No book found.")
         elif choice == "3":
-            rows = list_books()
-            print_table(rows)
+            print_table(list_books(), pager=True)
         elif choice == "4":
             isbn = input("ISBN: ")
             field = input("Field to update: ")
@@ -678,6 +1858,19 @@ def books_menu():
         elif choice == "5":
             isbn = input("ISBN: ")
             print("Deleted Book:", delete_book(isbn))
+        elif choice == "6":
+            query = input("Search for: ")
+            page = 1
+            while True:
+                rows = search_books(query, page)
+                for r in rows:
+                    r['relevance'] = round(r['relevance'], 2)
+                print_table(rows)
+                if len(rows) < SEARCH_PAGE_SIZE:
+                    break
+                if input("Next page? [y/N]: ").strip().lower() != "y":
+                    break
+                page += 1
         elif choice == "0":
             break
         else:
@@ -692,11 +1885,13 @@ def copies_menu():
         print(" 3. List Copies")
         print(" 4. Update Copy")
         print(" 5. Delete Copy")
+        print(" 6. Shelf Availability")
         print(" 0. Back")
         choice = input("Copy choice: ").strip()
         if choice == "1":
             isbn = input("ISBN: ")
-            cid = int(input("Copy ID: "))
+            cid = input("Copy ID [next free]: ").strip()
+            cid = int(cid) if cid else None
             status = input("Status: ")
             location = input("Location: ")
             print("Added Copy:", add_copy(isbn, cid, status, location))
@@ -709,8 +1904,7 @@ def copies_menu():
             else:
                 print("No copy found.")
         elif choice == "3":
-            rows = list_copies()
-            print_table(rows)
+            print_table(list_copies(), pager=True)
         elif choice == "4":
             isbn = input("ISBN: ")
             cid = int(input("Copy ID: "))
@@ -721,6 +1915,12 @@ def copies_menu():
             isbn = input("ISBN: ")
             cid = int(input("Copy ID: "))
             print("Deleted Copy:", delete_copy(isbn, cid))
+        elif choice == "6":
+            isbns = [i.strip() for i in input("ISBNs (comma-separated): ").split(",") if i.strip()]
+            found = availability(isbns) or {}
+            print_table([{'isbn': isbn, 'available': a['available'], 'total': a['total'],
+                          'location': ", ".join(f"{loc or '?'} ({n})" for loc, n in a['locations'].items())}
+                         for isbn, a in found.items()])
         elif choice == "0":
             break
         else:
@@ -735,17 +1935,17 @@ def members_menu():
         print(" 3. List Members")
         print(" 4. Update Member")
         print(" 5. Delete Member")
+        print(" 6. Member Account")
         print(" 0. Back")
         choice = input("Member choice: ").strip()
         if choice == "1":
-            mid = int(input("Member ID: "))
             name = input("Name: ")
             ssn = input("SSN: ")
             addr = input("Address: ")
             exp = input("Expiration Date (YYYY-MM-DD): ")
             active = int(input("Active (1 or 0): "))
             prof = int(input("Professor Privileges (1 or 0): "))
-            print("Added Member:", add_member(mid, name, ssn, addr, exp, active, prof))
+            print("Added Member:", add_member(None, name, ssn, addr, exp, active, prof))
         elif choice == "2":
             mid = int(input("Member ID: "))
             rec = get_member(mid)
@@ -754,8 +1954,7 @@ def members_menu():
             else:
                 print("No member found.")
         elif choice == "3":
-            rows = list_members()
-            print_table(rows)
+            print_table(list_members(), pager=True)
         elif choice == "4":
             mid = int(input("Member ID: "))
             field = input("Field to update: ")
@@ -764,6 +1963,25 @@ def members_menu():
         elif choice == "5":
             mid = int(input("Member ID: "))
             print("Deleted Member:", delete_member(mid))
+        elif choice == "6":
+            mid = int(input("Member ID: "))
+            after = None
+            while True:
+                account = member_account(mid, after)
+                if account is None:
+                    print("No member found.")
+                    break
+                if after is None:
+                    member = account['member']
+                    print(f"{member['name']} (#{member['member_id']}), expires {member['expiration_date']}")
+                    print(f"{len(account['open_loans'])} on loan, {account['overdue_count']} overdue, "
+                          f"fines due {account['fines_due']:.2f}")
+                    print_table(account['open_loans'])
+                    print("History:")
+                print_table(account['history'])
+                after = account['history_next']
+                if after is None or input("More history? (y/N): ").strip().lower() != "y":
+                    break
         elif choice == "0":
             break
         else:
@@ -781,10 +1999,9 @@ def staff_menu():
         print(" 0. Back")
         choice = input("Staff choice: ").strip()
         if choice == "1":
-            sid = int(input("Staff ID: "))
             name = input("Staff Name: ")
             role = input("Staff Role: ")
-            print("Added Staff:", add_staff(sid, name, role))
+            print("Added Staff:", add_staff(None, name, role))
         elif choice == "2":
             sid = int(input("Staff ID: "))
             rec = get_staff(sid)
@@ -793,8 +2010,7 @@ def staff_menu():
             else:
                 print("No staff found.")
         elif choice == "3":
-            rows = list_staff()
-            print_table(rows)
+            print_table(list_staff(), pager=True)
         elif choice == "4":
             sid = int(input("Staff ID: "))
             field = input("Field to update: ")
@@ -808,12 +2024,54 @@ def staff_menu():
         else:
             print("Invalid choice, please try again.")
 
+def holds_menu():
+    """Submenu for Hold operations."""
+    while True:
+        print("\nHolds ▶")
+        print(" 1. Place Hold")
+        print(" 2. Get Hold")
+        print(" 3. List Holds for a Title")
+        print(" 4. Cancel Hold")
+        print(" 5. Expire Uncollected Holds")
+        print(" 0. Back")
+        choice = input("Hold choice: ").strip()
+        if choice == "1":
+            mid = int(input("Member ID: "))
+            isbn = input("ISBN: ").strip()
+            try:
+                hold = place_hold(mid, isbn)
+            except CirculationError as e:
+                print("Hold refused:", e)
+            else:
+                if hold:
+                    print(f"Placed hold #{hold['hold_id']}, number {hold['position']} in the queue.")
+        elif choice == "2":
+            hid = int(input("Hold ID: "))
+            rec = get_hold(hid)
+            if rec:
+                print_table([rec])
+            else:
+                print("No hold found.")
+        elif choice == "3":
+            isbn = input("ISBN: ").strip()
+            print_table(list_holds(isbn))
+        elif choice == "4":
+            hid = int(input("Hold ID: "))
+            print("Cancelled Hold:", cancel_hold(hid))
+        elif choice == "5":
+            summary = expire_holds()
+            if summary is not None:
+                print(f"Expired {summary['expired']} hold(s): {summary['reassigned']} copies passed to the next hold, "
+                      f"{summary['shelved']} shelved, {summary['failed']} failed.")
+        elif choice == "0":
+            break
+        else:
+            print("Invalid choice, please try again.")
+
 def main():
     """Main menu to select an entity subsystem."""
-    global _conn
-    # Prompt for password and open connection once
-    host, user, password, database = prompt_credentials()
-    _conn = open_connection(host, user, password, database)
+    # Open the connection pool once (prompts for a password on MySQL)
+    init_backend(backend_from_config(prompt_credentials))
     while True:
         print("\nLibraryMS Main Menu:")
         print("1) Books")
@@ -821,6 +2079,7 @@ def main():
         print("3) Members")
         print("4) Staff")
         print("5) Loans")
+        print("6) Holds")
         print("0) Exit")
         choice = input("Enter choice: ").strip()
         if choice == "1":
@@ -833,10 +2092,11 @@ def main():
             staff_menu()
         elif choice == "5":
             loans_menu()
+        elif choice == "6":
+            holds_menu()
         elif choice == "0":
             print("Goodbye!")
-            if _conn:
-                _conn.close()
+            close_pool()
             break
         else:
             print("Invalid choice, please try again.")
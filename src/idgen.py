@@ -0,0 +1,106 @@
+# Imports
+# threading: one allocator is shared by every desk thread in the process
+import threading
+
+# Id column generated for each table that has a sequence in IdSequence
+SEQUENCE_COLUMNS = {
+    'Member': 'member_id',
+    'Staff': 'staff_id',
+    'Loan': 'loan_id',
+    'Hold': 'hold_id',
+}
+
+# Ids reserved from the database per round trip
+ID_BLOCK_SIZE = 100
+
+
+class IdAllocator:
+    """
+    Hi/lo id generator backed by the IdSequence table.
+
+    Each round trip reserves a block of ids by advancing IdSequence.next_id in
+    its own short transaction; ids are then handed out from memory until the
+    block runs dry. Ids left in a block when the process exits are simply
+    skipped.
+
+    A reservation runs on the connection the caller passes in (one it already
+    holds, with nothing of its own written yet: the reservation commits it) or
+    else on a connection of its own. A caller holding a pooled connection must
+    pass it, or it would wait on a second one it may never get.
+    """
+
+    def __init__(self, pool, block_size=ID_BLOCK_SIZE):
+        self.pool = pool
+        self.block_size = block_size
+        self._blocks = {}               # name -> [next, limit)
+        self._lock = threading.Lock()
+
+    def _reserve(self, name, count, conn=None):
+        """Advance the sequence by `count` and return the first reserved id."""
+        own = conn is None
+        if own:
+            conn = self.pool.acquire()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT next_id FROM IdSequence WHERE name = %s FOR UPDATE", (name,))
+            row = cursor.fetchone()
+            if row is None:
+                raise RuntimeError(f"No IdSequence row for {name}; run init_db.py to apply migrations.")
+            start = row[0]
+            cursor.execute("UPDATE IdSequence SET next_id = next_id + %s WHERE name = %s", (count, name))
+            conn.commit()
+            return start
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            if own:
+                self.pool.release(conn)
+
+    def next_id(self, name, conn=None, shared=True):
+        """Return one new id for the table `name`."""
+        return self.next_ids(name, 1, conn, shared)[0]
+
+    def next_ids(self, name, count, conn=None, shared=True):
+        """
+        Return a range of `count` new ids; large requests get one contiguous block.
+        shared=False reserves just `count` ids and keeps no block for other
+        callers: for a `conn` whose transaction may still roll back.
+        """
+        with self._lock:
+            start, limit = self._blocks.get(name, (0, 0))
+            if limit - start >= count:
+                self._blocks[name] = (start + count, limit)
+                return range(start, start + count)
+        if not shared:
+            first = self._reserve(name, count, conn)
+            return range(first, first + count)
+        # Reserve outside the lock; whatever is left of the old block is dropped
+        size = max(count, self.block_size)
+        first = self._reserve(name, size, conn)
+        with self._lock:
+            if size > count:
+                self._blocks[name] = (first + count, first + size)
+        return range(first, first + count)
+
+    def discard(self, name):
+        """Drop the cached block for `name` (e.g. after sync_sequences moved it)."""
+        with self._lock:
+            self._blocks.pop(name, None)
+
+
+def sync_sequences(cursor, tables=None):
+    """
+    Move each sequence past the largest id already in its table.
+    Run after loading rows with explicit ids (seed data, imports).
+    """
+    for table, column in SEQUENCE_COLUMNS.items():
+        if tables is not None and table not in tables:
+            continue
+        cursor.execute(
+            f"UPDATE IdSequence SET next_id = "
+            f"GREATEST(next_id, (SELECT COALESCE(MAX({column}), 0) + 1 FROM {table})) "
+            f"WHERE name = %s",
+            (table,)
+        )
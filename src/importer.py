@@ -0,0 +1,291 @@
+# Imports
+# argparse: command-line options for the import command
+# csv/json: streaming readers for vendor CSV and registrar JSONL dumps
+# os: checkpoint and reject file handling
+# re: ISBN/SSN format checks
+# itertools.islice: cut the row stream into chunks without materializing it
+import argparse
+import csv
+import json
+import os
+import re
+from datetime import date, datetime
+from itertools import islice
+
+import crud
+
+# Allowed values of the ENUM columns in schema.sql
+COPY_STATUSES = ('Available', 'Not Available')
+OVERDUE_STATUSES = ('None', 'NoticeSent', 'Late')
+
+_TRUE = {'1', 'true', 't', 'yes', 'y'}
+_FALSE = {'0', 'false', 'f', 'no', 'n'}
+
+
+# --- Field Validators ---
+# Each takes the raw text (or JSON value) and returns the value to insert,
+# raising ValueError with a readable reason otherwise.
+
+def validate_isbn(value):
+    """Accept ISBN-10 or ISBN-13 (hyphens/spaces allowed) with a correct check digit."""
+    isbn = re.sub(r"[\s-]", "", str(value)).upper()
+    if re.fullmatch(r"\d{13}", isbn):
+        total = sum(int(c) * (1 if i % 2 == 0 else 3) for i, c in enumerate(isbn))
+        if total % 10 == 0:
+            return isbn
+    elif re.fullmatch(r"\d{9}[\dX]", isbn):
+        total = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(isbn))
+        if total % 11 == 0:
+            return isbn
+    raise ValueError(f"invalid ISBN {value!r}")
+
+def validate_ssn(value):
+    """Accept a 9-digit SSN, with or without dashes."""
+    ssn = str(value).replace('-', '').strip()
+    if not re.fullmatch(r"\d{9}", ssn):
+        raise ValueError(f"invalid SSN {value!r}")
+    return ssn
+
+def validate_date(value):
+    """Accept YYYY-MM-DD and return it unchanged."""
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        datetime.strptime(str(value), "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"invalid date {value!r} (expected YYYY-MM-DD)")
+    return str(value)
+
+def validate_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid integer {value!r}")
+
+def validate_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"invalid flag {value!r}")
+
+def validate_choice(choices):
+    def check(value):
+        if value not in choices:
+            raise ValueError(f"{value!r} is not one of {', '.join(choices)}")
+        return value
+    return check
+
+def validate_text(max_len=None):
+    def check(value):
+        text = str(value)
+        if max_len is not None and len(text) > max_len:
+            raise ValueError(f"text longer than {max_len} characters")
+        return text
+    return check
+
+# Per-table rules: column -> (validator, required)
+RULES = {
+    'Book': {
+        'isbn': (validate_isbn, True),
+        'title': (validate_text(100), True),
+        'subject': (validate_text(50), False),
+        'author': (validate_text(100), False),
+        'description': (validate_text(), False),
+    },
+    'Copy': {
+        'isbn': (validate_isbn, True),
+        'copy_id': (validate_int, True),
+        'status': (validate_choice(COPY_STATUSES), True),
+        'location': (validate_text(100), False),
+    },
+    'Member': {
+        'member_id': (validate_int, False),
+        'name': (validate_text(100), True),
+        'ssn': (validate_ssn, False),
+        'address': (validate_text(200), False),
+        'expiration_date': (validate_date, False),
+        'active_flag': (validate_bool, True),
+        'professor_privileges': (validate_bool, True),
+    },
+    'Staff': {
+        'staff_id': (validate_int, False),
+        'staff_name': (validate_text(100), True),
+        'staff_role': (validate_text(50), False),
+    },
+    'Loan': {
+        'loan_id': (validate_int, False),
+        'member_id': (validate_int, True),
+        'isbn': (validate_isbn, True),
+        'copy_id': (validate_int, True),
+        'checkout_date': (validate_date, True),
+        'due_date': (validate_date, True),
+        'return_date': (validate_date, False),
+        'overdue_status': (validate_choice(OVERDUE_STATUSES), True),
+        'staff_id': (validate_int, True),
+    },
+}
+
+
+# --- Pipeline Stages ---
+
+def detect_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+def read_rows(path, fmt=None):
+    """Parse stage: yield one dict per CSV row or JSONL line, streaming from disk."""
+    fmt = fmt or detect_format(path)
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                yield json.loads(line) if line else {}
+
+def validate_rows(table, rows, rejects):
+    """
+    Validate stage: yield (index, clean_row) for good rows.
+    Bad rows are passed to rejects(index, row, reason) and dropped.
+    """
+    rules = RULES[table]
+    for index, raw in enumerate(rows):
+        clean = {}
+        try:
+            unknown = set(raw) - set(rules)
+            if unknown:
+                raise ValueError(f"unknown column(s): {', '.join(sorted(unknown))}")
+            for column, (check, required) in rules.items():
+                value = raw.get(column)
+                if isinstance(value, str):
+                    value = value.strip()
+                if value is None or value == '':
+                    if required:
+                        raise ValueError(f"{column} is required")
+                    clean[column] = None
+                else:
+                    clean[column] = check(value)
+        except ValueError as e:
+            rejects(index, raw, str(e))
+            continue
+        yield index, clean
+
+def chunked(items, size):
+    """Yield lists of up to `size` items from any iterable."""
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- Checkpoints ---
+# A small JSON file next to the input records how many input rows have been
+# committed, so an interrupted import resumes after the last committed chunk.
+# It also records the input's size and mtime: a file replaced since (the next
+# day's export at the same path) starts again from the first row.
+
+def checkpoint_path(path, table):
+    return f"{path}.{table}.progress"
+
+def file_identity(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def load_checkpoint(path, table):
+    try:
+        with open(checkpoint_path(path, table)) as f:
+            saved = json.load(f)
+        if saved['file'] != file_identity(path):
+            return 0
+        return saved['rows_done']
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return 0
+
+def save_checkpoint(path, table, rows_done):
+    target = checkpoint_path(path, table)
+    tmp = target + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'rows_done': rows_done, 'file': file_identity(path)}, f)
+    os.replace(tmp, target)
+
+def clear_checkpoint(path, table):
+    try:
+        os.remove(checkpoint_path(path, table))
+    except FileNotFoundError:
+        pass
+
+
+# --- Import Driver ---
+
+def import_file(table, path, fmt=None, chunk_size=crud.BATCH_SIZE, restart=False, rejects_path=None):
+    """
+    Stream `path` into `table`: parse -> validate -> batch insert.
+    Memory stays bounded by one chunk. Rows without a Member/Staff/Loan id
+    get a generated one. Progress is checkpointed after every
+    committed chunk; rerunning an interrupted import of the same file resumes
+    from there unless restart is True. The checkpoint is removed once the
+    file is fully loaded. Rejected rows are appended to rejects_path as JSONL.
+    Returns a summary dict.
+    """
+    if table not in RULES:
+        raise ValueError(f"Unknown table {table!r}; choose from {', '.join(RULES)}")
+    start = 0 if restart else load_checkpoint(path, table)
+    rejects_path = rejects_path or f"{path}.{table}.rejects.jsonl"
+    summary = {'skipped': start, 'inserted': 0, 'rejected': 0}
+
+    with open(rejects_path, 'w' if start == 0 else 'a', encoding='utf-8') as rejects_file:
+        def reject(index, row, reason):
+            summary['rejected'] += 1
+            rejects_file.write(json.dumps({'row': index, 'reason': reason, 'data': row}, default=str) + "\n")
+
+        rows = islice(read_rows(path, fmt), start, None)
+        good = validate_rows(table, rows, lambda i, r, why: reject(start + i, r, why))
+
+        # Hold one connection for the whole run; bulk_insert reuses it per chunk
+        crud.get_connection()
+        try:
+            done = start
+            for chunk in chunked(good, chunk_size):
+                result = crud.bulk_insert(table, [row for _, row in chunk], chunk_size=len(chunk))
+                summary['inserted'] += result['inserted']
+                for offset, row, reason in result['rejected']:
+                    reject(start + chunk[offset][0], row, reason)
+                # Everything up to the last row of this chunk is now committed
+                done = start + chunk[-1][0] + 1
+                save_checkpoint(path, table, done)
+                rejects_file.flush()
+        finally:
+            crud.release_connection()
+
+    # The whole file is in; a later run on this path is a new import
+    clear_checkpoint(path, table)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a CSV/JSONL file into a LibraryMS table.")
+    parser.add_argument('table', choices=list(RULES), help="Target table")
+    parser.add_argument('path', help="CSV (with a header row) or JSONL file")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help="Input format (default: from extension)")
+    parser.add_argument('--chunk-size', type=int, default=crud.BATCH_SIZE, help="Rows per transaction")
+    parser.add_argument('--restart', action='store_true', help="Ignore the saved checkpoint and start over")
+    parser.add_argument('--rejects', help="Where to write rejected rows (JSONL)")
+    args = parser.parse_args()
+
+    backend = crud.backend_from_config(crud.prompt_credentials)
+    # One connection: id blocks are reserved on the load's own connection
+    crud.init_backend(backend, size=1)
+    try:
+        summary = import_file(args.table, args.path, args.format, args.chunk_size,
+                              args.restart, args.rejects)
+    finally:
+        crud.close_pool()
+    print(f"Resumed after {summary['skipped']} rows." if summary['skipped'] else "Started from the first row.")
+    print(f"Inserted {summary['inserted']} rows, rejected {summary['rejected']}.")
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,22 @@
 # Imports
-# mysql.connector: MySQL driver for Python
+# argparse: command-line options
+# backends: MySQL or embedded SQLite connection and dialect
+# availability/idgen: summary rows and sequences derived from the loaded data
 # os: for file path operations
 # getpass: for secure password input
-import mysql.connector
+# codecs/re: incremental decoding and tokenizing of .sql files
+# time/datetime: load throughput reporting and migration timestamps
+import argparse
 import os
 import getpass
+import codecs
+import re
+import time
+from datetime import datetime
+
+from availability import rebuild_availability
+from backends import Error, MySQLBackend, backend_from_config
+from idgen import sync_sequences
 
 # Set to False if you want to prompt for host, user, and database as well
 USE_DEFAULT = True
@@ -25,67 +37,360 @@ def prompt_credentials():
         database = input("Database [library_db]: ") or "library_db"
     return host, user, password, database
 
-# Open a connection to the MySQL server using provided credentials
-def open_connection(host, user, password):
-    config = {'host': host, 'user': user, 'password': password}
-    return mysql.connector.connect(**config)
-
-# Execute SQL commands from a .sql file, splitting on semicolons
-# Print any errors along with the failed command for debugging
-def run_sql_file(cursor, filepath):
-    with open(filepath, 'r') as file:
-        sql_commands = file.read().split(';')
-        for command in sql_commands:
-            command = command.strip()
-            if command:
-                try:
-                    cursor.execute(command)
-                except mysql.connector.Error as err:
-                    print(f"Error: {err}")
-                    print(f"Failed command: {command}\n")
+# Bytes read from a .sql file per chunk while streaming it
+READ_CHUNK_SIZE = 1 << 20
+# Statements executed per transaction when loading a .sql file
+STATEMENTS_PER_COMMIT = 500
+# Seconds between progress lines while loading a .sql file
+PROGRESS_INTERVAL = 5.0
+
+# Raised when a statement in a .sql file fails (unless keep_going is set)
+class SQLFileError(Exception):
+    def __init__(self, filepath, number, statement, err):
+        self.filepath = filepath
+        self.number = number
+        self.statement = statement
+        self.err = err
+        snippet = statement if len(statement) <= 200 else statement[:200] + "..."
+        super().__init__(f"{filepath}: statement #{number} failed: {err}\n{snippet}")
+
+# Incremental, quote-aware splitter for SQL scripts.
+# Feed it text in arbitrary pieces; it returns the complete statements found so far.
+# Semicolons inside '...', "..." and `...` (with backslash and doubled-quote escapes)
+# and inside comments do not end a statement. "--", "#" and "/* */" comments are
+# dropped; MySQL "/*! ... */" version comments are kept. DELIMITER lines are honored.
+class StatementSplitter:
+    _WHITESPACE = re.compile(r"\s*")
+    _DELIMITER_CMD = re.compile(r"[ \t\r\n]*DELIMITER[ \t]+(\S+)[^\n]*\n", re.IGNORECASE)
+    _QUOTE_END = {
+        "'": re.compile(r"['\\]"),
+        '"': re.compile(r'["\\]'),
+        '`': re.compile(r"`"),
+    }
+
+    def __init__(self, delimiter=';'):
+        self._buf = ''
+        self._start = 0        # start of the unconsumed part of the current statement
+        self._pos = 0          # scan position
+        self._parts = []       # pieces of the current statement already cut out of _buf
+        self._state = None     # None, a quote char, 'line', 'block' or 'keep_block'
+        self._fresh = True     # nothing but whitespace/comments seen since the last delimiter
+        self._set_delimiter(delimiter)
+
+    def _set_delimiter(self, delimiter):
+        self.delimiter = delimiter
+        self._normal = re.compile(r"['\"`#]|--|/\*|" + re.escape(delimiter))
+
+    def feed(self, text, final=False):
+        """Add text and return the list of statements it completed."""
+        # Move already-scanned text out of the buffer so a huge statement is
+        # not re-copied on every feed; scanned comment text is simply dropped
+        if self._state not in ('line', 'block'):
+            self._parts.append(self._buf[self._start:self._pos])
+        self._buf = self._buf[self._pos:] + text
+        self._start = self._pos = 0
+        statements = []
+        buf = self._buf
+        while True:
+            if self._state is None:
+                if self._fresh:
+                    # Only a statement's first line can be a DELIMITER command
+                    head_pos = self._WHITESPACE.match(buf, self._pos).end()
+                    if head_pos == len(buf):
+                        break
+                    m = self._DELIMITER_CMD.match(buf, self._pos)
+                    if m:
+                        self._set_delimiter(m.group(1))
+                        self._start = self._pos = m.end()
+                        continue
+                    head = buf[head_pos:head_pos + 9].upper()
+                    if not final and buf.find('\n', head_pos) < 0 and 'DELIMITER'.startswith(head):
+                        break
+                    self._fresh = False
+                m = self._normal.search(buf, self._pos)
+                if m is None:
+                    # Keep a short tail so a token split across feeds is rescanned
+                    tail = max(1, len(self.delimiter) - 1)
+                    self._pos = len(buf) if final else max(self._pos, len(buf) - tail)
+                    break
+                tok = m.group()
+                if tok == self.delimiter:
+                    statement = ''.join(self._parts) + buf[self._start:m.start()]
+                    self._parts = []
+                    self._start = self._pos = m.end()
+                    self._fresh = True
+                    statement = statement.strip()
+                    if statement:
+                        statements.append(statement)
+                elif tok in ("'", '"', '`'):
+                    self._state = tok
+                    self._pos = m.end()
+                elif tok == '#' or tok == '--':
+                    if tok == '--':
+                        if m.end() == len(buf) and not final:
+                            self._pos = m.start()
+                            break
+                        if m.end() < len(buf) and not buf[m.end()].isspace():
+                            self._pos = m.start() + 1   # "a--b" is arithmetic, not a comment
+                            continue
+                    self._parts.append(buf[self._start:m.start()])
+                    self._start = m.start()
+                    self._state = 'line'
+                    self._pos = m.end()
+                else:  # '/*'
+                    if m.end() == len(buf) and not final:
+                        self._pos = m.start()
+                        break
+                    if buf.startswith('!', m.end()):
+                        self._state = 'keep_block'
+                    else:
+                        self._parts.append(buf[self._start:m.start()])
+                        self._start = m.start()
+                        self._state = 'block'
+                    self._pos = m.end()
+            elif self._state == 'line':
+                end = buf.find('\n', self._pos)
+                if end < 0:
+                    self._pos = len(buf)
+                    break
+                self._start = self._pos = end
+                self._state = None
+                self._fresh = self._fresh and not any(p.strip() for p in self._parts)
+            elif self._state in ('block', 'keep_block'):
+                end = buf.find('*/', self._pos)
+                if end < 0:
+                    self._pos = max(self._pos, len(buf) - 1)
+                    break
+                self._pos = end + 2
+                if self._state == 'block':
+                    self._start = self._pos
+                    self._fresh = self._fresh and not any(p.strip() for p in self._parts)
+                self._state = None
+            else:
+                quote = self._state
+                m = self._QUOTE_END[quote].search(buf, self._pos)
+                if m is None:
+                    self._pos = len(buf)
+                    break
+                if m.group() == '\\':
+                    if m.end() == len(buf) and not final:
+                        self._pos = m.start()
+                        break
+                    self._pos = m.end() + 1     # skip the escaped character
+                else:
+                    self._state = None
+                    self._pos = m.end()
+        if final:
+            statement = (''.join(self._parts) + buf[self._start:]).strip()
+            self._parts = []
+            self._buf, self._start, self._pos = '', 0, 0
+            if self._state not in (None, 'line', 'block'):
+                raise ValueError(f"Unterminated {self._state} at end of SQL script")
+            if statement:
+                statements.append(statement)
+        return statements
+
+# Stream statements out of a .sql file without reading it all into memory.
+# Yields (statement, bytes_read_so_far).
+def iter_statements(filepath, chunk_size=READ_CHUNK_SIZE):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    splitter = StatementSplitter()
+    bytes_read = 0
+    with open(filepath, 'rb') as file:
+        while True:
+            raw = file.read(chunk_size)
+            bytes_read += len(raw)
+            final = not raw
+            for statement in splitter.feed(decoder.decode(raw, final=final), final=final):
+                yield statement, bytes_read
+            if final:
+                return
+
+# Execute SQL commands from a .sql file as they stream in, committing every
+# `batch_size` statements. With fast_load, foreign-key and unique checks are
+# switched off for the session during the load and restored afterwards.
+# Stops at the first failing statement (rolling back its batch) by raising
+# SQLFileError, unless keep_going is set, in which case failures are counted
+# and printed. Statements are written in MySQL's dialect; `backend` translates
+# them (e.g. for SQLite). Returns throughput stats.
+def run_sql_file(connection, filepath, batch_size=STATEMENTS_PER_COMMIT, fast_load=False, keep_going=False,
+                 backend=None):
+    backend = backend or MySQLBackend()
+    cursor = connection.cursor()
+    stats = {'statements': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0}
+    start = last_report = time.monotonic()
+    pending = 0
+    try:
+        if fast_load:
+            backend.set_load_checks(cursor, False)
+        for number, (command, bytes_read) in enumerate(iter_statements(filepath), start=1):
+            try:
+                for statement in backend.translate_script(command):
+                    cursor.execute(statement)
+            except Error as err:
+                stats['errors'] += 1
+                if not keep_going:
+                    connection.rollback()
+                    raise SQLFileError(filepath, number, command, err)
+                print(f"Error: {err}")
+                print(f"Failed command #{number}: {command[:200]}\n")
+            stats['statements'] = number
+            stats['bytes'] = bytes_read
+            pending += 1
+            if pending >= batch_size:
+                connection.commit()
+                pending = 0
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                print(f"  ...{_throughput(stats, now - start)}")
+        connection.commit()
+    finally:
+        if fast_load:
+            backend.set_load_checks(cursor, True)
+        cursor.close()
+    stats['seconds'] = time.monotonic() - start
+    return stats
+
+# Format statement and byte throughput for progress output
+def _throughput(stats, seconds):
+    seconds = max(seconds, 1e-9)
+    return (f"{stats['statements']} statements, {stats['bytes'] / 1e6:.1f} MB in {seconds:.2f}s "
+            f"({stats['statements'] / seconds:.0f} stmt/s, {stats['bytes'] / 1e6 / seconds:.2f} MB/s)")
 
-# Initialize the database: select DB
-def initialize_database(cursor, database):
-    cursor.execute(f"USE {database};")
+# --- Schema Migrations ---
+# Numbered files in sql/migrations (NNN_description.sql) are applied in order,
+# once each. Applied versions are recorded in SchemaVersion so rerunning
+# init_db.py on a live database only applies what is new.
 
-# Load schema and data SQL files unconditionally
-def load_sql_files(cursor, schema_path, data_path):
+# MySQL error numbers that mean a migration statement already took effect
+# (duplicate index name, duplicate column, table exists, can't drop missing key)
+ALREADY_APPLIED_ERRORS = {1050, 1060, 1061, 1091}
+# Seconds to wait for another process that is migrating the same database
+MIGRATION_LOCK_TIMEOUT = 60
+
+# List (version, name, path) for every migration file, sorted by version
+def find_migrations(migrations_dir):
+    migrations = []
+    for filename in os.listdir(migrations_dir):
+        m = re.fullmatch(r"(\d+)_(\w+)\.sql", filename)
+        if m:
+            migrations.append((int(m.group(1)), m.group(2), os.path.join(migrations_dir, filename)))
+    migrations.sort()
+    versions = [v for v, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {migrations_dir}")
+    return migrations
+
+# Return the set of migration versions already applied
+def applied_versions(cursor):
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS SchemaVersion ("
+        " version INT PRIMARY KEY,"
+        " name VARCHAR(200),"
+        " applied_at DATETIME)"
+    )
+    cursor.execute("SELECT version FROM SchemaVersion")
+    return {row[0] for row in cursor.fetchall()}
+
+# Return the highest applied migration version (0 for a fresh schema)
+def schema_version(connection):
+    cursor = connection.cursor()
+    try:
+        return max(applied_versions(cursor), default=0)
+    finally:
+        cursor.close()
+
+# Apply pending migrations in order and record each one.
+# A named lock keeps two init_db runs from migrating the same database at once.
+# Statements that fail because their change is already present (e.g. an index
+# created before an interrupted run could record its version) are skipped, so
+# a rerun always converges. Returns the list of versions applied.
+def apply_migrations(connection, migrations_dir, backend=None):
+    backend = backend or MySQLBackend()
+    cursor = connection.cursor()
+    if not backend.lock_migrations(cursor, MIGRATION_LOCK_TIMEOUT):
+        cursor.close()
+        raise RuntimeError("Another process is migrating this database; try again later.")
+    applied = []
+    try:
+        done = applied_versions(cursor)
+        for version, name, path in find_migrations(migrations_dir):
+            if version in done:
+                continue
+            print(f"Applying migration {version:03d}_{name}...")
+            for number, (command, _) in enumerate(iter_statements(path), start=1):
+                try:
+                    for statement in backend.translate_script(command):
+                        cursor.execute(statement)
+                except Error as err:
+                    if err.errno not in ALREADY_APPLIED_ERRORS:
+                        connection.rollback()
+                        raise SQLFileError(path, number, command, err)
+                    print(f"  statement #{number} already applied ({err.msg}); skipping")
+            cursor.execute(
+                "INSERT INTO SchemaVersion (version, name, applied_at) VALUES (%s, %s, %s)",
+                (version, name, datetime.now().replace(microsecond=0))
+            )
+            connection.commit()
+            applied.append(version)
+    finally:
+        backend.unlock_migrations(cursor)
+        cursor.close()
+    return applied
+
+# Load the schema, bring it up to date with migrations, then load the data
+def load_sql_files(connection, schema_path, data_path, migrations_dir, fast_load=False, backend=None):
     print("Running schema.sql...")
-    run_sql_file(cursor, schema_path)
+    stats = run_sql_file(connection, schema_path, backend=backend)
+    print(f"  {_throughput(stats, stats['seconds'])}")
+    print("Running migrations...")
+    applied = apply_migrations(connection, migrations_dir, backend=backend)
+    print(f"  Applied {len(applied)} migration(s); schema is at version {schema_version(connection)}.")
     print("Running data.sql...")
-    run_sql_file(cursor, data_path)
+    stats = run_sql_file(connection, data_path, fast_load=fast_load, backend=backend)
+    print(f"  {_throughput(stats, stats['seconds'])}")
+    # Seed rows carry explicit ids; start generated ids after them.
+    # They also bypass crud.py, so recount shelf availability
+    cursor = connection.cursor()
+    sync_sequences(cursor)
+    rebuild_availability(cursor)
+    connection.commit()
+    cursor.close()
 
-# Main orchestration: prompt credentials, connect, initialize, load SQL, and cleanup
+# Main orchestration: prompt credentials, connect, load SQL, and cleanup
 def main():
-    print("Enter your MySQL login details")
-
-    host, user, password, database = prompt_credentials()
+    parser = argparse.ArgumentParser(description="Create the LibraryMS schema, apply migrations and load data.sql.")
+    parser.add_argument('--fast-load', action='store_true',
+                        help="Switch off foreign-key and unique checks while data.sql loads")
+    args = parser.parse_args()
+    backend = backend_from_config(prompt_credentials)
+    connection = None
 
-    # Establish a database connection and create a cursor
+    # Establish a database connection (MySQL: the configured database; SQLite: the file)
     try:
-        connection = open_connection(host, user, password)
-        cursor = connection.cursor()
-
-        initialize_database(cursor, database)
+        connection = backend.connect()
 
         current_dir = os.path.dirname(os.path.abspath(__file__))
         schema_path = os.path.join(current_dir, '..', 'sql', 'schema.sql')
         data_path = os.path.join(current_dir, '..', 'sql', 'data.sql')
+        migrations_dir = os.path.join(current_dir, '..', 'sql', 'migrations')
 
-        load_sql_files(cursor, schema_path, data_path)
+        load_sql_files(connection, schema_path, data_path, migrations_dir, fast_load=args.fast_load, backend=backend)
 
         # Commit all changes
         connection.commit()
         print("Database initialized successfully!")
 
     # Handle any connection or execution errors gracefully
-    except mysql.connector.Error as err:
+    except Error as err:
         print(f"Connection error: {err}")
+    except SQLFileError as err:
+        print(f"Error: {err}")
 
-    # Ensure resources are cleaned up by closing cursor and connection
+    # Ensure resources are cleaned up by closing the connection
     finally:
-        if connection.is_connected():
-            cursor.close()
+        if connection is not None and connection.is_connected():
             connection.close()
             print("Connection closed.")
 
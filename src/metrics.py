@@ -0,0 +1,190 @@
+# Imports
+# threading: one registry is shared by every desk thread in the process
+# time: statement timing
+# re: statement labels for the Prometheus output
+import re
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds (Prometheus `le` labels)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Distinct statements tracked before the rest are pooled under OTHER
+MAX_STATEMENTS = 500
+OTHER = '(other)'
+# MySQL lock wait timeout / deadlock
+LOCK_WAIT_ERRORS = {1205, 1213}
+
+
+def statement_label(sql, width=120):
+    """One-line, bounded form of a statement for labels and logs."""
+    text = re.sub(r"\s+", " ", sql).strip()
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'total', 'max', 'rows', 'errors', 'lock_waits')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)     # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.lock_waits = 0
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return self.max
+
+
+class QueryStats:
+    """
+    Per-statement latency histograms, row counts, errors and lock waits.
+    Statements are keyed by their SQL text (parameters are placeholders, so
+    the set of keys is small); snapshot() and prometheus() read it out.
+    """
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get(self, sql):
+        series = self._series.get(sql)
+        if series is None:
+            if len(self._series) >= MAX_STATEMENTS:
+                sql = OTHER
+            series = self._series.setdefault(sql, _Series())
+        return series
+
+    def record(self, sql, seconds, error=None):
+        """Count one execution of `sql` that took `seconds` (and failed with `error`, if given)."""
+        index = 0
+        while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+            index += 1
+        with self._lock:
+            series = self._get(sql)
+            series.buckets[index] += 1
+            series.count += 1
+            series.total += seconds
+            if seconds > series.max:
+                series.max = seconds
+            if error is not None:
+                series.errors += 1
+                if getattr(error, 'errno', None) in LOCK_WAIT_ERRORS:
+                    series.lock_waits += 1
+
+    def add_rows(self, sql, rows):
+        with self._lock:
+            self._get(sql).rows += rows
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """{statement: {calls, errors, lock_waits, rows, total_s, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}."""
+        with self._lock:
+            return {
+                statement_label(sql): {
+                    'calls': s.count,
+                    'errors': s.errors,
+                    'lock_waits': s.lock_waits,
+                    'rows': s.rows,
+                    'total_s': s.total,
+                    'mean_ms': s.total / s.count * 1e3 if s.count else 0.0,
+                    'p50_ms': s.quantile(0.50) * 1e3,
+                    'p95_ms': s.quantile(0.95) * 1e3,
+                    'p99_ms': s.quantile(0.99) * 1e3,
+                    'max_ms': s.max * 1e3,
+                }
+                for sql, s in self._series.items()
+            }
+
+    def prometheus(self, prefix='libraryms_query'):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = [(statement_label(sql).replace('\\', '\\\\').replace('"', '\\"'), s)
+                     for sql, s in self._series.items()]
+            lines = [f"# HELP {prefix}_duration_seconds Statement execution time.",
+                     f"# TYPE {prefix}_duration_seconds histogram"]
+            for label, s in items:
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + ('+Inf',), s.buckets):
+                    cumulative += n
+                    lines.append(f'{prefix}_duration_seconds_bucket{{statement="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_duration_seconds_sum{{statement="{label}"}} {s.total:.6f}')
+                lines.append(f'{prefix}_duration_seconds_count{{statement="{label}"}} {s.count}')
+            for name, attr, help_text in (('rows_total', 'rows', 'Rows fetched.'),
+                                          ('errors_total', 'errors', 'Failed executions.'),
+                                          ('lock_waits_total', 'lock_waits', 'Lock wait timeouts and deadlocks.')):
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for label, s in items:
+                    lines.append(f'{prefix}_{name}{{statement="{label}"}} {getattr(s, attr)}')
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that times execute()/executemany() and counts fetched rows
+    into a QueryStats. Executions slower than `slow_seconds` are passed to
+    on_slow(sql, params, seconds). Everything else is delegated.
+    """
+
+    def __init__(self, cursor, stats, slow_seconds=None, on_slow=None):
+        self._cursor = cursor
+        self._stats = stats
+        self._slow_seconds = slow_seconds
+        self._on_slow = on_slow
+        self._sql = None
+
+    def _timed(self, method, sql, params, check_slow=True):
+        self._sql = sql
+        start = time.perf_counter()
+        try:
+            method(sql, params)
+        except Exception as e:
+            self._stats.record(sql, time.perf_counter() - start, e)
+            raise
+        seconds = time.perf_counter() - start
+        self._stats.record(sql, seconds)
+        if check_slow and self._on_slow is not None and seconds >= self._slow_seconds:
+            self._on_slow(sql, params, seconds)
+
+    def execute(self, sql, params=()):
+        self._timed(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, seq_params):
+        # Timed but never explained: a slow batch is expected to be slow
+        self._timed(self._cursor.executemany, sql, seq_params, check_slow=False)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.add_rows(self._sql, 1)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        self._stats.add_rows(self._sql, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.add_rows(self._sql, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
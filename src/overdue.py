@@ -0,0 +1,145 @@
+# Imports
+# argparse: options for the nightly overdue job
+# csv: notice batch output for the mailing run
+# sys: summary line goes to stderr so the CSV can be piped
+# datetime: "today" and days-late arithmetic
+import argparse
+import csv
+import sys
+from datetime import date, datetime, timedelta
+
+import crud
+from backends import Error
+
+# Days past the due date before a loan goes from 'NoticeSent' to 'Late'
+LATE_AFTER_DAYS = 14
+
+# Columns of the notice batch CSV
+NOTICE_FIELDS = ['kind', 'member_id', 'name', 'address', 'loan_id', 'isbn', 'title', 'due_date', 'days_late']
+
+# Open loans due in [due_from, due_before) that are in one of `statuses`,
+# with what the notice needs. Served by idx_loan_open_due
+# (return_date, due_date, overdue_status); FOR UPDATE keeps the rows stable
+# until the UPDATEs below commit.
+def _fetch_notices(cursor, kind, due_from, due_before, statuses, today):
+    cursor.execute(
+        "SELECT l.loan_id, l.isbn, l.due_date, m.member_id, m.name, m.address, b.title "
+        "FROM Loan l "
+        "JOIN Member m ON m.member_id = l.member_id "
+        "LEFT JOIN Book b ON b.isbn = l.isbn "
+        "WHERE l.return_date IS NULL AND l.due_date >= %s AND l.due_date < %s "
+        f"AND l.overdue_status IN ({', '.join(['%s'] * len(statuses))}) "
+        "ORDER BY m.member_id, l.due_date "
+        "FOR UPDATE",
+        (due_from, due_before, *statuses)
+    )
+    return [_notice(kind, row, today) for row in cursor.fetchall()]
+
+def process_overdue(today=None, late_after=LATE_AFTER_DAYS, dry_run=False):
+    """
+    Recompute overdue_status for every open loan with three set-based UPDATEs:
+      'None'       -> 'NoticeSent' once the due date has passed,
+      'NoticeSent' -> 'Late'       once it is late_after days overdue,
+      anything     -> 'None'       if the due date moved back into the future.
+    Loans that change state are first read (and locked) in the same
+    transaction to build the notice batch. Returns
+    {'notices': [...], 'noticed': n, 'late': n, 'cleared': n}.
+    With dry_run the transaction is rolled back after counting.
+    """
+    today = today or date.today()
+    late_cutoff = today - timedelta(days=late_after)
+    summary = {'notices': [], 'noticed': 0, 'late': 0, 'cleared': 0}
+    conn = crud.get_connection()
+    cursor = crud.open_cursor(conn, dictionary=True)
+    try:
+        # First notices: newly overdue, not yet late_after days
+        summary['notices'] += _fetch_notices(cursor, 'first notice', late_cutoff, today, ['None'], today)
+        # Final notices: past the late threshold (a loan can skip the first notice)
+        summary['notices'] += _fetch_notices(cursor, 'final notice', date.min, late_cutoff,
+                                             ['None', 'NoticeSent'], today)
+
+        cursor.execute(
+            "UPDATE Loan SET overdue_status = 'Late', row_version = row_version + 1 "
+            "WHERE return_date IS NULL AND due_date < %s AND overdue_status IN ('None', 'NoticeSent')",
+            (late_cutoff,)
+        )
+        summary['late'] = cursor.rowcount
+        cursor.execute(
+            "UPDATE Loan SET overdue_status = 'NoticeSent', row_version = row_version + 1 "
+            "WHERE return_date IS NULL AND due_date < %s AND due_date >= %s AND overdue_status = 'None'",
+            (today, late_cutoff)
+        )
+        summary['noticed'] = cursor.rowcount
+        # Renewed loans: due date is back in the future
+        cursor.execute(
+            "UPDATE Loan SET overdue_status = 'None', row_version = row_version + 1 "
+            "WHERE return_date IS NULL AND due_date >= %s AND overdue_status <> 'None'",
+            (today,)
+        )
+        summary['cleared'] = cursor.rowcount
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        crud.release_connection()
+    return summary
+
+def _notice(kind, row, today):
+    due = row['due_date']
+    if isinstance(due, str):
+        due = datetime.strptime(due, "%Y-%m-%d").date()
+    return {
+        'kind': kind,
+        'member_id': row['member_id'],
+        'name': row['name'],
+        'address': row['address'],
+        'loan_id': row['loan_id'],
+        'isbn': row['isbn'],
+        'title': row['title'],
+        'due_date': due.isoformat(),
+        'days_late': (today - due).days,
+    }
+
+def write_notices(notices, out):
+    """Write the notice batch as CSV, one line per overdue title."""
+    writer = csv.DictWriter(out, fieldnames=NOTICE_FIELDS)
+    writer.writeheader()
+    writer.writerows(notices)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute overdue statuses and produce the notice batch.")
+    parser.add_argument('--date', help="Treat this YYYY-MM-DD as today (default: today)")
+    parser.add_argument('--late-after', type=int, default=LATE_AFTER_DAYS,
+                        help="Days overdue before a loan is marked Late")
+    parser.add_argument('--notices', help="Write the notice batch CSV here (default: stdout)")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would change without saving it")
+    args = parser.parse_args()
+
+    today = datetime.strptime(args.date, "%Y-%m-%d").date() if args.date else None
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=1)
+    try:
+        summary = process_overdue(today, args.late_after, args.dry_run)
+        # Copies set aside for holds that weren't picked up go to the next in line
+        holds = None if args.dry_run else crud.expire_holds(today)
+    finally:
+        crud.close_pool()
+
+    if args.notices:
+        with open(args.notices, 'w', newline='') as f:
+            write_notices(summary['notices'], f)
+    else:
+        write_notices(summary['notices'], sys.stdout)
+    verb = "Would mark" if args.dry_run else "Marked"
+    print(f"{verb} {summary['noticed']} loan(s) NoticeSent, {summary['late']} Late, "
+          f"cleared {summary['cleared']}; {len(summary['notices'])} notice line(s).", file=sys.stderr)
+    if holds is not None:
+        print(f"Expired {holds['expired']} uncollected hold(s): {holds['reassigned']} passed on, "
+              f"{holds['shelved']} shelved, {holds['failed']} failed.", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# Imports
+# threading: lock/condition guarding the pool across desk threads
+# time: idle ages, wait times and timeouts
+# collections.deque: stack of idle connections (most recently used on the right)
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection frees up within the checkout timeout."""
+
+
+def default_check(conn):
+    """Return True if the connection still talks to the server."""
+    try:
+        return conn.is_connected()
+    except Exception:
+        return False
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of database connections.
+
+    Connections are created lazily by `factory` up to `size`. Idle connections
+    are kept on a LIFO stack so the warm ones get reused and the cold ones age
+    out: anything idle longer than `idle_timeout` seconds is closed. A
+    connection idle longer than `ping_interval` seconds is health-checked on
+    checkout and transparently replaced if the server dropped it.
+    """
+
+    def __init__(self, factory, size=10, timeout=30.0, idle_timeout=300.0,
+                 ping_interval=1.0, check=default_check):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+        self.check = check
+        self._idle = deque()        # (conn, released_at)
+        self._open = 0              # connections alive or being opened
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Counters exposed through stats()
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._reconnects = 0
+        self._evicted = 0
+        self._peak_in_use = 0
+
+    def _evict_idle(self, now):
+        """Close idle connections past idle_timeout (oldest are on the left)."""
+        stale = []
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            stale.append(self._idle.popleft()[0])
+            self._open -= 1
+            self._evicted += 1
+        return stale
+
+    def acquire(self, timeout=None):
+        """Check a connection out, waiting up to `timeout` seconds for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed.")
+                now = time.monotonic()
+                stale = self._evict_idle(now)
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    conn, released_at = None, now
+                    self._open += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No connection available after {timeout:.1f}s "
+                        f"({self._in_use}/{self.size} in use)."
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._checkouts += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+            if waited:
+                elapsed = time.monotonic() - start
+                self._waits += 1
+                self._wait_time += elapsed
+                self._max_wait = max(self._max_wait, elapsed)
+
+        # Network work happens outside the lock
+        for old in stale:
+            _close_quietly(old)
+        try:
+            if conn is None:
+                conn = self.factory()
+                with self._cond:
+                    self._created += 1
+            elif (time.monotonic() - released_at > self.ping_interval
+                  and not self.check(conn)):
+                _close_quietly(conn)
+                conn = self.factory()
+                with self._cond:
+                    self._created += 1
+                    self._reconnects += 1
+        except Exception:
+            # Give the slot back so a dead server doesn't shrink the pool
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, broken=False):
+        """Return a connection to the pool; broken ones are closed and replaced lazily."""
+        if not broken:
+            try:
+                # Never hand the next desk someone else's half-done transaction
+                if getattr(conn, 'in_transaction', False):
+                    conn.rollback()
+            except Exception:
+                broken = True
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                self._open -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if broken or self._closed:
+            _close_quietly(conn)
+
+    def close(self):
+        """Close every idle connection and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._open -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        """Snapshot of pool utilization and wait-time counters."""
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'utilization': self._in_use / self.size,
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'total_wait_s': self._wait_time,
+                'avg_wait_s': self._wait_time / self._waits if self._waits else 0.0,
+                'max_wait_s': self._max_wait,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'reconnects': self._reconnects,
+                'evicted': self._evicted,
+            }
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
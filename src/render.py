@@ -0,0 +1,188 @@
+# Imports
+# csv/json: the csv, tsv, json and jsonl output modes
+# os/shlex/subprocess: pipe long listings through $PAGER
+# sys: default output stream and terminal detection
+import csv
+import json
+import os
+import shlex
+import subprocess
+import sys
+from itertools import chain, islice
+
+# Streaming result renderer used by print_table. Rows (dicts) may come from a
+# list or straight from a generator such as crud.iter_rows: column widths are
+# taken from the first SAMPLE_ROWS rows (or given up front), so the first row
+# is printed before the rest has been fetched and memory stays at one sample
+# however long the listing. Text output is written in blocks of FLUSH_ROWS.
+
+OUTPUT_FORMATS = ('table', 'csv', 'tsv', 'json', 'jsonl')
+# Rows read ahead to size the columns in table mode
+SAMPLE_ROWS = 100
+# Rows formatted per write to the output stream
+FLUSH_ROWS = 500
+# Widest a column may grow; longer values are cut short and end in ELLIPSIS
+MAX_COLUMN_WIDTH = 60
+# Tighter limits for free-text columns
+COLUMN_LIMITS = {'description': 40, 'address': 40}
+ELLIPSIS = '…'
+DEFAULT_PAGER = 'less -FRSX'
+
+# Display names for column headers
+HEADERS = {
+    'loan_id': 'Loan #',
+    'member_id': 'Member #',
+    'name': 'Name',
+    'ssn': 'SSN',
+    'address': 'Address',
+    'expiration_date': 'Expiration Date',
+    'active_flag': 'Active',
+    'professor_privileges': 'Privileges',
+    'isbn': 'ISBN',
+    'title': 'Title',
+    'subject': 'Subject',
+    'author': 'Author',
+    'description': 'Description',
+    'copy_id': 'Copy ID',
+    'status': 'Status',
+    'location': 'Location',
+    'checkout_date': 'Checkout Date',
+    'due_date': 'Due Date',
+    'return_date': 'Return Date',
+    'overdue_status': 'Overdue Status',
+    'staff_id': 'Staff ID',
+    'staff_name': 'Staff Name',
+    'staff_role': 'Role',
+    'relevance': 'Relevance',
+    'days_late': 'Days Late',
+    'fine': 'Fine',
+    'available': 'Available',
+    'total': 'Total',
+    'hold_id': 'Hold #',
+    'priority': 'Priority',
+    'placed_at': 'Placed At',
+    'ready_until': 'Ready Until',
+    'position': 'Position',
+    'checkouts': 'Checkouts',
+    'returns': 'Returns',
+    'late_returns': 'Late Returns',
+    'peak_on_loan': 'Peak Out',
+    'copies': 'Copies',
+    'avg_on_loan': 'Avg Out',
+    'utilization': 'Utilization',
+    'row_version': 'Version'
+}
+
+
+def _clip(text, width):
+    return text if len(text) <= width else text[:width - 1] + ELLIPSIS
+
+def column_widths(headers, rows, widths=None):
+    """Width per column: the header or the longest sampled value, within the column's limit."""
+    widths = dict(widths or {})
+    for h in headers:
+        if h in widths:
+            continue
+        limit = COLUMN_LIMITS.get(h, MAX_COLUMN_WIDTH)
+        longest = max((len(str(r[h])) for r in rows), default=0)
+        widths[h] = max(len(HEADERS.get(h, h)), min(longest, limit))
+    return widths
+
+def _table_lines(headers, rows, widths):
+    header_line = " | ".join(HEADERS.get(h, h).ljust(widths[h]) for h in headers)
+    yield header_line
+    yield "-" * len(header_line)
+    # One format call per row; values are clipped first so overlong ones can't push columns out
+    line = " | ".join(f"{{:<{widths[h]}}}" for h in headers).format
+    limits = [widths[h] for h in headers]
+    for r in rows:
+        yield line(*[_clip(str(r[h]), w) for h, w in zip(headers, limits)])
+
+class _LastLine:
+    """File-like target that keeps just the line csv.writer last wrote."""
+
+    def write(self, text):
+        self.text = text
+
+def _delimited_lines(headers, rows, dialect):
+    target = _LastLine()
+    writer = csv.writer(target, dialect=dialect, lineterminator='')
+    writer.writerow(headers)
+    yield target.text
+    for r in rows:
+        writer.writerow(['' if r[h] is None else r[h] for h in headers])
+        yield target.text
+
+def _lines(fmt, headers, rows, widths):
+    if fmt == 'table':
+        return _table_lines(headers, rows, widths)
+    if fmt == 'csv':
+        return _delimited_lines(headers, rows, 'excel')
+    if fmt == 'tsv':
+        return _delimited_lines(headers, rows, 'excel-tab')
+    if fmt == 'jsonl':
+        return (json.dumps(r, default=str) for r in rows)
+    if fmt == 'json':
+        return _json_lines(rows)
+    raise ValueError(f"Unknown output format {fmt!r}; expected one of {', '.join(OUTPUT_FORMATS)}")
+
+def _json_lines(rows):
+    """A JSON array written one element per line, so it streams like the others."""
+    yield "["
+    separator = ""
+    for r in rows:
+        yield separator + json.dumps(r, default=str)
+        separator = ","
+    yield "]"
+
+def _open_pager():
+    """A pager process reading from a pipe, or None when stdout isn't a terminal."""
+    if not sys.stdout.isatty():
+        return None
+    command = os.environ.get('PAGER') or DEFAULT_PAGER
+    try:
+        return subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE, text=True)
+    except OSError:
+        return None
+
+def print_table(rows, fmt='table', out=None, pager=False, widths=None):
+    """
+    Print rows (a list or any iterable of dicts) as a table, or as csv, tsv,
+    json or jsonl for piping. widths={column: n} fixes column widths instead
+    of sampling. pager=True sends the output through $PAGER (less) when
+    printing to a terminal; quitting the pager stops reading `rows`.
+    """
+    out = out or sys.stdout
+    rows = iter(rows)
+    sample = list(islice(rows, SAMPLE_ROWS if fmt == 'table' else 1))
+    if not sample:
+        if fmt in ('table', 'json'):
+            print("No records found." if fmt == 'table' else "[]", file=out)
+        return
+    headers = list(sample[0].keys())
+    if fmt == 'table':
+        widths = column_widths(headers, sample, widths)
+
+    process = _open_pager() if pager and out is sys.stdout else None
+    stream = process.stdin if process is not None else out
+    try:
+        # The header and sample go out as soon as they are formatted; after that, every FLUSH_ROWS lines
+        block, limit = [], len(sample) + 2
+        for text in _lines(fmt, headers, chain(sample, rows), widths):
+            block.append(text)
+            if len(block) >= limit:
+                stream.write("\n".join(block) + "\n")
+                stream.flush()
+                block, limit = [], FLUSH_ROWS
+        if block:
+            stream.write("\n".join(block) + "\n")
+        stream.flush()
+    except BrokenPipeError:
+        pass    # the reader (pager, head, ...) quit early
+    finally:
+        if process is not None:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
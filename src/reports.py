@@ -0,0 +1,438 @@
+# Imports
+# argparse/json: refresh and report commands, JSON output
+# os: CSV export directories for ad-hoc runs
+# datetime: day arithmetic for refreshes and date ranges
+# numpy/pandas (optional): vectorized ad-hoc reports over a streamed export
+import argparse
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import crud
+from backends import Error
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:     # only the ad-hoc reports need them
+    np = pd = None
+
+# Circulation reports served from the daily rollup tables of migration 007.
+# refresh() folds the Loan rows of every closed day since the watermark into
+# CirculationDaily, MemberDaily and LocationDaily; the report functions then
+# answer any date range from those tables without touching Loan. The
+# adhoc_* functions compute the same reports with pandas straight from an
+# export (or the live tables) for one-off questions the rollups don't cover.
+
+WATERMARK = 'circulation'
+# Rows shown by the top-N reports
+TOP_N = 10
+
+# Every loan event in (after, through]: a checkout on checkout_date and a
+# return on return_date, with the copy's current location (crud.update_copy
+# moves the watermark back when a copy is relocated, so all of a copy's
+# events stay under one location and on_loan carries forward correctly)
+EVENTS_SQL = (
+    "SELECT l.checkout_date AS day, l.isbn, COALESCE(l.staff_id, 0) AS staff_id, "
+    "COALESCE(c.location, '') AS location, l.member_id, 1 AS checkouts, 0 AS returns, 0 AS late_returns "
+    "FROM Loan l LEFT JOIN Copy c ON c.isbn = l.isbn AND c.copy_id = l.copy_id "
+    "WHERE l.checkout_date > %s AND l.checkout_date <= %s "
+    "UNION ALL "
+    "SELECT l.return_date, l.isbn, COALESCE(l.staff_id, 0), COALESCE(c.location, ''), l.member_id, 0, 1, "
+    "CASE WHEN l.return_date > l.due_date THEN 1 ELSE 0 END "
+    "FROM Loan l LEFT JOIN Copy c ON c.isbn = l.isbn AND c.copy_id = l.copy_id "
+    "WHERE l.return_date > %s AND l.return_date <= %s"
+)
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+def _location_row(location, checkouts, loan_days, peak_on_loan, copies, days):
+    """One utilization row; loan_days is the sum of copies out over the `days` of the range."""
+    return {
+        'location': location,
+        'checkouts': int(checkouts),
+        'peak_on_loan': int(peak_on_loan),
+        'copies': int(copies),
+        'avg_on_loan': round(loan_days / days, 2),
+        'utilization': round(loan_days / (days * copies), 4) if copies else None,
+    }
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+# --- Rollup Refresh ---
+
+def refresh(through=None, rebuild_from=None):
+    """
+    Bring the rollups up to `through` (default: yesterday, the last closed day).
+    Only days after the watermark are read from Loan, so a nightly run costs
+    one day of loans. rebuild_from=<date> recomputes everything from that day
+    on (after loans were back-dated or edited by hand). Runs as one
+    transaction; the watermark row lock keeps two refreshes from overlapping.
+    Returns {'from': date or None, 'through': date, 'days': n}.
+    """
+    through = _to_date(through) or date.today() - timedelta(days=1)
+    conn = crud.get_connection()
+    cursor = crud.open_cursor(conn)
+    try:
+        cursor.execute("SELECT through_day FROM RollupWatermark WHERE name = %s FOR UPDATE", (WATERMARK,))
+        row = cursor.fetchone()
+        if row is None:
+            raise RuntimeError("No RollupWatermark row; run init_db.py to apply migrations.")
+        after = _to_date(row[0])
+        if rebuild_from is not None:
+            after = min(after, _to_date(rebuild_from) - timedelta(days=1)) if after else None
+        if after is None:
+            # First run: start the day before the oldest loan
+            cursor.execute("SELECT MIN(checkout_date) FROM Loan")
+            first = _to_date(cursor.fetchone()[0])
+            after = (first or through + timedelta(days=1)) - timedelta(days=1)
+        if after >= through:
+            conn.rollback()
+            return {'from': None, 'through': after, 'days': 0}
+
+        for table in ('CirculationDaily', 'MemberDaily', 'LocationDaily'):
+            cursor.execute(f"DELETE FROM {table} WHERE day > %s", (after,))
+        window = (after, through, after, through)
+        cursor.execute(
+            "INSERT INTO CirculationDaily (day, isbn, staff_id, location, checkouts, returns, late_returns) "
+            "SELECT day, isbn, staff_id, location, SUM(checkouts), SUM(returns), SUM(late_returns) "
+            f"FROM ({EVENTS_SQL}) e GROUP BY day, isbn, staff_id, location",
+            window
+        )
+        cursor.execute(
+            "INSERT INTO MemberDaily (day, member_id, checkouts, returns, late_returns) "
+            "SELECT day, member_id, SUM(checkouts), SUM(returns), SUM(late_returns) "
+            f"FROM ({EVENTS_SQL}) e GROUP BY day, member_id",
+            window
+        )
+        _roll_locations(cursor, after, through)
+        cursor.execute("UPDATE RollupWatermark SET through_day = %s WHERE name = %s", (through, WATERMARK))
+        conn.commit()
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        crud.release_connection()
+    return {'from': after + timedelta(days=1), 'through': through, 'days': (through - after).days}
+
+def _roll_locations(cursor, after, through):
+    """
+    Fill LocationDaily for (after, through]: carry each location's on_loan
+    forward from the day before, adding that day's checkouts and removing its
+    returns. Locations with nothing out and no activity get no row.
+    """
+    cursor.execute("SELECT location, on_loan FROM LocationDaily WHERE day = %s", (after,))
+    on_loan = defaultdict(int, {location: n for location, n in cursor.fetchall()})
+    cursor.execute(
+        "SELECT day, location, SUM(checkouts), SUM(returns) FROM CirculationDaily "
+        "WHERE day > %s AND day <= %s GROUP BY day, location",
+        (after, through)
+    )
+    activity = defaultdict(dict)
+    for day, location, checkouts, returns in cursor.fetchall():
+        activity[_to_date(day)][location] = (int(checkouts), int(returns))
+    rows = []
+    for day in _days(after + timedelta(days=1), through):
+        today = activity.get(day, {})
+        for location in set(on_loan) | set(today):
+            checkouts, returns = today.get(location, (0, 0))
+            on_loan[location] += checkouts - returns
+            if on_loan[location] or checkouts or returns:
+                rows.append((day, location, checkouts, returns, on_loan[location]))
+    if rows:
+        cursor.executemany(
+            "INSERT INTO LocationDaily (day, location, checkouts, returns, on_loan) VALUES (%s, %s, %s, %s, %s)",
+            rows
+        )
+
+def watermark():
+    """Last day the rollups cover, or None before the first refresh."""
+    return _to_date(_query("SELECT through_day FROM RollupWatermark WHERE name = %s", (WATERMARK,))[0]['through_day'])
+
+
+# --- Reports (from the rollups) ---
+
+def _query(sql, params):
+    conn = crud.get_connection()
+    cursor = crud.open_cursor(conn, dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        crud.release_connection()
+
+def _ints(rows, *columns):
+    """SUM() comes back as Decimal on MySQL; make the counts plain ints."""
+    for row in rows:
+        for column in columns:
+            row[column] = int(row[column] or 0)
+    return rows
+
+def loans_by_subject(start, end):
+    """Checkouts, returns and late returns per Book.subject, busiest first."""
+    return _ints(_query(
+        "SELECT COALESCE(b.subject, '') AS subject, SUM(d.checkouts) AS checkouts, "
+        "SUM(d.returns) AS returns, SUM(d.late_returns) AS late_returns "
+        "FROM CirculationDaily d LEFT JOIN Book b ON b.isbn = d.isbn "
+        "WHERE d.day >= %s AND d.day <= %s "
+        "GROUP BY COALESCE(b.subject, '') ORDER BY checkouts DESC, subject",
+        (start, end)
+    ), 'checkouts', 'returns', 'late_returns')
+
+def top_titles(start, end, limit=TOP_N):
+    """Most borrowed titles."""
+    return _ints(_query(
+        "SELECT t.isbn, b.title, b.author, t.checkouts FROM ("
+        "SELECT isbn, SUM(checkouts) AS checkouts FROM CirculationDaily "
+        "WHERE day >= %s AND day <= %s GROUP BY isbn"
+        ") t LEFT JOIN Book b ON b.isbn = t.isbn "
+        "WHERE t.checkouts > 0 ORDER BY t.checkouts DESC, t.isbn LIMIT %s",
+        (start, end, limit)
+    ), 'checkouts')
+
+def busiest_staff(start, end, limit=TOP_N):
+    """Staff members by loans made (Loan.staff_id)."""
+    return _ints(_query(
+        "SELECT t.staff_id, s.staff_name, t.checkouts FROM ("
+        "SELECT staff_id, SUM(checkouts) AS checkouts FROM CirculationDaily "
+        "WHERE day >= %s AND day <= %s GROUP BY staff_id"
+        ") t LEFT JOIN Staff s ON s.staff_id = t.staff_id "
+        "WHERE t.checkouts > 0 ORDER BY t.checkouts DESC, t.staff_id LIMIT %s",
+        (start, end, limit)
+    ), 'checkouts')
+
+def location_utilization(start, end):
+    """
+    Per shelf location: average and peak copies out on loan, and utilization
+    (average out / copies there now, from CopyAvailability).
+    """
+    days = (end - start).days + 1
+    rows = _ints(_query(
+        "SELECT location, SUM(checkouts) AS checkouts, SUM(on_loan) AS loan_days, MAX(on_loan) AS peak_on_loan "
+        "FROM LocationDaily WHERE day >= %s AND day <= %s GROUP BY location",
+        (start, end)
+    ), 'checkouts', 'loan_days', 'peak_on_loan')
+    copies = {r['location']: int(r['copies']) for r in _query(
+        "SELECT location, SUM(total) AS copies FROM CopyAvailability GROUP BY location", ())}
+    rows = [_location_row(r['location'], r['checkouts'], r['loan_days'], r['peak_on_loan'],
+                          copies.get(r['location'], 0), days) for r in rows]
+    rows.sort(key=lambda r: (-(r['utilization'] or 0), r['location']))
+    return rows
+
+def member_activity(start, end, limit=TOP_N):
+    """{'active_members', 'checkouts', 'returns', 'late_returns', 'top': [...]} for the range."""
+    summary = _ints(_query(
+        "SELECT COUNT(DISTINCT member_id) AS active_members, SUM(checkouts) AS checkouts, "
+        "SUM(returns) AS returns, SUM(late_returns) AS late_returns "
+        "FROM MemberDaily WHERE day >= %s AND day <= %s",
+        (start, end)
+    ), 'active_members', 'checkouts', 'returns', 'late_returns')[0]
+    summary['top'] = _ints(_query(
+        "SELECT t.member_id, m.name, t.checkouts, t.late_returns FROM ("
+        "SELECT member_id, SUM(checkouts) AS checkouts, SUM(late_returns) AS late_returns "
+        "FROM MemberDaily WHERE day >= %s AND day <= %s GROUP BY member_id"
+        ") t LEFT JOIN Member m ON m.member_id = t.member_id "
+        "WHERE t.checkouts > 0 ORDER BY t.checkouts DESC, t.member_id LIMIT %s",
+        (start, end, limit)
+    ), 'checkouts', 'late_returns')
+    return summary
+
+def report(start, end, limit=TOP_N):
+    """All reports for [start, end]; 'through' is how far the rollups reach."""
+    start, end = _to_date(start), _to_date(end)
+    return {
+        'from': start,
+        'to': end,
+        'through': watermark(),
+        'subjects': loans_by_subject(start, end),
+        'top_titles': top_titles(start, end, limit),
+        'staff': busiest_staff(start, end, limit),
+        'locations': location_utilization(start, end),
+        'members': member_activity(start, end, limit),
+    }
+
+
+# --- Ad-hoc Reports (pandas) ---
+
+# Columns each ad-hoc report reads; everything else is skipped while loading
+FRAME_COLUMNS = {
+    'Loan': ['member_id', 'isbn', 'copy_id', 'checkout_date', 'due_date', 'return_date', 'staff_id'],
+    'Book': ['isbn', 'title', 'author', 'subject'],
+    'Copy': ['isbn', 'copy_id', 'location'],
+    'Staff': ['staff_id', 'staff_name'],
+    'Member': ['member_id', 'name'],
+}
+DATE_COLUMNS = ('checkout_date', 'due_date', 'return_date')
+
+def _require_pandas():
+    if pd is None:
+        raise RuntimeError("Ad-hoc reports need numpy and pandas (pip install pandas).")
+
+def load_frames(source=None, chunk_size=crud.PAGE_SIZE):
+    """
+    One DataFrame per table with just FRAME_COLUMNS, built chunk by chunk.
+    `source` is a directory of <Table>.csv files (bench/datagen.py or an
+    export); without one the live tables are streamed page by page.
+    """
+    _require_pandas()
+    frames = {}
+    for table, columns in FRAME_COLUMNS.items():
+        if source is not None:
+            chunks = pd.read_csv(os.path.join(source, f"{table}.csv"), usecols=columns,
+                                 dtype={'isbn': str}, chunksize=chunk_size)
+        else:
+            pages = crud.iter_rows(table, page_size=chunk_size)
+            chunks = (pd.DataFrame.from_records(page, columns=columns) for page in _pages(pages, chunk_size))
+        frame = pd.concat(list(chunks), ignore_index=True)
+        for column in DATE_COLUMNS:
+            if column in frame:
+                frame[column] = pd.to_datetime(frame[column]).dt.normalize()
+        frames[table] = frame
+    return frames
+
+def _pages(rows, size):
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) >= size:
+            yield page
+            page = []
+    yield page
+
+def adhoc_report(frames, start, end, limit=TOP_N):
+    """The same reports as report(), computed with pandas from load_frames() output."""
+    _require_pandas()
+    start, end = pd.Timestamp(_to_date(start)), pd.Timestamp(_to_date(end))
+    days = (end - start).days + 1
+    loans = frames['Loan'].merge(frames['Copy'], on=['isbn', 'copy_id'], how='left')
+    loans['location'] = loans['location'].fillna('')
+    loans['staff_id'] = loans['staff_id'].fillna(0).astype(int)
+    out = loans[(loans['checkout_date'] >= start) & (loans['checkout_date'] <= end)]
+    back = loans[(loans['return_date'] >= start) & (loans['return_date'] <= end)]
+    back_late = back[back['return_date'] > back['due_date']]
+
+    subject = frames['Book'].set_index('isbn')['subject'].fillna('')
+    subjects = pd.DataFrame({
+        'checkouts': out['isbn'].map(subject).value_counts(),
+        'returns': back['isbn'].map(subject).value_counts(),
+        'late_returns': back_late['isbn'].map(subject).value_counts(),
+    }).fillna(0).astype(int).rename_axis('subject').reset_index()
+    subjects = subjects.sort_values(['checkouts', 'subject'], ascending=[False, True])
+
+    def top(counts, key, lookup):
+        counts = counts.rename('checkouts').rename_axis(key).reset_index()
+        counts = counts.sort_values(['checkouts', key], ascending=[False, True]).head(limit)
+        return counts.merge(lookup, on=key, how='left')
+
+    titles = top(out['isbn'].value_counts(), 'isbn', frames['Book'][['isbn', 'title', 'author']])
+    staff = top(out['staff_id'].value_counts(), 'staff_id', frames['Staff'])
+
+    # Copies out at the end of each day in the range = days each loan overlaps it
+    first = np.maximum(loans['checkout_date'].values, start.to_datetime64())
+    stop = loans['return_date'].fillna(end + pd.Timedelta(days=1)).values
+    stop = np.minimum(stop, (end + pd.Timedelta(days=1)).to_datetime64())
+    loans['loan_days'] = np.maximum((stop - first) / np.timedelta64(1, 'D'), 0).astype(int)
+    # Peak: running total of +1 on each loan's first day in range, -1 the day it came back
+    held = loans['loan_days'] > 0
+    moves = pd.concat([
+        pd.DataFrame({'location': loans['location'][held], 'day': first[held], 'move': 1}),
+        pd.DataFrame({'location': loans['location'][held], 'day': stop[held], 'move': -1}),
+    ]).groupby(['location', 'day'])['move'].sum()
+    locations = loans.groupby('location').agg(loan_days=('loan_days', 'sum'))
+    locations['checkouts'] = out['location'].value_counts()
+    locations['peak_on_loan'] = moves.groupby(level='location').cumsum().groupby(level='location').max()
+    copies = frames['Copy']['location'].fillna('').value_counts()
+    locations = locations.join(copies.rename('copies')).fillna(0).astype(int).reset_index()
+    locations = locations[(locations['loan_days'] > 0) | (locations['checkouts'] > 0)]
+    locations = [_location_row(r.location, r.checkouts, r.loan_days, r.peak_on_loan, r.copies, days)
+                 for r in locations.itertuples()]
+    locations.sort(key=lambda r: (-(r['utilization'] or 0), r['location']))
+
+    members = pd.DataFrame({
+        'checkouts': out['member_id'].value_counts(),
+        'late_returns': back_late['member_id'].value_counts(),
+    }).fillna(0).astype(int).rename_axis('member_id').reset_index()
+    active = pd.concat([out['member_id'], back['member_id']]).nunique()
+    top_members = members[members['checkouts'] > 0].sort_values(['checkouts', 'member_id'], ascending=[False, True])
+    top_members = top_members.head(limit).merge(frames['Member'], on='member_id', how='left')
+
+    return {
+        'from': start.date(),
+        'to': end.date(),
+        'through': None,
+        'subjects': subjects.to_dict('records'),
+        'top_titles': titles[['isbn', 'title', 'author', 'checkouts']].to_dict('records'),
+        'staff': staff[['staff_id', 'staff_name', 'checkouts']].to_dict('records'),
+        'locations': locations,
+        'members': {
+            'active_members': int(active),
+            'checkouts': len(out),
+            'returns': len(back),
+            'late_returns': len(back_late),
+            'top': top_members[['member_id', 'name', 'checkouts', 'late_returns']].to_dict('records'),
+        },
+    }
+
+
+# --- Command Line ---
+
+def print_report(result):
+    print(f"\nCirculation {result['from']} to {result['to']}"
+          + (f" (rollups through {result['through']})" if result['through'] else ""))
+    for title, key in (("Loans by subject", 'subjects'), ("Top titles", 'top_titles'),
+                       ("Busiest staff", 'staff'), ("Location utilization", 'locations')):
+        print(f"\n{title}:")
+        crud.print_table(result[key])
+    members = result['members']
+    print(f"\nMembers: {members['active_members']} active, {members['checkouts']} checkouts, "
+          f"{members['returns']} returns ({members['late_returns']} late)")
+    crud.print_table(members['top'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh circulation rollups and print reports.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh_cmd = commands.add_parser('refresh', help="Fold closed days since the watermark into the rollups")
+    refresh_cmd.add_argument('--through', help="Last day to include, YYYY-MM-DD (default: yesterday)")
+    refresh_cmd.add_argument('--rebuild-from', help="Recompute from this YYYY-MM-DD on")
+    report_cmd = commands.add_parser('report', help="Print the reports for a date range")
+    report_cmd.add_argument('--from', dest='start', required=True, help="First day, YYYY-MM-DD")
+    report_cmd.add_argument('--to', dest='end', required=True, help="Last day, YYYY-MM-DD")
+    report_cmd.add_argument('--limit', type=int, default=TOP_N, help="Rows in the top-N reports")
+    report_cmd.add_argument('--adhoc', nargs='?', const='', metavar='CSV_DIR',
+                            help="Compute with pandas from CSV exports in CSV_DIR (or the live tables)")
+    report_cmd.add_argument('--json', action='store_true', help="Print JSON instead of tables")
+    args = parser.parse_args()
+
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=2)
+    try:
+        if args.command == 'refresh':
+            done = refresh(args.through, args.rebuild_from)
+            print(f"Rolled up {done['days']} day(s) through {done['through']}.")
+            return
+        if args.adhoc is not None:
+            result = adhoc_report(load_frames(args.adhoc or None), args.start, args.end, args.limit)
+        else:
+            result = report(args.start, args.end, args.limit)
+    finally:
+        crud.close_pool()
+    if args.json:
+        print(json.dumps(result, default=str, indent=2))
+    else:
+        print_report(result)
+
+if __name__ == '__main__':
+    main()
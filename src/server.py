@@ -0,0 +1,414 @@
+# Imports
+# argparse: server options
+# base64/json: JSON bodies and opaque paging cursors
+# gzip/hashlib: compressed list responses and ETags
+# http.server/socket: threaded HTTP server on a shared listening socket
+# os/signal: pre-fork worker processes
+# urllib.parse: routing and query strings
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import signal
+import socket
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import crud
+from pool import PoolTimeout
+
+# Headless HTTP/JSON front end for self-checkout kiosks and the web catalog.
+# Every request runs on one pooled connection (crud's per-thread checkout is
+# re-entrant, so all CRUD calls a request makes share it). The CRUD functions
+# are looked up on `api`, which defaults to the crud module; tests can pass
+# any object with the same functions as a local stand-in for the database.
+
+# Largest accepted request body, in bytes
+MAX_BODY = 1 << 20
+# Default and maximum rows per list page
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+# Only compress responses at least this large
+GZIP_MIN_BYTES = 1024
+# Seconds a client is asked to wait when every pooled connection is busy
+RETRY_AFTER = 1
+
+# URL segment, table name, function suffix and key columns for each resource
+RESOURCES = {
+    'books': ('Book', 'book', ('isbn',)),
+    'copies': ('Copy', 'copy', ('isbn', 'copy_id')),
+    'members': ('Member', 'member', ('member_id',)),
+    'staff': ('Staff', 'staff', ('staff_id',)),
+    'loans': ('Loan', 'loan', ('loan_id',)),
+}
+# Integer key columns (URL segments arrive as text)
+INT_KEYS = {'copy_id', 'member_id', 'staff_id', 'loan_id'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+def record_etag(record):
+    """Strong ETag for a record: the hash of its canonical JSON."""
+    body = json.dumps(record, default=_json_default, sort_keys=True).encode()
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def _etag_list(header):
+    return [t.strip() for t in (header or '').split(',') if t.strip()]
+
+def encode_cursor(after):
+    """Turn a keyset position into an opaque URL-safe token."""
+    if after is None:
+        return None
+    raw = json.dumps(list(after), default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return tuple(json.loads(base64.urlsafe_b64decode(padded)))
+    except ValueError:
+        raise HTTPError(400, "Invalid 'after' cursor.")
+
+
+class LibraryHandler(BaseHTTPRequestHandler):
+    """Routes /<resource>[/<key>...] requests to the CRUD functions on `self.server.api`."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'LibraryMS'
+
+    # --- plumbing ---
+
+    def _send(self, status, payload=None, headers=None, compress=False):
+        body = b'' if payload is None else json.dumps(payload, default=_json_default).encode()
+        headers = dict(headers or {})
+        if (compress and len(body) >= GZIP_MIN_BYTES
+                and 'gzip' in self.headers.get('Accept-Encoding', '')):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+            headers['Vary'] = 'Accept-Encoding'
+        self.send_response(status)
+        if payload is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type='text/plain; version=0.0.4; charset=utf-8'):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _read_raw_body(self):
+        """Read the whole request body up front so keep-alive stays in sync on errors."""
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise HTTPError(413, "Request body too large.")
+        return self.rfile.read(length) if length else b''
+
+    def _body(self):
+        if not self._raw_body:
+            return {}
+        try:
+            body = json.loads(self._raw_body)
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON.")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body must be a JSON object.")
+        return body
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            self._raw_body = self._read_raw_body()
+        except (HTTPError, ValueError) as e:
+            self.close_connection = True
+            return self._send(getattr(e, 'status', 400), {'error': str(e)})
+        try:
+            # One pooled connection for the whole request
+            self.server.api.get_connection()
+            self._route(parts, query)
+        except PoolTimeout as e:
+            self._send(503, {'error': str(e)}, {'Retry-After': str(RETRY_AFTER)})
+        except HTTPError as e:
+            self._send(e.status, {'error': e.message})
+        except crud.CirculationError as e:
+            self._send(409, {'error': str(e)})
+        except KeyError as e:
+            self._send(400, {'error': f"Missing field {e}."})
+        except (TypeError, ValueError) as e:
+            self._send(400, {'error': str(e)})
+        except Exception as e:
+            self.log_error("Unhandled error: %r", e)
+            self._send(500, {'error': "Internal error."})
+        finally:
+            self.server.api.release_connection()
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _dispatch
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    # --- routing ---
+
+    def _route(self, parts, query):
+        method = 'GET' if self.command == 'HEAD' else self.command
+        if parts == ['stats'] and method == 'GET':
+            return self._send(200, {'pool': self.server.api.pool_stats(), 'cache': self.server.api.cache_stats(),
+                                    'queries': self.server.api.query_stats()})
+        if parts == ['metrics'] and method == 'GET':
+            return self._send_text(200, self.server.api.metrics_text())
+        if parts == ['books', 'search'] and method == 'GET':
+            return self._search(query)
+        if parts and parts[0] == 'holds':
+            return self._holds(parts[1:], method)
+        if len(parts) == 3 and parts[0] == 'books' and parts[2] == 'holds' and method == 'GET':
+            return self._send(200, {'items': self.server.api.list_holds(parts[1])})
+        if parts == ['books', 'availability'] and method == 'GET':
+            return self._availability(query)
+        if parts == ['loans', 'checkout'] and method == 'POST':
+            body = self._body()
+            loan = self.server.api.checkout(body['member_id'], body['isbn'], body['copy_id'], body['staff_id'])
+            if loan is None:
+                raise HTTPError(503, "Checkout failed; try again.")
+            return self._send(201, loan)
+        if len(parts) == 3 and parts[0] == 'loans' and parts[2] == 'checkin' and method == 'POST':
+            result = self.server.api.checkin(int(parts[1]))
+            if result is None:
+                raise HTTPError(503, "Return failed; try again.")
+            return self._send(200, result)
+        if len(parts) == 3 and parts[0] == 'members' and parts[2] == 'account' and method == 'GET':
+            return self._account(int(parts[1]), query)
+        if not parts or parts[0] not in RESOURCES:
+            raise HTTPError(404, "No such resource.")
+        table, noun, keys = RESOURCES[parts[0]]
+        key_parts = parts[1:]
+        if not key_parts:
+            if method == 'GET':
+                return self._list(table, query)
+            if method == 'POST':
+                return self._add(table, noun, keys)
+            raise HTTPError(405, "Method not allowed.")
+        if len(key_parts) != len(keys):
+            raise HTTPError(404, "No such record.")
+        key = [int(v) if k in INT_KEYS else v for k, v in zip(keys, key_parts)]
+        if method == 'GET':
+            return self._get(noun, key)
+        if method == 'PATCH':
+            return self._update(table, noun, keys, key)
+        if method == 'DELETE':
+            if not getattr(self.server.api, f'delete_{noun}')(*key):
+                raise HTTPError(404, "No such record.")
+            return self._send(204)
+        raise HTTPError(405, "Method not allowed.")
+
+    # --- handlers ---
+
+    def _list(self, table, query):
+        limit = min(int(query.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        rows, after = self.server.api.fetch_page(table, decode_cursor(query.get('after')), limit)
+        self._send(200, {'items': rows, 'next': encode_cursor(after)}, compress=True)
+
+    def _search(self, query):
+        page = int(query.get('page', 1))
+        rows = self.server.api.search_books(query.get('q', ''), page)
+        self._send(200, {'items': rows, 'page': page}, compress=True)
+
+    def _holds(self, key_parts, method):
+        if not key_parts and method == 'POST':
+            body = self._body()
+            hold = self.server.api.place_hold(body['member_id'], body['isbn'])
+            if hold is None:
+                raise HTTPError(503, "Placing the hold failed; try again.")
+            return self._send(201, hold)
+        if len(key_parts) != 1:
+            raise HTTPError(404, "No such hold.")
+        hold_id = int(key_parts[0])
+        if method == 'GET':
+            hold = self.server.api.get_hold(hold_id)
+            if hold is None:
+                raise HTTPError(404, "No such hold.")
+            return self._send(200, hold)
+        if method == 'DELETE':
+            if not self.server.api.cancel_hold(hold_id):
+                raise HTTPError(404, "No open hold with that id.")
+            return self._send(204)
+        raise HTTPError(405, "Method not allowed.")
+
+    def _availability(self, query):
+        isbns = [i for i in query.get('isbn', '').split(',') if i]
+        if not isbns or len(isbns) > MAX_LIMIT:
+            raise HTTPError(400, f"Give 1 to {MAX_LIMIT} comma-separated ISBNs in 'isbn'.")
+        found = self.server.api.availability(isbns)
+        if found is None:
+            raise HTTPError(503, "Availability lookup failed; try again.")
+        self._send(200, found, compress=True)
+
+    def _account(self, member_id, query):
+        limit = min(int(query.get('limit', self.server.api.HISTORY_PAGE_SIZE)), MAX_LIMIT)
+        account = self.server.api.member_account(member_id, decode_cursor(query.get('after')), limit)
+        if account is None:
+            raise HTTPError(404, "No such member.")
+        account['history_next'] = encode_cursor(account['history_next'])
+        self._send(200, account, compress=True)
+
+    def _get(self, noun, key):
+        record = getattr(self.server.api, f'get_{noun}')(*key)
+        if record is None:
+            raise HTTPError(404, "No such record.")
+        etag = record_etag(record)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in _etag_list(self.headers.get('If-None-Match')):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send(200, record, headers)
+
+    def _add(self, table, noun, keys):
+        body = self._body()
+        columns = crud.TABLE_COLUMNS[table]
+        unknown = set(body) - set(columns)
+        if unknown:
+            raise HTTPError(400, f"Unknown field(s): {', '.join(sorted(unknown))}")
+        # Ids are generated when left out
+        for column in keys:
+            if column in INT_KEYS:
+                body.setdefault(column, None)
+        result = getattr(self.server.api, f'add_{noun}')(*(body.get(c) for c in columns))
+        if result is False:
+            raise HTTPError(400, f"Could not add {noun}.")
+        if result is not True:
+            body[keys[-1]] = result
+        self._send(201, {k: body[k] for k in keys})
+
+    def _update(self, table, noun, keys, key):
+        # Conditional when the body carries the row_version last read (409 if it
+        # has moved on) or the request an If-Match ETag from a GET (412)
+        body = self._body()
+        expected = body.pop(crud.VERSION_COLUMN, None)
+        if expected is not None:
+            expected = int(expected)
+        editable = crud.UPDATABLE_COLUMNS[table]
+        unknown = set(body) - set(editable)
+        if unknown or not body:
+            raise HTTPError(400, f"Editable fields: {', '.join(editable)}")
+        if_match = self.headers.get('If-Match')
+        if if_match and expected is None:
+            current = getattr(self.server.api, f'get_{noun}')(*key)
+            if current is None:
+                raise HTTPError(412 if if_match.strip() == '*' else 404, "No such record.")
+            tags = _etag_list(if_match)
+            if '*' not in tags and record_etag(current) not in tags:
+                raise HTTPError(412, "Record has changed; fetch it again.")
+            expected = current[crud.VERSION_COLUMN]
+        try:
+            updated = getattr(self.server.api, f'update_{noun}')(*key, expected_version=expected, **body)
+        except crud.UpdateConflict as e:
+            raise HTTPError(412 if if_match else 409, str(e))
+        if not updated:
+            raise HTTPError(404, "No such record or nothing changed.")
+        record = getattr(self.server.api, f'get_{noun}')(*key)
+        self._send(200, record, {'ETag': record_etag(record)})
+
+class LibraryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, api=crud, quiet=False, sock=None):
+        self.api = api
+        self.quiet = quiet
+        super().__init__(address, LibraryHandler, bind_and_activate=sock is None)
+        if sock is not None:
+            # Pre-forked worker: serve the listening socket the parent opened
+            self.socket.close()
+            self.socket = sock
+
+
+def make_server(host='127.0.0.1', port=8080, api=crud, quiet=False):
+    """Build a single-process server; call serve_forever() on it."""
+    return LibraryServer((host, port), api=api, quiet=quiet)
+
+def _raise_exit(signum, frame):
+    raise SystemExit(0)
+
+def serve(host, port, workers, backend, pool_size, quiet=False):
+    """
+    Serve with `workers` pre-forked processes sharing one listening socket.
+    Each worker opens its own connection pool after the fork, since
+    connections can't be shared across processes.
+    """
+    sock = socket.create_server((host, port), backlog=512)
+    children = []
+    for _ in range(workers - 1 if hasattr(os, 'fork') else 0):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+    crud.init_backend(backend, size=pool_size)
+    server = LibraryServer((host, port), quiet=quiet, sock=sock)
+    try:
+        if children:
+            # Unwind through the finally below so the workers are stopped too
+            signal.signal(signal.SIGTERM, _raise_exit)
+        else:
+            signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+        print(f"Worker {os.getpid()} serving http://{host}:{port}/")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        crud.close_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the LibraryMS CRUD API over HTTP/JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (pre-forked; 1 on platforms without fork)")
+    parser.add_argument('--pool-size', type=int, default=crud.POOL_SIZE,
+                        help="Database connections per worker")
+    parser.add_argument('--quiet', action='store_true', help="Don't log each request")
+    args = parser.parse_args()
+    backend = crud.backend_from_config(crud.prompt_credentials)
+    serve(args.host, args.port, args.workers, backend, args.pool_size, args.quiet)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,507 @@
+# Imports
+# argparse/json: export and import commands, the snapshot manifest
+# bisect: membership tests against the live loan id ranges
+# os/struct/zlib: snapshot files and the built-in compressed columnar format
+# time: per-table export timings
+# concurrent.futures: one export thread (and pooled connection) per table
+# pyarrow (optional): write and read the snapshot as Parquet instead
+import argparse
+import bisect
+import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from itertools import islice
+
+import crud
+from backends import Error
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:     # the built-in columnar format needs nothing extra
+    pa = pq = None
+
+# Snapshots of Book, Copy, Member, Staff and Loan for analytics and for
+# cloning an environment. Each table is read on its own pooled connection
+# with an unbuffered cursor and written batch by batch, so memory stays at
+# one batch per table however big the table is. A snapshot taken with a
+# base only writes the Loan rows that can have changed since the base was
+# taken, plus the ranges of loan ids that still exist so loans deleted since
+# are dropped; import_snapshot() follows the chain of bases back to a full one.
+# Tables are not read in one transaction, so the import drops (and reports)
+# rows whose parent row didn't make it into the snapshot.
+
+# Tables in load order (parents before the rows that reference them)
+TABLES = ('Book', 'Copy', 'Member', 'Staff', 'Loan')
+MANIFEST = 'snapshot.json'
+# Incremental snapshots only: [[first, last], ...] runs of loan ids in Loan
+LIVE_LOAN_IDS = 'loan_ids.json'
+FORMATS = ('parquet', 'columnar')
+EXTENSIONS = {'parquet': '.parquet', 'columnar': '.lmc'}
+# Rows an import could not load, one JSON object per line (default: in the snapshot directory)
+REJECTS = 'rejects.jsonl'
+# Rows fetched, encoded and written at a time (one Parquet row group / columnar batch)
+EXPORT_BATCH = 20000
+# zlib level for the columnar format: 3 is within ~10% of 6 on size at about two thirds of the time
+COMPRESSION_LEVEL = 3
+
+# Column types other than text
+COLUMN_TYPES = {
+    'copy_id': 'int', 'member_id': 'int', 'staff_id': 'int', 'loan_id': 'int',
+    'expiration_date': 'date', 'checkout_date': 'date', 'due_date': 'date', 'return_date': 'date',
+    'active_flag': 'bool', 'professor_privileges': 'bool',
+}
+
+# Loans a base snapshot can be missing: returned on or after the day it was
+# taken, or still open (that includes everything checked out since, plus the
+# renewals and overdue notices that change open loans without a new date).
+# Both branches are ranges on idx_loan_open_due and don't overlap.
+LOAN_DELTA_WHERE = (
+    "return_date >= %s",
+    "return_date IS NULL",
+)
+
+
+def _column_type(column):
+    return COLUMN_TYPES.get(column, 'str')
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
+
+def _normalize(columns, rows):
+    """Rows -> one list per column, with dates as date and flags as bool on every backend."""
+    values = [list(column) for column in zip(*rows)]
+    for i, column in enumerate(columns):
+        kind = _column_type(column)
+        if kind == 'date':
+            values[i] = [_to_date(v) for v in values[i]]
+        elif kind == 'bool':
+            values[i] = [None if v is None else bool(v) for v in values[i]]
+    return values
+
+
+# --- File Formats ---
+
+class ColumnarWriter:
+    """
+    Built-in format: a magic line, then length-prefixed zlib blocks. The
+    first block is the JSON header; after it each batch is one block per
+    column holding that column's values as a JSON list. Dates are stored as
+    day numbers (date.toordinal()), which encode and compress better than text.
+    """
+
+    MAGIC = b'LMSCOL1\n'
+
+    def __init__(self, path, table, columns):
+        self.columns = columns
+        self._file = open(path, 'wb')
+        self._file.write(self.MAGIC)
+        self._block({'table': table, 'columns': list(columns)})
+
+    def _block(self, value):
+        data = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), COMPRESSION_LEVEL)
+        self._file.write(struct.pack('<I', len(data)))
+        self._file.write(data)
+
+    def write(self, rows):
+        for column, values in zip(self.columns, _normalize(self.columns, rows)):
+            if _column_type(column) == 'date':
+                values = [None if v is None else v.toordinal() for v in values]
+            self._block(values)
+
+    def close(self):
+        self._file.close()
+
+def read_columnar(path):
+    """Yield the rows of a columnar file as lists of tuples, one batch at a time."""
+    with open(path, 'rb') as f:
+        if f.read(len(ColumnarWriter.MAGIC)) != ColumnarWriter.MAGIC:
+            raise ValueError(f"{path} is not a LibraryMS columnar file")
+
+        def block():
+            size = f.read(4)
+            if not size:
+                return None
+            return json.loads(zlib.decompress(f.read(struct.unpack('<I', size)[0])))
+
+        columns = block()['columns']
+        dates = [i for i, column in enumerate(columns) if _column_type(column) == 'date']
+        while True:
+            first = block()
+            if first is None:
+                return
+            values = [first] + [block() for _ in columns[1:]]
+            for i in dates:
+                values[i] = [None if v is None else date.fromordinal(v) for v in values[i]]
+            yield list(zip(*values))
+
+class ParquetWriter:
+    """Parquet via pyarrow (zstd); every batch becomes one row group."""
+
+    ARROW_TYPES = {'str': 'string', 'int': 'int32', 'date': 'date32', 'bool': 'bool_'}
+
+    def __init__(self, path, table, columns):
+        if pq is None:
+            raise RuntimeError("Parquet snapshots need pyarrow (pip install pyarrow); use --format columnar.")
+        self.columns = columns
+        self.schema = pa.schema([(c, getattr(pa, self.ARROW_TYPES[_column_type(c)])()) for c in columns])
+        self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        arrays = [pa.array(values, type=field.type)
+                  for field, values in zip(self.schema, _normalize(self.columns, rows))]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+def read_parquet(path, batch_size=EXPORT_BATCH):
+    """Yield the rows of a Parquet file as lists of tuples, one batch at a time."""
+    if pq is None:
+        raise RuntimeError("This snapshot is Parquet; reading it needs pyarrow (pip install pyarrow).")
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield list(zip(*(column.to_pylist() for column in batch.columns)))
+
+WRITERS = {'parquet': ParquetWriter, 'columnar': ColumnarWriter}
+
+
+# --- Export ---
+
+def _select(table, since):
+    columns = ', '.join(crud.TABLE_COLUMNS[table])
+    if since is None:
+        return f"SELECT {columns} FROM {table}", ()
+    sql = " UNION ALL ".join(f"SELECT {columns} FROM {table} WHERE {where}" for where in LOAN_DELTA_WHERE)
+    return sql, (since,)
+
+def export_table(table, path, fmt, since=None, batch_size=EXPORT_BATCH):
+    """
+    Stream one table into `path`. since=<date> (Loan only) writes just the
+    loans changed on or after that day. Returns {'rows', 'bytes', 'seconds'}.
+    """
+    started = time.perf_counter()
+    columns = crud.TABLE_COLUMNS[table]
+    sql, params = _select(table, since)
+    part = path + '.part'
+    writer = WRITERS[fmt](part, table, columns)
+    rows = 0
+    conn = crud.get_connection()
+    cursor = crud.open_stream(conn)
+    broken = False
+    try:
+        cursor.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            writer.write(batch)
+            rows += len(batch)
+    except BaseException:
+        # An unbuffered result left half-read makes the connection unusable
+        broken = True
+        raise
+    finally:
+        writer.close()
+        cursor.close()
+        crud.release_connection(broken=broken)
+        if broken:
+            os.remove(part)
+    os.replace(part, path)
+    return {'rows': rows, 'bytes': os.path.getsize(path), 'seconds': round(time.perf_counter() - started, 3)}
+
+def live_loan_ranges(batch_size=EXPORT_BATCH):
+    """Loan ids now in Loan as [[first, last], ...] runs, read in key order off the primary key."""
+    ranges = []
+    conn = crud.get_connection()
+    cursor = crud.open_stream(conn)
+    broken = False
+    try:
+        cursor.execute("SELECT loan_id FROM Loan ORDER BY loan_id")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for (loan_id,) in batch:
+                if ranges and ranges[-1][1] == loan_id - 1:
+                    ranges[-1][1] = loan_id
+                else:
+                    ranges.append([loan_id, loan_id])
+    except BaseException:
+        broken = True
+        raise
+    finally:
+        cursor.close()
+        crud.release_connection(broken=broken)
+    return ranges
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        return json.load(f)
+
+def export_snapshot(directory, fmt=None, base=None, jobs=len(TABLES), batch_size=EXPORT_BATCH):
+    """
+    Write every table to `directory` plus a snapshot.json manifest, `jobs`
+    tables at a time. With base=<snapshot dir>, Loan only gets the rows that
+    may have changed since the base's as_of day. Returns the manifest.
+    """
+    fmt = fmt or ('parquet' if pq is not None else 'columnar')
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown snapshot format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    since = None
+    if base is not None:
+        since = date.fromisoformat(read_manifest(base)['as_of'])
+    os.makedirs(directory, exist_ok=True)
+    # Taken before any table is read, so the next incremental snapshot overlaps this one
+    as_of = date.today()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {
+            table: pool.submit(export_table, table, os.path.join(directory, table + EXTENSIONS[fmt]), fmt,
+                               since if table == 'Loan' else None, batch_size)
+            for table in TABLES
+        }
+        tables = {table: {'file': table + EXTENSIONS[fmt], **future.result()} for table, future in futures.items()}
+    if since is not None:
+        # Scanned after the Loan rows were read: a loan deleted in between is dropped
+        # on import, and one added in between is just not in this snapshot yet
+        with open(os.path.join(directory, LIVE_LOAN_IDS), 'w') as f:
+            json.dump(live_loan_ranges(), f)
+    manifest = {
+        'format': fmt,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'as_of': as_of.isoformat(),
+        'backend': crud._backend.name,
+        'base': os.path.relpath(os.path.abspath(base), os.path.abspath(directory)) if base else None,
+        'loan_since': since.isoformat() if since else None,
+        'loan_ids': LIVE_LOAN_IDS if since else None,
+        'tables': tables,
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# --- Import ---
+
+def snapshot_chain(directory):
+    """[(directory, manifest), ...] from `directory` back to the full snapshot it builds on."""
+    chain = []
+    while directory is not None:
+        manifest = read_manifest(directory)
+        chain.append((directory, manifest))
+        if manifest['base'] is None:
+            return chain
+        directory = os.path.normpath(os.path.join(directory, manifest['base']))
+        if any(os.path.samefile(directory, d) for d, _ in chain):
+            raise ValueError(f"Snapshot chain loops back to {directory}")
+    return chain
+
+def read_table(directory, manifest, table, batch_size=EXPORT_BATCH):
+    """Yield the rows of one table of one snapshot, batch by batch."""
+    path = os.path.join(directory, manifest['tables'][table]['file'])
+    if manifest['format'] == 'parquet':
+        return read_parquet(path, batch_size)
+    return read_columnar(path)
+
+def _live_loan_test(directory, manifest):
+    """id -> bool against the newest snapshot's live loan id ranges (everything is live without them)."""
+    if not manifest.get('loan_ids'):
+        return lambda loan_id: True
+    with open(os.path.join(directory, manifest['loan_ids'])) as f:
+        ranges = json.load(f)
+    firsts = [first for first, _ in ranges]
+
+    def live(loan_id):
+        i = bisect.bisect_right(firsts, loan_id) - 1
+        return i >= 0 and loan_id <= ranges[i][1]
+    return live
+
+def iter_snapshot_rows(chain, table):
+    """
+    Every row of `table` as of the newest snapshot in `chain`. Loan rows are
+    taken newest first: a loan in a later delta replaces the copy in the
+    snapshots it builds on, and one that is no longer in the newest
+    snapshot's live id ranges was deleted and is skipped. Only the ids from
+    the deltas and the ranges are kept in memory.
+    """
+    if table != 'Loan':
+        directory, manifest = chain[0]
+        for batch in read_table(directory, manifest, table):
+            yield from batch
+        return
+    live = _live_loan_test(*chain[0])
+    seen = set()
+    for position, (directory, manifest) in enumerate(chain):
+        remember = position < len(chain) - 1
+        for batch in read_table(directory, manifest, table):
+            for row in batch:
+                if row[0] in seen or not live(row[0]):
+                    continue
+                if remember:
+                    seen.add(row[0])
+                yield row
+
+# Foreign keys among the snapshot tables, parents first: (table, columns,
+# parent, parent columns). Tables are read one at a time, so a snapshot can
+# hold a loan whose copy was added after Copy was read, or a copy whose book
+# was deleted after Book was
+REFERENCES = (
+    ('Copy', ('isbn',), 'Book', ('isbn',)),
+    ('Loan', ('member_id',), 'Member', ('member_id',)),
+    ('Loan', ('isbn', 'copy_id'), 'Copy', ('isbn', 'copy_id')),
+    ('Loan', ('staff_id',), 'Staff', ('staff_id',)),
+)
+
+# Cleared by import_snapshot(replace=True): everything derived from or
+# referencing the snapshot tables, children first
+REPLACED_TABLES = ('Hold', 'CirculationDaily', 'MemberDaily', 'LocationDaily', 'CopyAvailability',
+                   'Loan', 'Copy', 'Staff', 'Member', 'Book')
+
+def _write_reject(rejects, table, index, row, reason):
+    record = {'table': table, 'row': index, 'reason': reason, 'data': dict(zip(crud.TABLE_COLUMNS[table], row))}
+    rejects.write(json.dumps(record, default=str) + "\n")
+
+def _load_table(table, rows, chunk_size, rejects):
+    """
+    bulk_insert `rows` into `table` one chunk at a time, writing each chunk's
+    rejected rows to the `rejects` file, so memory stays at one chunk.
+    """
+    summary = {'inserted': 0, 'rejected': 0}
+    rows = iter(rows)
+    start = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return summary
+        result = crud.bulk_insert(table, chunk, chunk_size)
+        summary['inserted'] += result['inserted']
+        summary['rejected'] += len(result['rejected'])
+        for index, row, reason in result['rejected']:
+            _write_reject(rejects, table, start + index, row, reason)
+        start += len(chunk)
+
+def _orphan_where(table, columns, parent, parent_columns):
+    present = " AND ".join(f"{table}.{c} IS NOT NULL" for c in columns)
+    match = " AND ".join(f"p.{pc} = {table}.{c}" for c, pc in zip(columns, parent_columns))
+    return f"{present} AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE {match})"
+
+def drop_orphans(cursor, rejects):
+    """
+    Delete rows whose parent row is missing, writing each to the `rejects`
+    file. Run before foreign-key checks go back on (turning them on doesn't
+    check rows already loaded). Returns {table: rows dropped}.
+    """
+    dropped = dict.fromkeys(TABLES, 0)
+    for table, columns, parent, parent_columns in REFERENCES:
+        where = _orphan_where(table, columns, parent, parent_columns)
+        cursor.execute(f"SELECT {', '.join(crud.TABLE_COLUMNS[table])} FROM {table} WHERE {where}")
+        reason = f"no {parent} row for {', '.join(columns)}"
+        count = 0
+        while True:
+            batch = cursor.fetchmany(EXPORT_BATCH)
+            if not batch:
+                break
+            for row in batch:
+                _write_reject(rejects, table, None, row, reason)
+            count += len(batch)
+        if count:
+            cursor.execute(f"DELETE FROM {table} WHERE {where}")
+            dropped[table] += count
+    if dropped['Copy']:
+        # The dropped copies were counted into CopyAvailability as they were loaded
+        cursor.execute("DELETE FROM CopyAvailability "
+                       "WHERE NOT EXISTS (SELECT 1 FROM Book p WHERE p.isbn = CopyAvailability.isbn)")
+    return dropped
+
+def import_snapshot(directory, replace=False, chunk_size=crud.BATCH_SIZE, rejects_path=None):
+    """
+    Load the snapshot in `directory` (following its bases) with bulk_insert,
+    with foreign-key checks off for the load. replace=True first empties the
+    snapshot tables and everything built on them (holds, shelf availability,
+    circulation rollups, which reports.py refresh rebuilds). Rows that can't
+    be inserted, and rows left pointing at a missing parent row (dropped
+    before the checks go back on), are written to rejects_path as JSONL
+    (default: rejects.jsonl in `directory`).
+    Returns {table: {'inserted': n, 'rejected': n, 'orphaned': n}}.
+    """
+    chain = snapshot_chain(directory)
+    rejects_path = rejects_path or os.path.join(directory, REJECTS)
+    results = {}
+    conn = crud.get_connection()
+    cursor = crud.open_cursor(conn)
+    try:
+        if replace:
+            for table in REPLACED_TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            cursor.execute("UPDATE RollupWatermark SET through_day = NULL")
+            conn.commit()
+        crud._backend.set_load_checks(cursor, False)
+        try:
+            with open(rejects_path, 'w', encoding='utf-8') as rejects:
+                for table in TABLES:
+                    # bulk_insert runs on this thread's connection, so the checks stay off
+                    results[table] = _load_table(table, iter_snapshot_rows(chain, table), chunk_size, rejects)
+                for table, count in drop_orphans(cursor, rejects).items():
+                    results[table]['orphaned'] = count
+        finally:
+            conn.commit()
+            crud._backend.set_load_checks(cursor, True)
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        crud.release_connection()
+        crud.clear_caches()
+    return results
+
+
+# --- Command Line ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the library tables to a compressed columnar snapshot, or load one.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_cmd = commands.add_parser('export', help="Write a snapshot of Book, Copy, Member, Staff and Loan")
+    export_cmd.add_argument('directory')
+    export_cmd.add_argument('--base', help="Earlier snapshot; only loans changed since it are written")
+    export_cmd.add_argument('--format', choices=FORMATS,
+                            help="parquet (needs pyarrow) or the built-in columnar format (default: parquet if available)")
+    export_cmd.add_argument('--jobs', type=int, default=len(TABLES), help="Tables exported in parallel")
+    export_cmd.add_argument('--batch', type=int, default=EXPORT_BATCH, help="Rows per fetch and per row group")
+    import_cmd = commands.add_parser('import', help="Load a snapshot (and the snapshots it builds on)")
+    import_cmd.add_argument('directory')
+    import_cmd.add_argument('--replace', action='store_true',
+                            help="Delete the existing rows (and holds, availability, rollups) first")
+    import_cmd.add_argument('--rejects', help=f"Where to write rows that could not be loaded (default: {REJECTS} "
+                                              "in the snapshot directory)")
+    args = parser.parse_args()
+
+    size = max(1, args.jobs) if args.command == 'export' else 2
+    crud.init_backend(crud.backend_from_config(crud.prompt_credentials), size=size)
+    try:
+        if args.command == 'export':
+            manifest = export_snapshot(args.directory, args.format, args.base, args.jobs, args.batch)
+            for table, info in manifest['tables'].items():
+                print(f"{table:<8} {info['rows']:>10} rows {info['bytes'] / 1e6:>9.2f} MB {info['seconds']:>8.2f}s")
+            kind = f"loans since {manifest['loan_since']}" if manifest['loan_since'] else "full"
+            print(f"Snapshot ({manifest['format']}, {kind}) written to {args.directory}")
+            return
+        rejects_path = args.rejects or os.path.join(args.directory, REJECTS)
+        results = import_snapshot(args.directory, args.replace, rejects_path=rejects_path)
+    finally:
+        crud.close_pool()
+    for table, result in results.items():
+        print(f"{table:<8} {result['inserted']:>10} inserted {result['rejected']:>6} rejected "
+              f"{result['orphaned']:>6} orphaned")
+    if any(result['rejected'] or result['orphaned'] for result in results.values()):
+        print(f"Rejected rows written to {rejects_path}")
+
+if __name__ == '__main__':
+    main()
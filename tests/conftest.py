@@ -0,0 +1,70 @@
+# Imports
+# contextlib/io: keep init_db's progress output out of the test log
+# os/sys: put src/ on the path and pick the backend before crud is imported
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQL_DIR = os.path.join(ROOT, 'sql')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+# Every test taking `db` runs on a fresh SQLite file loaded with schema.sql,
+# every migration and the seed rows in data.sql. With LIBRARYMS_TEST_MYSQL_HOST
+# set it runs against MySQL as well, in a scratch database that is dropped and
+# recreated for each test (LIBRARYMS_TEST_MYSQL_DATABASE, default
+# libraryms_test; never point it at real data).
+MYSQL_HOST = os.environ.get('LIBRARYMS_TEST_MYSQL_HOST')
+MYSQL_USER = os.environ.get('LIBRARYMS_TEST_MYSQL_USER', 'root')
+MYSQL_PASSWORD = os.environ.get('LIBRARYMS_TEST_MYSQL_PASSWORD', '')
+MYSQL_DATABASE = os.environ.get('LIBRARYMS_TEST_MYSQL_DATABASE', 'libraryms_test')
+BACKENDS = ['sqlite'] + (['mysql'] if MYSQL_HOST else [])
+
+# backends.py only loads the MySQL driver when MySQL is the configured backend
+os.environ.setdefault('LIBRARYMS_BACKEND', 'mysql' if MYSQL_HOST else 'sqlite')
+
+import crud
+import init_db
+from backends import MySQLBackend, SQLiteBackend
+
+
+def load_database(backend):
+    conn = backend.connect()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            init_db.load_sql_files(conn, os.path.join(SQL_DIR, 'schema.sql'), os.path.join(SQL_DIR, 'data.sql'),
+                                   os.path.join(SQL_DIR, 'migrations'), backend=backend)
+        conn.commit()
+    finally:
+        conn.close()
+
+def make_backend(name, tmp_path):
+    """A backend on an empty database of its own."""
+    if name == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'library.db'))
+    server = MySQLBackend(MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD).connect()
+    try:
+        cursor = server.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {MYSQL_DATABASE}")
+        cursor.execute(f"CREATE DATABASE {MYSQL_DATABASE}")
+    finally:
+        server.close()
+    return MySQLBackend(MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE)
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path):
+    """A backend on a freshly loaded database."""
+    backend = make_backend(request.param, tmp_path)
+    load_database(backend)
+    return backend
+
+@pytest.fixture
+def db(backend):
+    """crud with its pool on `backend`."""
+    crud.init_backend(backend, size=4)
+    yield crud
+    crud.close_pool()
+    crud.clear_caches()
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+pytest.importorskip('mysql.connector.aio')
+import acrud
+
+ISBN = '9780000000099'
+
+
+class _AsyncCursor:
+    """The awaitable cursor calls acrud makes, over a backend's blocking cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, sql, params=()):
+        self._cursor.execute(sql, params)
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+    async def close(self):
+        self._cursor.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+class _AsyncConnection:
+    """Runs acrud on the test database of any backend, one blocking call at a time."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def cursor(self, dictionary=False):
+        return _AsyncCursor(self._conn.cursor(dictionary=dictionary))
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    async def commit(self):
+        self._conn.commit()
+
+    async def rollback(self):
+        self._conn.rollback()
+
+    async def is_connected(self):
+        return self._conn.is_connected()
+
+    async def close(self):
+        self._conn.close()
+
+@pytest.fixture
+def adb(db, backend, monkeypatch):
+    """acrud with its pool on `backend`; `db` (crud) sets up the data."""
+    async def factory():
+        return _AsyncConnection(backend.connect())
+    monkeypatch.setattr(acrud, '_pool', acrud.AsyncConnectionPool(factory, size=2))
+    return acrud
+
+@pytest.fixture
+def hold_id(db):
+    """A title whose only copy is out, with one member waiting for it."""
+    db.add_book(ISBN, 'Queue Title', 'Testing', 'Author', None)
+    copy_id = db.add_copy(ISBN, None, 'Available', 'Shelf H1')
+    borrower, waiter = (db.add_member(None, name, '000-00-0000', '1 Main St', date(2030, 1, 1), 1, 0)
+                        for name in ('Borrower', 'Waiter'))
+    db.checkout(borrower, ISBN, copy_id, 201)
+    return db.place_hold(waiter, ISBN)['hold_id']
+
+
+def test_async_add_copy_goes_to_the_waiting_hold(db, adb, hold_id):
+    assert asyncio.run(adb.add_copy(ISBN, 2, 'Available', 'Shelf H1'))
+    db.clear_caches()
+    hold = db.get_hold(hold_id)
+    assert (hold['status'], hold['copy_id']) == ('Ready', 2)
+    assert db.get_copy(ISBN, 2)['status'] == 'Not Available'
+    assert db.availability([ISBN])[ISBN]['available'] == 0
+
+def test_async_update_copy_to_available_goes_to_the_waiting_hold(db, adb, hold_id):
+    assert db.add_copy(ISBN, 2, 'Not Available', 'Shelf H1')
+    assert asyncio.run(adb.update_copy(ISBN, 2, status='Available'))
+    db.clear_caches()
+    hold = db.get_hold(hold_id)
+    assert (hold['status'], hold['copy_id']) == ('Ready', 2)
+    assert db.get_copy(ISBN, 2)['status'] == 'Not Available'
+    assert db.availability([ISBN])[ISBN]['available'] == 0
@@ -0,0 +1,124 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+import crud
+from backends import IntegrityError, _map_error, _translate
+
+
+# --- SQLite dialect translation ---
+
+@pytest.mark.parametrize('sql', [
+    "SELECT status FROM Copy WHERE isbn = %s FOR UPDATE",
+    "SELECT status FROM Copy WHERE isbn = %s for update",
+    "SELECT status FROM Copy WHERE isbn = %s FOR SHARE",
+    "SELECT status FROM Copy WHERE isbn = %s LOCK IN SHARE MODE",
+])
+def test_locking_reads_are_stripped_and_take_the_write_lock(sql):
+    assert _translate(sql) == ("SELECT status FROM Copy WHERE isbn = ?", True)
+
+def test_plain_select_runs_outside_a_transaction():
+    assert _translate("SELECT * FROM Book WHERE isbn = %s") == ("SELECT * FROM Book WHERE isbn = ?", False)
+
+def test_insert_ignore_becomes_insert_or_ignore():
+    sql, begin = _translate("INSERT IGNORE INTO Book (isbn) VALUES (%s)")
+    assert sql == "INSERT OR IGNORE INTO Book (isbn) VALUES (?)"
+    assert begin
+
+def test_mysql_functions_are_renamed():
+    sql, _ = _translate("UPDATE IdSequence SET next_id = GREATEST(next_id, %s), at = NOW() WHERE d < CURDATE()")
+    assert sql == "UPDATE IdSequence SET next_id = MAX(next_id, ?), at = CURRENT_TIMESTAMP WHERE d < DATE('now')"
+
+
+# --- SQLite error numbers ---
+
+@pytest.fixture
+def raw():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE child (id INTEGER PRIMARY KEY, parent_id INTEGER NOT NULL REFERENCES parent(id))")
+    conn.execute("INSERT INTO parent VALUES (1)")
+    yield conn
+    conn.close()
+
+def _error_from(conn, sql):
+    with pytest.raises(sqlite3.Error) as caught:
+        conn.execute(sql)
+    return _map_error(caught.value)
+
+def test_duplicate_key_maps_to_1062(raw):
+    error = _error_from(raw, "INSERT INTO parent VALUES (1)")
+    assert isinstance(error, IntegrityError)
+    assert error.errno == 1062
+
+def test_missing_parent_maps_to_1452(raw):
+    error = _error_from(raw, "INSERT INTO child VALUES (1, 99)")
+    assert isinstance(error, IntegrityError)
+    assert error.errno == 1452
+
+def test_not_null_maps_to_1048(raw):
+    assert _error_from(raw, "INSERT INTO child VALUES (1, NULL)").errno == 1048
+
+def test_busy_database_maps_to_retryable_1205(tmp_path):
+    path = str(tmp_path / 'busy.db')
+    writer = sqlite3.connect(path, isolation_level=None)
+    waiter = sqlite3.connect(path, isolation_level=None, timeout=0)
+    try:
+        writer.execute("CREATE TABLE t (x)")
+        writer.execute("BEGIN IMMEDIATE")
+        error = _error_from(waiter, "BEGIN IMMEDIATE")
+        assert not isinstance(error, IntegrityError)
+        assert error.errno == 1205
+        assert error.errno in crud.RETRYABLE_ERRORS
+    finally:
+        writer.close()
+        waiter.close()
+
+
+# --- Same behaviour on every backend ---
+
+def _errno_of(db, sql, params):
+    conn = db.get_connection()
+    try:
+        with pytest.raises(db.Error) as caught:
+            db._execute(conn, sql, params)
+        conn.rollback()
+        return caught.value.errno
+    finally:
+        db.release_connection()
+
+def test_integrity_errors_carry_mysql_errnos(db):
+    assert _errno_of(db, "INSERT INTO Book (isbn, title) VALUES (%s, %s)", ('9780131101630', 'Dup')) == 1062
+    assert _errno_of(db, "INSERT INTO Copy (isbn, copy_id, status, location) VALUES (%s, %s, %s, %s)",
+                     ('no-such-isbn', 1, 'Available', 'A1')) == 1452
+
+def test_crud_round_trip(db):
+    assert db.add_book('9780000000001', 'Test Title', 'Testing', 'A. Author', 'About tests') is True
+    assert db.get_book('9780000000001')['title'] == 'Test Title'
+    assert db.update_book('9780000000001', title='New Title')
+    book = db.get_book('9780000000001')
+    assert (book['title'], book['row_version']) == ('New Title', 1)
+
+    copy_id = db.add_copy('9780000000001', None, 'Available', 'Shelf T1')
+    assert db.get_copy('9780000000001', copy_id)['status'] == 'Available'
+    assert db.availability(['9780000000001'])['9780000000001']['available'] == 1
+
+    member_id = db.add_member(None, 'Test Member', '000-00-0000', '1 Test St', date(2030, 1, 1), 1, 0)
+    assert db.get_member(member_id)['name'] == 'Test Member'
+    loan = db.checkout(member_id, '9780000000001', copy_id, 201)
+    assert db.get_copy('9780000000001', copy_id)['status'] == 'Not Available'
+    db.checkin(loan['loan_id'])
+    assert db.get_loan(loan['loan_id'])['return_date'] is not None
+
+    assert db.add_book('9780000000001', 'Dup', None, None, None) is False
+    assert db.delete_loan(loan['loan_id'])
+    assert db.delete_copy('9780000000001', copy_id)
+    assert db.delete_book('9780000000001')
+    assert db.get_book('9780000000001') is None
+
+def test_rows_come_back_with_python_types(db):
+    member = db.get_member(1001)
+    assert isinstance(member['member_id'], int)
+    assert isinstance(member['expiration_date'], date)
@@ -0,0 +1,28 @@
+from cache import LRUCache, MISSING
+
+
+def test_put_after_an_invalidation_of_the_key_is_dropped():
+    cache = LRUCache()
+    generation = cache.generation()
+    cache.invalidate(1001)
+    cache.put(1001, 'read before the write', generation)
+    assert cache.get(1001) is MISSING
+    cache.put(1001, 'read after the write', cache.generation())
+    assert cache.get(1001) == 'read after the write'
+    assert cache.stats()['stale_puts'] == 1
+
+def test_invalidating_other_keys_or_clearing_the_cache():
+    cache = LRUCache(maxsize=2)
+    generation = cache.generation()
+    cache.invalidate(1)
+    cache.put(2, 'other key', generation)
+    assert cache.get(2) == 'other key'
+    # Once invalidations are forgotten, older puts can't be told apart and are dropped
+    for key in (3, 4, 5):
+        cache.invalidate(key)
+    cache.put(6, 'too old to check', generation)
+    assert cache.get(6) is MISSING
+    generation = cache.generation()
+    cache.clear()
+    cache.put(2, 'from before the clear', generation)
+    assert cache.get(2) is MISSING
@@ -0,0 +1,65 @@
+import threading
+from datetime import date
+
+import pytest
+
+ISBN = '9780262033848'
+THREADS = 8
+
+
+def _shelf_counts(db, isbn):
+    """(available, total) from Copy itself, to check CopyAvailability against."""
+    copies = [c for c in db.iter_rows('Copy') if c['isbn'] == isbn]
+    return sum(c['status'] == 'Available' for c in copies), len(copies)
+
+def _open_loans(db, isbn, copy_id):
+    return [l for l in db.iter_rows('Loan')
+            if (l['isbn'], l['copy_id']) == (isbn, copy_id) and l['return_date'] is None]
+
+@pytest.fixture
+def copy_id(db):
+    return db.add_copy(ISBN, None, 'Available', 'Shelf T1')
+
+@pytest.fixture
+def members(db):
+    return [db.add_member(None, f"Patron {i}", f"000-00-{i:04d}", "1 Main St", date(2030, 1, 1), 1, 0)
+            for i in range(THREADS)]
+
+def test_concurrent_checkouts_of_one_copy_lend_it_once(db, members, copy_id):
+    assert db.get_copy(ISBN, copy_id)['status'] == 'Available'
+    before = db.availability([ISBN])[ISBN]
+    start = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def desk(i):
+        start.wait()
+        try:
+            results[i] = db.checkout(members[i], ISBN, copy_id, 201)
+        except db.CirculationError as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=desk, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    loans = [r for r in results if isinstance(r, dict)]
+    refused = [r for r in results if isinstance(r, db.CirculationError)]
+    assert len(loans) == 1
+    assert len(refused) == THREADS - 1
+    db.clear_caches()
+    assert db.get_copy(ISBN, copy_id)['status'] == 'Not Available'
+    assert [l['loan_id'] for l in _open_loans(db, ISBN, copy_id)] == [loans[0]['loan_id']]
+    after = db.availability([ISBN])[ISBN]
+    assert after['available'] == before['available'] - 1
+    assert (after['available'], after['total']) == _shelf_counts(db, ISBN)
+
+def test_checkin_puts_the_copy_back(db, members, copy_id):
+    loan = db.checkout(members[0], ISBN, copy_id, 201)
+    db.checkin(loan['loan_id'])
+    db.clear_caches()
+    assert db.get_copy(ISBN, copy_id)['status'] == 'Available'
+    assert _open_loans(db, ISBN, copy_id) == []
+    available = db.availability([ISBN])[ISBN]
+    assert (available['available'], available['total']) == _shelf_counts(db, ISBN)
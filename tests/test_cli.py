@@ -0,0 +1,40 @@
+from datetime import date
+
+import pytest
+
+import cli
+from idgen import IdAllocator
+
+
+@pytest.fixture
+def parser(db):
+    cli._load_crud()
+    return cli.build_parser()
+
+def test_batch_checkout_commits_on_one_connection(db, parser, capsys):
+    lines = [
+        "member update 1001 expiration_date=2030-01-01",
+        "loan checkout 1001 9780262033848 1 201",
+        "member add name=Ann ssn=123-45-6789 address=x expiration_date=2030-01-01 active_flag=1 professor_privileges=0",
+        "staff add staff_name=Bo staff_role=Clerk",
+    ]
+    assert cli.run_batch(parser, lines) == 0
+    assert "4 command(s) committed, 0 rolled back" in capsys.readouterr().err
+    assert db.get_copy('9780262033848', 1)['status'] == 'Not Available'
+    assert db.pool_stats()['created'] == 1
+
+def test_failed_batch_rolls_back_its_ids(db, parser):
+    lines = [
+        "member update 1001 expiration_date=2030-01-01",
+        "loan checkout 1001 9780262033848 1 201",
+        "book get no-such-isbn",
+    ]
+    assert cli.run_batch(parser, lines) == 1
+    assert db.get_copy('9780262033848', 1)['status'] == 'Available'
+    # No id from the rolled-back reservation may be handed out again here
+    # once another process has reserved the same range
+    other_process = IdAllocator(db._pool)
+    taken = set(other_process.next_ids('Loan', 10))
+    db.update_member(1001, expiration_date=date(2030, 1, 1))
+    loan = db.checkout(1001, '9780262033848', 1, 201)
+    assert loan['loan_id'] not in taken
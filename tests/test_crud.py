@@ -0,0 +1,80 @@
+import threading
+from datetime import date
+
+import pytest
+
+THREADS = 8
+
+
+def test_cached_member_is_invalidated_whatever_the_id_spelling(db):
+    assert db.get_member('1001')['name'] == 'Alice Smith'
+    db.update_member(1001, name='Changed')
+    assert db.get_member('1001')['name'] == 'Changed'
+    db.update_member('1001', name='Again')
+    assert db.get_member(1001)['name'] == 'Again'
+
+def test_checkout_invalidates_copy_fetched_with_int_copy_id(db):
+    db.update_member(1002, expiration_date=date(2030, 1, 1))
+    assert db.get_copy('9780262033848', 1)['status'] == 'Available'
+    db.checkout(1002, '9780262033848', '1', 201)
+    assert db.get_copy('9780262033848', 1)['status'] == 'Not Available'
+    assert db.get_copy('9780262033848', '1')['status'] == 'Not Available'
+
+def test_update_with_a_stale_expected_version_raises_and_changes_nothing(db):
+    version = db.get_member(1001)['row_version']
+    assert db.update_member(1001, expected_version=version, address='2 New Rd')
+    assert db.get_member(1001)['row_version'] == version + 1
+    with pytest.raises(db.UpdateConflict) as conflict:
+        db.update_member(1001, expected_version=version, address='3 Old Rd')
+    assert (conflict.value.expected, conflict.value.current) == (version, version + 1)
+    assert db.get_member(1001)['address'] == '2 New Rd'
+
+def test_concurrent_updates_from_the_same_version_apply_once(db):
+    version = db.get_book('9780131101630')['row_version']
+    start = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def desk(i):
+        start.wait()
+        try:
+            results[i] = db.update_book('9780131101630', expected_version=version, title=f"Edit {i}")
+        except db.UpdateConflict as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=desk, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    winners = [i for i, r in enumerate(results) if r is True]
+    assert len(winners) == 1
+    assert all(isinstance(r, db.UpdateConflict) for i, r in enumerate(results) if i not in winners)
+    book = db.get_book('9780131101630')
+    assert (book['title'], book['row_version']) == (f"Edit {winners[0]}", version + 1)
+
+def test_checkout_and_checkin_bump_row_versions(db):
+    db.update_member(1003, expiration_date=date(2030, 1, 1), active_flag=1)
+    copy_id = db.add_copy('9780262033848', None, 'Available', 'Shelf T1')
+    assert db.get_copy('9780262033848', copy_id)['row_version'] == 0
+    loan_id = db.checkout(1003, '9780262033848', copy_id, 201)['loan_id']
+    assert db.get_copy('9780262033848', copy_id)['row_version'] == 1
+    assert db.get_loan(loan_id)['row_version'] == 0
+    db.checkin(loan_id)
+    assert db.get_copy('9780262033848', copy_id)['row_version'] == 2
+    assert db.get_loan(loan_id)['row_version'] == 1
+
+def test_lookup_does_not_cache_a_row_invalidated_while_it_was_read(db, monkeypatch):
+    fetch_one = db._fetch_one
+    raced = []
+
+    def fetch_then_update(cursor):
+        row = fetch_one(cursor)
+        if not raced:
+            # Another desk renames the member between our read and our cache put
+            raced.append(True)
+            db.update_member(1001, name='Renamed')
+        return row
+    monkeypatch.setattr(db, '_fetch_one', fetch_then_update)
+    assert db.get_member(1001)['name'] == 'Alice Smith'
+    monkeypatch.undo()
+    assert db.get_member(1001)['name'] == 'Renamed'
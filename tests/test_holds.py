@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+import pytest
+
+from backends import DatabaseError
+
+ISBN = '9780000000099'
+
+
+@pytest.fixture
+def waiting_hold(db):
+    """A title whose only copy is out, with one member waiting for it. Returns (hold_id, copy_id, loan_id)."""
+    db.add_book(ISBN, 'Queue Title', 'Testing', 'Author', None)
+    copy_id = db.add_copy(ISBN, None, 'Available', 'Shelf H1')
+    borrower, waiter = (db.add_member(None, name, '000-00-0000', '1 Main St', date(2030, 1, 1), 1, 0)
+                        for name in ('Borrower', 'Waiter'))
+    loan = db.checkout(borrower, ISBN, copy_id, 201)
+    hold = db.place_hold(waiter, ISBN)
+    return hold['hold_id'], copy_id, loan['loan_id']
+
+def _available(db):
+    return db.availability([ISBN])[ISBN]['available']
+
+def test_new_copy_goes_to_the_waiting_hold(db, waiting_hold):
+    hold_id, _, _ = waiting_hold
+    new_copy = db.add_copy(ISBN, None, 'Available', 'Shelf H1')
+    hold = db.get_hold(hold_id)
+    assert (hold['status'], hold['copy_id']) == ('Ready', new_copy)
+    assert db.get_copy(ISBN, new_copy)['status'] == 'Not Available'
+    assert _available(db) == 0
+
+def test_copy_put_back_on_the_shelf_goes_to_the_waiting_hold(db, waiting_hold):
+    hold_id, _, _ = waiting_hold
+    missing = db.add_copy(ISBN, None, 'Not Available', 'Shelf H1')
+    assert db.update_copy(ISBN, missing, status='Available')
+    hold = db.get_hold(hold_id)
+    assert (hold['status'], hold['copy_id']) == ('Ready', missing)
+    assert db.get_copy(ISBN, missing)['status'] == 'Not Available'
+    assert _available(db) == 0
+
+def test_shelving_without_a_queue_still_makes_the_copy_available(db, waiting_hold):
+    hold_id, _, _ = waiting_hold
+    db.cancel_hold(hold_id)
+    copy_id = db.add_copy(ISBN, None, 'Available', 'Shelf H1')
+    assert db.get_copy(ISBN, copy_id)['status'] == 'Available'
+    assert _available(db) == 1
+
+def test_expire_holds_reports_a_failed_hold_and_carries_on(db, waiting_hold, monkeypatch):
+    hold_id, _, loan_id = waiting_hold
+    db.checkin(loan_id)
+    assert db.get_hold(hold_id)['status'] == 'Ready'
+    later = date.today() + timedelta(days=db.HOLD_PICKUP_DAYS + 1)
+
+    def lock_wait(work):
+        raise DatabaseError("Lock wait timeout exceeded", 1205)
+    with monkeypatch.context() as m:
+        m.setattr(db, '_run_transaction', lock_wait)
+        summary = db.expire_holds(later)
+    assert summary == {'expired': 0, 'reassigned': 0, 'shelved': 0, 'failed': 1}
+    assert db.get_hold(hold_id)['status'] == 'Ready'
+
+    assert db.expire_holds(later) == {'expired': 1, 'reassigned': 0, 'shelved': 1, 'failed': 0}
+    assert db.get_hold(hold_id)['status'] == 'Expired'
@@ -0,0 +1,38 @@
+import os
+
+import importer
+
+
+def write_books(path, isbns):
+    with open(path, 'w') as f:
+        f.write("isbn,title,subject,author,description\n")
+        for isbn in isbns:
+            f.write(f"{isbn},Title {isbn},Subject,Author,Description\n")
+
+# Valid ISBN-13s that are not in data.sql
+MONDAY = ['9780000000002', '9780000000019', '9780000000026']
+TUESDAY = ['9780000000033', '9780000000040', '9780000000057', '9780000000064']
+
+
+def test_a_new_file_at_the_same_path_is_loaded_from_the_first_row(db, tmp_path):
+    path = str(tmp_path / 'catalog.csv')
+    write_books(path, MONDAY)
+    assert importer.import_file('Book', path, chunk_size=2)['inserted'] == 3
+    assert not os.path.exists(importer.checkpoint_path(path, 'Book'))
+
+    write_books(path, TUESDAY)
+    summary = importer.import_file('Book', path, chunk_size=2)
+    assert summary == {'skipped': 0, 'inserted': 4, 'rejected': 0}
+    assert all(db.get_book(isbn) for isbn in TUESDAY)
+
+def test_a_checkpoint_only_resumes_the_file_it_was_taken_on(db, tmp_path):
+    path = str(tmp_path / 'catalog.csv')
+    write_books(path, TUESDAY)
+    # As if a run was interrupted after its first chunk
+    importer.save_checkpoint(path, 'Book', 2)
+    assert importer.import_file('Book', path, chunk_size=2) == {'skipped': 2, 'inserted': 2, 'rejected': 0}
+    assert db.get_book(TUESDAY[0]) is None
+
+    importer.save_checkpoint(path, 'Book', 2)
+    write_books(path, MONDAY)
+    assert importer.import_file('Book', path, chunk_size=2) == {'skipped': 0, 'inserted': 3, 'rejected': 0}
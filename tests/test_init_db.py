@@ -0,0 +1,94 @@
+import sys
+
+import pytest
+
+import init_db
+from backends import SQLiteBackend
+
+# Every script is fed whole and in pieces of these sizes, so quotes, comments
+# and delimiters also get split across feed() calls
+CHUNK_SIZES = (1, 2, 3, 5, 8, 64)
+
+
+def split(script, size):
+    splitter = init_db.StatementSplitter()
+    statements = []
+    for i in range(0, len(script), size):
+        statements.extend(splitter.feed(script[i:i + size]))
+    statements.extend(splitter.feed('', final=True))
+    return statements
+
+CASES = [
+    ("INSERT INTO Book VALUES ('1', 'Semi; colon');\nSELECT 1;",
+     ["INSERT INTO Book VALUES ('1', 'Semi; colon')", "SELECT 1"]),
+    ("SELECT 'it''s; fine';SELECT 'back\\'slash;';",
+     ["SELECT 'it''s; fine'", "SELECT 'back\\'slash;'"]),
+    ('SELECT "a;b", `odd;name` FROM t;', ['SELECT "a;b", `odd;name` FROM t']),
+    ("-- leading; comment\nSELECT 1; # trailing; comment\nSELECT 2 /* inline; */ + 3;",
+     ["SELECT 1", "SELECT 2  + 3"]),
+    ("/*!40101 SET NAMES utf8; */;SELECT 1--1;", ["/*!40101 SET NAMES utf8; */", "SELECT 1--1"]),
+    ("DELIMITER $$\nCREATE TRIGGER t BEFORE INSERT ON Loan FOR EACH ROW BEGIN SET @a = 1; SET @b = 2; END$$\n"
+     "DELIMITER ;\nSELECT 1;",
+     ["CREATE TRIGGER t BEFORE INSERT ON Loan FOR EACH ROW BEGIN SET @a = 1; SET @b = 2; END", "SELECT 1"]),
+    ("SELECT 'no delimiter at the end'", ["SELECT 'no delimiter at the end'"]),
+    ("  ;\n;-- only a comment\n", []),
+]
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+@pytest.mark.parametrize('script, expected', CASES)
+def test_statement_splitter(script, expected, size):
+    assert split(script, size) == expected
+    assert split(script, len(script) or 1) == expected
+
+@pytest.mark.parametrize('size', CHUNK_SIZES)
+def test_unterminated_quote_is_an_error(size):
+    with pytest.raises(ValueError):
+        split("SELECT 'never closed;", size)
+
+@pytest.mark.parametrize('size', (1, 7, 4096))
+def test_iter_statements_streams_a_file_in_chunks(tmp_path, size):
+    path = tmp_path / 'script.sql'
+    script = "".join(f"INSERT INTO t VALUES ({i}, 'row; {i}');\n" for i in range(50))
+    path.write_text(script)
+    statements = [s for s, _ in init_db.iter_statements(str(path), chunk_size=size)]
+    assert statements == [f"INSERT INTO t VALUES ({i}, 'row; {i}')" for i in range(50)]
+
+
+CHILD_FIRST = """
+CREATE TABLE Parent (id INT PRIMARY KEY);
+CREATE TABLE Child (id INT PRIMARY KEY, parent_id INT, FOREIGN KEY (parent_id) REFERENCES Parent(id));
+INSERT INTO Child VALUES (1, 10);
+INSERT INTO Parent VALUES (10);
+"""
+
+@pytest.fixture
+def child_first(tmp_path):
+    path = tmp_path / 'child_first.sql'
+    path.write_text(CHILD_FIRST)
+    backend = SQLiteBackend(str(tmp_path / 'load.db'))
+    conn = backend.connect()
+    yield backend, conn, str(path)
+    conn.close()
+
+def test_fast_load_switches_foreign_key_checks_off_for_the_load(child_first):
+    backend, conn, path = child_first
+    assert init_db.run_sql_file(conn, path, fast_load=True, backend=backend)['statements'] == 4
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys")
+    assert cursor.fetchone()[0] == 1
+
+def test_without_fast_load_the_first_bad_row_stops_the_load(child_first):
+    backend, conn, path = child_first
+    with pytest.raises(init_db.SQLFileError) as failed:
+        init_db.run_sql_file(conn, path, backend=backend)
+    assert failed.value.number == 3
+
+def test_main_passes_fast_load_through(monkeypatch, child_first):
+    backend, _, _ = child_first
+    calls = []
+    monkeypatch.setattr(init_db, 'backend_from_config', lambda prompt: backend)
+    monkeypatch.setattr(init_db, 'load_sql_files', lambda *args, **kwargs: calls.append(kwargs['fast_load']))
+    for argv, expected in ((['init_db.py', '--fast-load'], True), (['init_db.py'], False)):
+        monkeypatch.setattr(sys, 'argv', argv)
+        init_db.main()
+        assert calls.pop() is expected
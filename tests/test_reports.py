@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+
+import pytest
+
+import reports
+
+ISBN = '9780262033848'
+START = date.today() - timedelta(days=30)
+ROLLUPS = ('CirculationDaily', 'MemberDaily', 'LocationDaily')
+
+
+def _rollups(db):
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        rows = {}
+        for table in ROLLUPS:
+            cursor.execute(f"SELECT * FROM {table}")
+            rows[table] = sorted(tuple(str(v) for v in row) for row in cursor.fetchall())
+        return rows
+    finally:
+        db.release_connection()
+
+def _rebuild(db, through):
+    conn = db.get_connection()
+    try:
+        conn.cursor().execute("UPDATE RollupWatermark SET through_day = NULL")
+        conn.commit()
+    finally:
+        db.release_connection()
+    reports.refresh(through)
+    return _rollups(db)
+
+@pytest.fixture
+def lent(db):
+    """A copy on 'Shelf A' lent on START; returns (copy_id, loan_id)."""
+    db.update_member(1003, expiration_date=date(2030, 1, 1), active_flag=1)
+    copy_id = db.add_copy(ISBN, None, 'Available', 'Shelf A')
+    return copy_id, db.checkout(1003, ISBN, copy_id, 201, START)['loan_id']
+
+
+def test_refresh_moves_the_watermark_and_reports_read_the_rollups(db, lent):
+    assert reports.watermark() is None
+    assert reports.refresh(START)['through'] == START
+    assert reports.watermark() == START
+    assert reports.refresh(START)['days'] == 0
+    result = reports.report(START, START)
+    assert result['through'] == START
+    assert [t['isbn'] for t in result['top_titles']] == [ISBN]
+    assert result['members']['checkouts'] == 1
+    shelf = next(r for r in result['locations'] if r['location'] == 'Shelf A')
+    assert (shelf['checkouts'], shelf['peak_on_loan'], shelf['copies']) == (1, 1, 1)
+
+def test_incremental_refresh_matches_a_full_rebuild(db, lent):
+    copy_id, loan_id = lent
+    reports.refresh(START + timedelta(days=1))
+    db.checkin(loan_id, START + timedelta(days=3))
+    reports.refresh(START + timedelta(days=5))
+    assert _rollups(db) == _rebuild(db, START + timedelta(days=5))
+
+def test_relocating_a_copy_recomputes_the_days_it_was_counted_under_the_old_location(db, lent):
+    copy_id, loan_id = lent
+    reports.refresh(START + timedelta(days=1))
+    assert db.update_copy(ISBN, copy_id, location='Shelf B')
+    assert reports.watermark() == START - timedelta(days=1)
+    db.checkin(loan_id, START + timedelta(days=3))
+    reports.refresh(START + timedelta(days=5))
+    incremental = _rollups(db)
+    assert incremental == _rebuild(db, START + timedelta(days=5))
+    on_loan = {(day, location): int(n) for day, location, _, _, n in incremental['LocationDaily']}
+    assert on_loan[(str(START), 'Shelf B')] == 1
+    assert not any(location == 'Shelf A' for _, location in on_loan)
+    assert min(on_loan.values()) >= 0
@@ -0,0 +1,184 @@
+import gzip
+import http.client
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import server
+from conftest import ROOT
+from pool import PoolTimeout
+
+
+@pytest.fixture
+def serve():
+    """Start a server on a free port for `api`; returns a request(method, path, body, headers) function."""
+    servers = []
+
+    def start(api):
+        httpd = server.make_server(port=0, api=api, quiet=True)
+        threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        servers.append(httpd)
+
+        def request(method, path, body=None, headers=None):
+            conn = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+            try:
+                conn.request(method, path, None if body is None else json.dumps(body), headers or {})
+                response = conn.getresponse()
+                return response.status, dict(response.getheaders()), response.read()
+            finally:
+                conn.close()
+        return request
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+@pytest.fixture
+def call(db, serve):
+    return serve(db)
+
+
+def test_record_etag_answers_if_none_match_with_304(call):
+    status, headers, body = call('GET', '/books/9780131101630')
+    assert status == 200
+    assert json.loads(body)['isbn'] == '9780131101630'
+    status, again, body = call('GET', '/books/9780131101630', headers={'If-None-Match': headers['ETag']})
+    assert status == 304
+    assert body == b''
+    assert again['ETag'] == headers['ETag']
+
+def test_etag_changes_when_the_record_does(db, call):
+    _, headers, _ = call('GET', '/members/1001')
+    db.update_member(1001, address='2 New Rd')
+    status, changed, _ = call('GET', '/members/1001', headers={'If-None-Match': headers['ETag']})
+    assert status == 200
+    assert changed['ETag'] != headers['ETag']
+
+def test_large_lists_are_gzipped_only_when_accepted(db, call):
+    db.add_books([(f"97800000{i:05d}", f"Title {i}", 'Subject', 'Author', 'A description') for i in range(100)])
+    status, headers, body = call('GET', '/books?limit=100', headers={'Accept-Encoding': 'gzip'})
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert len(json.loads(gzip.decompress(body))['items']) == 100
+    status, headers, body = call('GET', '/books?limit=100')
+    assert 'Content-Encoding' not in headers
+    assert len(json.loads(body)['items']) == 100
+
+def test_checkout_account_and_checkin(db, call):
+    for member_id in (1001, 1003):
+        db.update_member(member_id, expiration_date=date(2030, 1, 1), active_flag=1)
+    copy_id = db.add_copy('9780262033848', None, 'Available', 'Shelf T1')
+    order = {'member_id': 1003, 'isbn': '9780262033848', 'copy_id': copy_id, 'staff_id': 201}
+    status, _, body = call('POST', '/loans/checkout', order)
+    assert status == 201
+    loan_id = json.loads(body)['loan_id']
+
+    # A second member in good standing is refused by the double-lend guard
+    status, _, body = call('POST', '/loans/checkout', dict(order, member_id=1001))
+    assert status == 409
+    assert json.loads(body)['error'] == f"Copy 9780262033848/{copy_id} is already on loan."
+
+    status, _, body = call('GET', '/members/1003/account')
+    assert status == 200
+    assert loan_id in [l['loan_id'] for l in json.loads(body)['open_loans']]
+
+    status, _, body = call('POST', f'/loans/{loan_id}/checkin')
+    assert status == 200
+    _, _, body = call('GET', '/members/1003/account')
+    assert loan_id not in [l['loan_id'] for l in json.loads(body)['open_loans']]
+
+def test_unknown_member_account_is_404(call):
+    assert call('GET', '/members/999999/account')[0] == 404
+
+
+class _ExhaustedPool:
+    """Stand-in api whose pool never frees a connection."""
+
+    def get_connection(self):
+        raise PoolTimeout("No connection available after 0.0s (1/1 in use).")
+
+    def release_connection(self):
+        pass
+
+def test_pool_timeout_is_503_with_retry_after(serve):
+    request = serve(_ExhaustedPool())
+    status, headers, body = request('GET', '/books/9780131101630')
+    assert status == 503
+    assert headers['Retry-After'] == str(server.RETRY_AFTER)
+    assert 'No connection available' in json.loads(body)['error']
+
+
+SERVE_SCRIPT = """
+import sys
+sys.path.insert(0, {src!r})
+import server
+from backends import SQLiteBackend
+server.serve('127.0.0.1', {port}, 3, SQLiteBackend({path!r}), 1, quiet=True)
+"""
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="pre-forked workers need fork")
+def test_sigterm_to_the_parent_stops_every_worker(tmp_path):
+    script = SERVE_SCRIPT.format(src=os.path.join(ROOT, 'src'), port=_free_port(), path=str(tmp_path / 'library.db'))
+    parent = subprocess.Popen([sys.executable, '-u', '-c', script], stdout=subprocess.PIPE, text=True)
+    try:
+        # Workers print at the same moment, so their lines can run together
+        pids = set()
+        while len(pids) < 3:
+            line = parent.stdout.readline()
+            assert line, "server exited before every worker started"
+            pids.update(int(pid) for pid in re.findall(r'Worker (\d+) serving', line))
+        assert parent.pid in pids
+        parent.send_signal(signal.SIGTERM)
+        assert parent.wait(timeout=10) == 0
+    finally:
+        if parent.poll() is None:
+            parent.kill()
+        parent.stdout.close()
+    workers = pids - {parent.pid}
+    deadline = time.monotonic() + 5
+    while any(_running(pid) for pid in workers) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(_running(pid) for pid in workers)
+
+def test_patch_with_a_stale_version_is_refused(db, call):
+    _, headers, body = call('GET', '/members/1001')
+    version = json.loads(body)['row_version']
+    status, _, body = call('PATCH', '/members/1001', {'address': '2 New Rd', 'row_version': version})
+    assert status == 200
+    assert json.loads(body)['row_version'] == version + 1
+
+    status, _, body = call('PATCH', '/members/1001', {'address': '3 Old Rd', 'row_version': version})
+    assert status == 409
+    assert 'changed by someone else' in json.loads(body)['error']
+    status, _, _ = call('PATCH', '/members/1001', {'address': '3 Old Rd'}, {'If-Match': headers['ETag']})
+    assert status == 412
+    assert db.get_member(1001)['address'] == '2 New Rd'
+
+def test_patch_with_a_current_etag_applies(call):
+    _, headers, _ = call('GET', '/members/1001')
+    status, changed, body = call('PATCH', '/members/1001', {'address': '2 New Rd'}, {'If-Match': headers['ETag']})
+    assert status == 200
+    assert json.loads(body)['address'] == '2 New Rd'
+    assert changed['ETag'] != headers['ETag']
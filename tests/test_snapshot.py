@@ -0,0 +1,83 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+import snapshot
+
+
+def _loan_ids(db):
+    return sorted(l['loan_id'] for l in db.iter_rows('Loan'))
+
+@pytest.mark.parametrize('fmt', ['columnar', pytest.param('parquet', marks=pytest.mark.skipif(
+    snapshot.pq is None, reason="needs pyarrow"))])
+def test_incremental_snapshot_drops_loans_deleted_since_the_base(db, tmp_path, fmt):
+    base, delta = str(tmp_path / 'base'), str(tmp_path / 'delta')
+    snapshot.export_snapshot(base, fmt)
+    deleted = _loan_ids(db)[0]
+    assert db.delete_loan(deleted)
+    db.update_member(1003, expiration_date=date(2030, 1, 1), active_flag=1)
+    copy_id = db.add_copy('9780262033848', None, 'Available', 'Shelf T1')
+    added = db.checkout(1003, '9780262033848', copy_id, 201)['loan_id']
+    manifest = snapshot.export_snapshot(delta, fmt, base=base)
+    assert manifest['loan_ids'] == snapshot.LIVE_LOAN_IDS
+    expected = _loan_ids(db)
+
+    snapshot.import_snapshot(delta, replace=True)
+    assert _loan_ids(db) == expected
+    assert deleted not in expected and added in expected
+
+def test_live_loan_ranges_are_runs_of_ids(db):
+    for loan_id in (2, 3):
+        db.delete_loan(loan_id)
+    ids = _loan_ids(db)
+    ranges = snapshot.live_loan_ranges()
+    assert [i for first, last in ranges for i in range(first, last + 1)] == ids
+
+def test_rejected_rows_are_written_to_the_rejects_file(db, tmp_path):
+    directory = str(tmp_path / 'full')
+    manifest = snapshot.export_snapshot(directory, 'columnar')
+    # Every row is already in the database, so every row is a duplicate
+    results = snapshot.import_snapshot(directory, chunk_size=2)
+    assert all(r == {'inserted': 0, 'rejected': manifest['tables'][t]['rows'], 'orphaned': 0} for t, r in results.items())
+    with open(os.path.join(directory, snapshot.REJECTS)) as f:
+        rejects = [json.loads(line) for line in f]
+    assert len(rejects) == sum(info['rows'] for info in manifest['tables'].values())
+    assert [r['row'] for r in rejects if r['table'] == 'Book'] == list(range(manifest['tables']['Book']['rows']))
+    assert {'table', 'row', 'reason', 'data'} == set(rejects[0])
+
+def test_rows_written_between_table_exports_load_without_dangling_references(db, tmp_path, monkeypatch):
+    added = []
+    export_table = snapshot.export_table
+
+    def export_then_write(table, *args):
+        info = export_table(table, *args)
+        if table == 'Copy':
+            # Lent on a copy that is not in the snapshot's Copy file
+            db.update_member(1003, expiration_date=date(2030, 1, 1), active_flag=1)
+            copy_id = db.add_copy('9780262033848', None, 'Available', 'Shelf T1')
+            added.append((copy_id, db.checkout(1003, '9780262033848', copy_id, 201)['loan_id']))
+        return info
+    monkeypatch.setattr(snapshot, 'export_table', export_then_write)
+    directory = str(tmp_path / 'full')
+    snapshot.export_snapshot(directory, 'columnar', jobs=1)
+    (copy_id, loan_id), = added
+
+    results = snapshot.import_snapshot(directory, replace=True)
+    assert results['Loan']['orphaned'] == 1
+    db.clear_caches()
+    assert db.get_copy('9780262033848', copy_id) is None
+    assert db.get_loan(loan_id) is None
+    with open(os.path.join(directory, snapshot.REJECTS)) as f:
+        rejects = [json.loads(line) for line in f]
+    assert [(r['table'], r['data']['loan_id']) for r in rejects] == [('Loan', loan_id)]
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        for table, columns, parent, parent_columns in snapshot.REFERENCES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE "
+                           + snapshot._orphan_where(table, columns, parent, parent_columns))
+            assert cursor.fetchone()[0] == 0
+    finally:
+        db.release_connection()